@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+"""
+Medición de la validación columnar frente al motor de reglas.
+
+Construye mapas sintéticos (con campos fuera de límites y superpuestos) hasta
+sumar el número de campos pedido, comprueba que validate_maps_columnar (con
+NumPy si está instalado y en Python puro) produce los mismos hallazgos de
+límites y superposición que ValidationEngine e imprime los tiempos.
+
+Uso: python scripts/bench_columnar.py [campos ...]   (por defecto 100000 1000000)
+"""
+
+import random
+import sys
+import time
+from collections import Counter
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
+
+from models import BMSMap, BMSField
+from bms.columnar import BOUNDS_RULES, HAS_NUMPY, validate_maps_columnar
+from bms.validation import ValidationEngine
+
+
+FIELDS_PER_MAP = 40
+# Hallazgos que calculan ambas implementaciones
+COMPARED_CODES = set(BOUNDS_RULES) | {"FIELD_OVERLAP", "ATTR_COLLISION"}
+
+
+def build_maps(total_fields: int, seed: int = 1) -> list:
+    """Mapas de 24x80 con FIELDS_PER_MAP campos aleatorios (algunos inválidos)"""
+    rng = random.Random(seed)
+    maps = []
+    for map_number in range(0, total_fields, FIELDS_PER_MAP):
+        bms_map = BMSMap(name=f"M{len(maps):07d}", mapset_name="MAPSET01")
+        for index in range(min(FIELDS_PER_MAP, total_fields - map_number)):
+            bms_map.add_field(BMSField(
+                name=f"F{index:03d}",
+                line=rng.randint(0, 25),
+                column=rng.randint(0, 81),
+                length=rng.randint(0, 30),
+            ))
+        maps.append(bms_map)
+    return maps
+
+
+def finding_keys(findings) -> Counter:
+    return Counter(
+        (f.code, f.message, f.map_name, f.field_name, f.position)
+        for f in findings if f.code in COMPARED_CODES
+    )
+
+
+def timed(function, *args):
+    started = time.perf_counter()
+    result = function(*args)
+    return result, time.perf_counter() - started
+
+
+def bench(total_fields: int) -> bool:
+    maps = build_maps(total_fields)
+    print(f"{total_fields} campos en {len(maps)} mapas")
+
+    engine = ValidationEngine()
+    reference, seconds = timed(lambda: [f for m in maps for f in engine.validate(m)])
+    reference = finding_keys(reference)
+    print(f"  ValidationEngine       {seconds:8.2f} s  ({sum(reference.values())} hallazgos)")
+
+    backends = [("columnar Python", False)]
+    if HAS_NUMPY:
+        backends.append(("columnar NumPy", True))
+    else:
+        print("  (NumPy no está instalado: solo se mide la versión en Python puro)")
+
+    identical = True
+    for label, use_numpy in backends:
+        findings, seconds = timed(validate_maps_columnar, maps, use_numpy)
+        same = finding_keys(findings) == reference
+        identical = identical and same
+        print(f"  {label:<22} {seconds:8.2f} s  {'idénticos' if same else 'DIFERENTES'}")
+    return identical
+
+
+def main() -> int:
+    sizes = [int(arg) for arg in sys.argv[1:]] or [100_000, 1_000_000]
+    results = [bench(size) for size in sizes]
+    return 0 if all(results) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""
+Medición del empaquetado de continuaciones con literales INITIAL largos.
+
+Construye campos cuyo INITIAL ocupa varias líneas (con apóstrofos y
+ampersands), mide _build_continuation_line por separado y generate_map_code
+completo (modo normal y canónico) e imprime campos por segundo. También
+comprueba que ninguna línea pasa de la columna 72.
+
+Uso: python scripts/bench_continuation.py [campos] [longitud INITIAL]
+     (por defecto 20000 campos de hasta 400 caracteres)
+"""
+
+import random
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
+
+from models import BMSMap, BMSField
+from bms import BMSGenerator
+
+
+WORDS = ["CLIENTE", "IMPORTE", "D'ARCY", "A&B", "FECHA", "O''NEIL", "TOTAL", "&&", "'"]
+
+
+def build_map(total_fields: int, max_length: int, seed: int = 1) -> BMSMap:
+    """Mapa con campos de INITIAL entre 80 y max_length caracteres"""
+    rng = random.Random(seed)
+    bms_map = BMSMap(name="BENCH01", mapset_name="MAPSET01")
+    for index in range(total_fields):
+        length = rng.randint(min(80, max_length), max_length)
+        text = ""
+        while len(text) < length:
+            text += rng.choice(WORDS) + " "
+        text = text[:length]
+        bms_map.add_field(BMSField(
+            name=f"F{index:07d}",
+            line=1 + index % 24,
+            column=2,
+            length=len(text),
+            initial_value=text,
+        ))
+    return bms_map
+
+
+def timed(function, *args):
+    started = time.perf_counter()
+    result = function(*args)
+    return result, time.perf_counter() - started
+
+
+def bench_continuation(generator: BMSGenerator, bms_map: BMSMap) -> float:
+    """Tiempo de _build_continuation_line sobre operandos ya construidos"""
+    build_params = generator._build_canonical_params if generator.canonical else generator._build_params
+    prepared = [
+        (f"{field.name:<8} DFHMDF ", f"POS=({field.line},{field.column}),LENGTH={field.length}",
+         build_params(field))
+        for field in bms_map.fields
+    ]
+    started = time.perf_counter()
+    for prefix, base_params, params in prepared:
+        generator._build_continuation_line(prefix, base_params, params)
+    return time.perf_counter() - started
+
+
+def main() -> int:
+    total_fields = int(sys.argv[1]) if len(sys.argv) > 1 else 20_000
+    max_length = int(sys.argv[2]) if len(sys.argv) > 2 else 400
+    bms_map = build_map(total_fields, max_length)
+    print(f"{total_fields} campos con INITIAL de hasta {max_length} caracteres")
+
+    valid = True
+    for canonical in (False, True):
+        generator = BMSGenerator(canonical=canonical)
+        label = "canónico" if canonical else "normal"
+        seconds = bench_continuation(generator, bms_map)
+        print(f"  _build_continuation_line ({label:<8}) {seconds:7.2f} s  "
+              f"{total_fields / seconds:10.0f} campos/s")
+        code, seconds = timed(generator.generate_map_code, bms_map)
+        lines = code.split("\n")
+        print(f"  generate_map_code        ({label:<8}) {seconds:7.2f} s  "
+              f"{total_fields / seconds:10.0f} campos/s  ({len(lines)} líneas)")
+        too_long = sum(1 for line in lines if len(line) > 72)
+        if too_long:
+            valid = False
+            print(f"  FALLO: {too_long} líneas pasan de la columna 72")
+    return 0 if valid else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+"""
+Medición de la detección de superposiciones: barrido sobre desplazamientos
+del buffer (bms.geometry.find_overlaps) frente a la comparación por pares
+que usaba antes detect_field_overlaps.
+
+Para cada tamaño de mapa se comprueba además que el barrido devuelve
+exactamente los pares que se obtienen comparando todos los pares con
+field_segments (misma geometría, incluyendo el byte de atributo y la vuelta
+al principio del buffer). El número de pares de la versión anterior es
+distinto: suponía 80 columnas, no contaba el byte de atributo y marcaba
+cualquier campo de varias líneas contra todo lo que tenía debajo.
+
+Uso: python scripts/bench_overlaps.py [campos ...]   (por defecto 2000 5000)
+"""
+
+import random
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
+
+from models import BMSField
+from bms.geometry import field_segments, find_overlaps
+
+
+SCREEN_SIZES = [(24, 80), (27, 132), (62, 160)]
+
+
+# ---- Implementación anterior (comparación por pares, pantalla de 80 columnas) ----
+
+def _old_end_position(line, column, length):
+    end_column = column + length - 1
+    end_line = line
+    while end_column > 80:
+        end_column -= 80
+        end_line += 1
+    return end_line, end_column
+
+
+def _old_fields_overlap(field1, field2):
+    end1_line, _ = _old_end_position(field1.line, field1.column, field1.length)
+    end2_line, _ = _old_end_position(field2.line, field2.column, field2.length)
+    if field1.line > end2_line or field2.line > end1_line:
+        return False
+    if field1.line == field2.line:
+        return not (field1.column + field1.length <= field2.column or
+                    field2.column + field2.length <= field1.column)
+    return True
+
+
+def old_detect_field_overlaps(fields, exclude_field=None):
+    overlaps = []
+    for i, field1 in enumerate(fields):
+        if field1 == exclude_field:
+            continue
+        for field2 in fields[i + 1:]:
+            if field2 == exclude_field:
+                continue
+            if _old_fields_overlap(field1, field2):
+                overlaps.append((field1, field2))
+    return overlaps
+
+
+# ---- Medición ----
+
+def build_fields(count: int, size, seed: int = 1) -> list:
+    """Campos aleatorios de 1 a 30 posiciones repartidos por la pantalla"""
+    rng = random.Random(seed)
+    lines, cols = size
+    return [BMSField(name=f"F{i:05d}", line=rng.randint(1, lines), column=rng.randint(1, cols),
+                     length=rng.randint(1, 30)) for i in range(count)]
+
+
+def brute_force(fields, size) -> set:
+    """Todos los pares comparados con la misma geometría (segmentos precalculados)"""
+    segments = [field_segments(field, size) for field in fields]
+    return {
+        (i, j)
+        for i in range(len(fields)) for j in range(i + 1, len(fields))
+        if any(s1 < e2 and s2 < e1 for s1, e1 in segments[i] for s2, e2 in segments[j])
+    }
+
+
+def timed(function, *args):
+    started = time.perf_counter()
+    result = function(*args)
+    return result, time.perf_counter() - started
+
+
+def main() -> int:
+    counts = [int(arg) for arg in sys.argv[1:]] or [2000, 5000]
+    identical = True
+    for size in SCREEN_SIZES:
+        for count in counts:
+            fields = build_fields(count, size)
+            old_pairs, old_seconds = timed(old_detect_field_overlaps, fields)
+            pairs, seconds = timed(find_overlaps, fields, size)
+            positions = {id(field): index for index, field in enumerate(fields)}
+            found = {(positions[id(a)], positions[id(b)]) for a, b in pairs}
+            same = found == brute_force(fields, size)
+            identical = identical and same
+            print(f"{size[0]}x{size[1]:<4} {count:6d} campos   pares {old_seconds:7.3f} s ({len(old_pairs):7d})   "
+                  f"barrido {seconds:7.4f} s ({len(pairs):7d})   "
+                  f"{'exacto' if same else 'DIFERENTE de la comparación por pares'}")
+    return 0 if identical else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
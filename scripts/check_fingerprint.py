@@ -0,0 +1,59 @@
+#!/usr/bin/env python3
+"""
+Comprobación de BMSMap.fingerprint frente a la salida canónica: para pares de
+mapas que solo difieren en estado que BMSGenerator(canonical=True) no escribe
+(o escribe igual), el código canónico y la huella deben coincidir; para
+pares con un cambio real, ambos deben diferir.
+
+Uso: python scripts/check_fingerprint.py
+"""
+
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
+
+from models import BMSMap, BMSField, FieldAttribute
+from bms import BMSGenerator
+
+
+def make_map(**changes) -> BMSMap:
+    bms_map = BMSMap(name="MAPA01", mapset_name="MAPSET01")
+    values = dict(name="CLIENTE", line=3, column=10, length=8, initial_value="A'B&C")
+    values.update(changes)
+    bms_map.add_field(BMSField(**values))
+    bms_map.add_field(BMSField(name="CAMPO02", line=1, column=2, length=5, initial_value="TITULO"))
+    return bms_map
+
+
+# (descripción, cambios del primer mapa, cambios del segundo, ¿misma salida?)
+CASES = [
+    ("justify no se escribe", dict(justify="RIGHT"), {}, True),
+    ("ATTRB vacío es ASKIP,NORM", dict(attributes=[]),
+     dict(attributes=[FieldAttribute.NORM, FieldAttribute.ASKIP]), True),
+    ("picture se escribe como PICIN", dict(picin="9(5)"), dict(picture="9(5)"), True),
+    ("atributos duplicados", dict(attributes=[FieldAttribute.BRT, FieldAttribute.BRT]),
+     dict(attributes=[FieldAttribute.BRT]), True),
+    ("nombres automáticos", dict(name="CAMPO01"), dict(name="FIELD07"), True),
+    ("COLOR en minúsculas", dict(color="red"), dict(color="RED"), True),
+    ("longitud distinta", dict(length=8), dict(length=9), False),
+    ("INITIAL distinto", dict(initial_value="A"), dict(initial_value="B"), False),
+]
+
+
+def main() -> int:
+    generator = BMSGenerator(canonical=True)
+    failures = 0
+    for description, first_changes, second_changes, expected_same in CASES:
+        first, second = make_map(**first_changes), make_map(**second_changes)
+        same_code = generator.generate_map_code(first) == generator.generate_map_code(second)
+        same_fingerprint = first.fingerprint() == second.fingerprint()
+        if same_code != expected_same or same_fingerprint != same_code:
+            failures += 1
+            print(f"FALLO {description}: misma salida={same_code}, misma huella={same_fingerprint}")
+    print(f"{len(CASES) - failures}/{len(CASES)} casos coherentes")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,55 @@
+#!/usr/bin/env python3
+"""
+Comprobación de ida y vuelta de literales largos: genera campos cuyo
+INITIAL ocupa varias líneas (con apóstrofos y ampersands) y verifica que el
+parser recupera exactamente el mismo valor, en modo normal y canónico.
+
+Uso: python scripts/check_literal_roundtrip.py
+"""
+
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
+
+from models import BMSMap, BMSField
+from bms import BMSGenerator
+from bms.parser import parse_bms_content
+
+
+VALUES = [
+    "x'" * 60,
+    "'" * 100,
+    "&" * 90,
+    "A&B'C" * 25,
+    "'&" * 70,
+    "DATOS " * 20 + "'",
+]
+
+
+def roundtrip(generator: BMSGenerator, value: str) -> str:
+    bms_map = BMSMap(name="MAPA01", mapset_name="MAPSET01")
+    bms_map.add_field(BMSField(name="LITERAL", line=2, column=2, length=len(value), initial_value=value))
+    code = generator.generate_map_code(bms_map)
+    parsed = BMSMap(name="MAPA01", mapset_name="MAPSET01")
+    parse_bms_content(parsed, code)
+    fields = [field for field in parsed.fields if field.name == "LITERAL"]
+    return fields[0].initial_value if fields else None
+
+
+def main() -> int:
+    failures = 0
+    for canonical in (False, True):
+        generator = BMSGenerator(canonical=canonical)
+        for value in VALUES:
+            result = roundtrip(generator, value)
+            if result != value:
+                failures += 1
+                print(f"FALLO canonical={canonical}: {value!r} -> {result!r}")
+    total = 2 * len(VALUES)
+    print(f"{total - failures}/{total} literales recuperados sin cambios")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
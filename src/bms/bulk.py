@@ -0,0 +1,216 @@
+"""
+Validación masiva de inventarios de mapas BMS.
+
+Reparte los archivos entre un pool de procesos, valida cada mapa con el
+motor de reglas (los mapas de un mapset, uno por DFHMDI, por separado) y
+produce hallazgos estructurados y estadísticas de tiempo por regla, que
+pueden escribirse como JSONL o CSV.
+
+Uso (desde src/):
+    python -m bms.bulk RUTA [RUTA ...] --output informe.jsonl [--workers N]
+"""
+import argparse
+import csv
+import json
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+# Añadir src al path para imports
+src_path = Path(__file__).parent.parent
+sys.path.insert(0, str(src_path))
+
+from .parser import parse_bms_maps
+from .validation import ValidationEngine
+
+
+# Extensiones consideradas al recorrer directorios
+BMS_EXTENSIONS = {".bms", ".txt", ".mac", ".map"}
+
+# Columnas del informe CSV (y claves de cada línea JSONL)
+REPORT_COLUMNS = ["file", "map", "field", "line", "column", "code", "severity", "message"]
+
+
+@dataclass
+class BulkReport:
+    """Resultado de una validación masiva"""
+    findings: List[Dict] = field(default_factory=list)
+    timings: Dict[str, List[float]] = field(default_factory=dict)  # regla -> [ejecuciones, segundos]
+    files: int = 0
+    maps: int = 0
+    fields: int = 0
+    elapsed: float = 0.0
+
+    def merge(self, other: "BulkReport"):
+        self.findings.extend(other.findings)
+        for code, (calls, seconds) in other.timings.items():
+            entry = self.timings.setdefault(code, [0, 0.0])
+            entry[0] += calls
+            entry[1] += seconds
+        self.files += other.files
+        self.maps += other.maps
+        self.fields += other.fields
+
+    def timing_stats(self) -> Dict[str, Dict]:
+        """Estadísticas por regla: ejecuciones, segundos totales y media en microsegundos"""
+        return {
+            code: {
+                "calls": int(calls),
+                "seconds": round(seconds, 6),
+                "mean_us": round(seconds / calls * 1e6, 3) if calls else 0.0,
+            }
+            for code, (calls, seconds) in sorted(self.timings.items())
+        }
+
+    def summary(self) -> Dict:
+        severities: Dict[str, int] = {}
+        for finding in self.findings:
+            severities[finding["severity"]] = severities.get(finding["severity"], 0) + 1
+        return {
+            "files": self.files,
+            "maps": self.maps,
+            "fields": self.fields,
+            "findings": len(self.findings),
+            "by_severity": severities,
+            "elapsed_seconds": round(self.elapsed, 3),
+            "rules": self.timing_stats(),
+        }
+
+    def write_jsonl(self, path: str):
+        """Escribe un hallazgo por línea; la última línea es el resumen con los tiempos por regla"""
+        with open(path, "w", encoding="utf-8") as f:
+            for finding in self.findings:
+                f.write(json.dumps(finding, ensure_ascii=False) + "\n")
+            f.write(json.dumps({"summary": self.summary()}, ensure_ascii=False) + "\n")
+
+    def write_csv(self, path: str):
+        """Escribe los hallazgos en CSV y los tiempos por regla en <archivo>.rules.csv"""
+        with open(path, "w", encoding="utf-8", newline="") as f:
+            writer = csv.DictWriter(f, fieldnames=REPORT_COLUMNS)
+            writer.writeheader()
+            writer.writerows(self.findings)
+
+        rules_path = str(Path(path).with_suffix("")) + ".rules.csv"
+        with open(rules_path, "w", encoding="utf-8", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(["rule", "calls", "seconds", "mean_us"])
+            for code, stats in self.timing_stats().items():
+                writer.writerow([code, stats["calls"], stats["seconds"], stats["mean_us"]])
+
+
+def iter_bms_files(paths: Iterable[str]) -> List[str]:
+    """Expande directorios (recursivamente) en la lista de archivos BMS a validar"""
+    files = []
+    for path in paths:
+        path = Path(path)
+        if path.is_dir():
+            files.extend(
+                str(candidate) for candidate in sorted(path.rglob("*"))
+                if candidate.is_file() and candidate.suffix.lower() in BMS_EXTENSIONS
+            )
+        elif path.is_file():
+            files.append(str(path))
+    return files
+
+
+# Motor por proceso de trabajo (se crea una vez por proceso)
+_engine: Optional[ValidationEngine] = None
+
+
+def validate_files(paths: List[str]) -> BulkReport:
+    """Valida un lote de archivos en el proceso actual"""
+    global _engine
+    if _engine is None:
+        _engine = ValidationEngine()
+
+    report = BulkReport()
+    for path in paths:
+        report.files += 1
+        try:
+            with open(path, "r", encoding="utf-8", errors="replace") as f:
+                content = f.read()
+            # Un mapset puede tener varios DFHMDI: cada mapa se valida por separado
+            maps = parse_bms_maps(content, Path(path).stem.upper()[:8])
+        except Exception as e:
+            report.findings.append(_finding_row(path, "", "", None, "PARSE_ERROR", "error",
+                                                f"Error al leer el archivo: {e}"))
+            continue
+
+        for bms_map in maps:
+            report.maps += 1
+            report.fields += len(bms_map.fields)
+            for finding in _engine.validate(bms_map, report.timings):
+                report.findings.append(_finding_row(
+                    path, finding.map_name, finding.field_name, finding.position,
+                    finding.code, finding.severity, finding.message
+                ))
+            # Cada mapa se valida una sola vez: no conservar su caché
+            _engine.reset(bms_map)
+    return report
+
+
+def validate_inventory(paths: Iterable[str], workers: Optional[int] = None,
+                       batch_size: int = 64) -> BulkReport:
+    """
+    Valida todos los mapas de las rutas indicadas en un pool de procesos.
+    Los archivos se envían en lotes para amortizar el coste de comunicación.
+    Con workers=1 se valida en el proceso actual.
+    """
+    started = time.perf_counter()
+    files = iter_bms_files(paths)
+    batches = [files[i:i + batch_size] for i in range(0, len(files), batch_size)]
+
+    report = BulkReport()
+    if workers == 1 or len(batches) <= 1:
+        for batch in batches:
+            report.merge(validate_files(batch))
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            for partial in executor.map(validate_files, batches):
+                report.merge(partial)
+
+    report.elapsed = time.perf_counter() - started
+    return report
+
+
+def _finding_row(path: str, map_name: str, field_name: str, position: Optional[Tuple[int, int]],
+                 code: str, severity: str, message: str) -> Dict:
+    return {
+        "file": path,
+        "map": map_name,
+        "field": field_name,
+        "line": position[0] if position else None,
+        "column": position[1] if position else None,
+        "code": code,
+        "severity": severity,
+        "message": message,
+    }
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Validación masiva de mapas BMS")
+    parser.add_argument("paths", nargs="+", help="Archivos o directorios con mapas BMS")
+    parser.add_argument("--output", "-o", required=True, help="Archivo de informe (.jsonl o .csv)")
+    parser.add_argument("--format", choices=["jsonl", "csv"], help="Formato del informe (por defecto según la extensión)")
+    parser.add_argument("--workers", "-w", type=int, default=None, help="Procesos de trabajo (por defecto, uno por CPU)")
+    parser.add_argument("--batch-size", type=int, default=64, help="Archivos por lote enviado a cada proceso")
+    args = parser.parse_args(argv)
+
+    report = validate_inventory(args.paths, args.workers, args.batch_size)
+    report_format = args.format or ("csv" if args.output.lower().endswith(".csv") else "jsonl")
+    if report_format == "csv":
+        report.write_csv(args.output)
+    else:
+        report.write_jsonl(args.output)
+
+    summary = report.summary()
+    print(f"{summary['files']} archivos, {summary['fields']} campos, "
+          f"{summary['findings']} hallazgos en {summary['elapsed_seconds']} s -> {args.output}")
+    return 1 if any(f["severity"] == "error" for f in report.findings) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
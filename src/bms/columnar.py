@@ -0,0 +1,233 @@
+"""
+Validación en bloque sobre campos en formato columnar.
+
+Los campos de uno o varios mapas se guardan como columnas (línea, columna,
+longitud, índice de mapa) y las comprobaciones de límites, longitud y
+superposición de BMSGenerator.validate_field y detect_field_overlaps se
+ejecutan como operaciones vectorizadas de NumPy. Si NumPy no está
+instalado se usa una implementación equivalente en Python puro.
+"""
+from collections import namedtuple
+from typing import Dict, List, Optional, Sequence, Tuple
+
+try:
+    import numpy as np
+except ImportError:  # NumPy es opcional
+    np = None
+
+from .geometry import data_overlap, find_overlaps
+from .validation import ERROR, FIELD_RULES, ValidationFinding
+
+
+HAS_NUMPY = np is not None
+
+# Reglas de límites en el orden de validate_field
+BOUNDS_RULES = ["FIELD_LINE", "FIELD_COLUMN", "FIELD_LENGTH", "FIELD_WIDTH", "BUFFER_WRAP"]
+
+_Placement = namedtuple("_Placement", "index line column length")
+
+# Los mensajes se obtienen de las mismas reglas que usa el motor
+_BOUNDS_CHECKS = {rule.code: rule.check for rule in FIELD_RULES if rule.code in BOUNDS_RULES}
+
+
+class FieldColumns:
+    """
+    Campos de varios mapas en columnas.
+
+    Los campos de cada mapa son contiguos: map_starts[m] es el índice del
+    primer campo del mapa m. Con NumPy las columnas son arrays int64; sin
+    NumPy son listas.
+    """
+
+    def __init__(self, lines: Sequence[int], columns: Sequence[int], lengths: Sequence[int],
+                 map_index: Sequence[int], map_sizes: Sequence[Tuple[int, int]],
+                 names: Optional[List[str]] = None, map_names: Optional[List[str]] = None,
+                 use_numpy: Optional[bool] = None):
+        self.use_numpy = HAS_NUMPY if use_numpy is None else (use_numpy and HAS_NUMPY)
+        convert = (lambda values: np.asarray(values, dtype=np.int64)) if self.use_numpy else list
+        self.lines = convert(lines)
+        self.columns = convert(columns)
+        self.lengths = convert(lengths)
+        self.map_index = convert(map_index)
+        self.map_lines = convert([size[0] for size in map_sizes])
+        self.map_cols = convert([size[1] for size in map_sizes])
+        self.names = names
+        self.map_names = map_names
+
+        counts = [0] * len(map_sizes)
+        for index in map_index:
+            counts[index] += 1
+        self.map_starts = [0] * len(map_sizes)
+        for index in range(1, len(map_sizes)):
+            self.map_starts[index] = self.map_starts[index - 1] + counts[index - 1]
+
+    @classmethod
+    def from_maps(cls, maps, use_numpy: Optional[bool] = None) -> "FieldColumns":
+        """Extrae las columnas de una lista de BMSMap"""
+        lines, columns, lengths, map_index, names = [], [], [], [], []
+        for index, bms_map in enumerate(maps):
+            for bms_field in bms_map.fields:
+                lines.append(bms_field.line)
+                columns.append(bms_field.column)
+                lengths.append(bms_field.length)
+                map_index.append(index)
+                names.append(bms_field.name)
+        return cls(lines, columns, lengths, map_index, [tuple(m.size) for m in maps],
+                   names, [m.name for m in maps], use_numpy)
+
+    def __len__(self) -> int:
+        return len(self.lines)
+
+    def placement(self, index: int) -> "_Placement":
+        """Posición y longitud del campo index"""
+        return _Placement(index, int(self.lines[index]), int(self.columns[index]), int(self.lengths[index]))
+
+    # ---- Límites ----
+
+    def bounds_violations(self) -> Dict[str, List[int]]:
+        """Índices de los campos que incumplen cada regla de límites"""
+        if self.use_numpy:
+            return self._bounds_numpy()
+        return self._bounds_python()
+
+    def _bounds_numpy(self) -> Dict[str, List[int]]:
+        rows = self.map_lines[self.map_index]
+        cols = self.map_cols[self.map_index]
+        masks = {
+            "FIELD_LINE": (self.lines < 1) | (self.lines > rows),
+            "FIELD_COLUMN": (self.columns < 1) | (self.columns > cols),
+            "FIELD_LENGTH": self.lengths < 1,
+            "FIELD_WIDTH": self.columns + self.lengths > cols,
+            "BUFFER_WRAP": (self.lines <= rows) & ((self.lines - 1) * cols + self.columns + self.lengths > rows * cols),
+        }
+        return {code: np.flatnonzero(mask).tolist() for code, mask in masks.items()}
+
+    def _bounds_python(self) -> Dict[str, List[int]]:
+        violations = {code: [] for code in BOUNDS_RULES}
+        map_lines, map_cols = self.map_lines, self.map_cols
+        for index, (line, column, length, m) in enumerate(zip(self.lines, self.columns, self.lengths, self.map_index)):
+            rows, cols = map_lines[m], map_cols[m]
+            if line < 1 or line > rows:
+                violations["FIELD_LINE"].append(index)
+            if column < 1 or column > cols:
+                violations["FIELD_COLUMN"].append(index)
+            if length < 1:
+                violations["FIELD_LENGTH"].append(index)
+            if column + length > cols:
+                violations["FIELD_WIDTH"].append(index)
+            if line <= rows and (line - 1) * cols + column + length > rows * cols:
+                violations["BUFFER_WRAP"].append(index)
+        return violations
+
+    # ---- Superposiciones ----
+
+    def overlapping_pairs(self) -> List[Tuple[int, int]]:
+        """
+        Pares (i, j) de campos del mismo mapa que se superponen, incluyendo el
+        byte de atributo (misma geometría que ScreenBuffer: los campos fuera
+        de la pantalla o sin longitud no ocupan celdas).
+
+        Con NumPy se detectan de forma vectorizada los mapas con alguna
+        superposición (orden por inicio y máximo acumulado de los finales);
+        solo para esos mapas se enumeran los pares exactos con el barrido.
+        """
+        if self.use_numpy:
+            maps = self._overlapping_maps_numpy()
+        else:
+            maps = range(len(self.map_starts))
+        pairs = []
+        for m in maps:
+            pairs.extend(self._map_pairs(int(m)))
+        return pairs
+
+    def _on_screen(self):
+        rows = self.map_lines[self.map_index]
+        cols = self.map_cols[self.map_index]
+        return ((self.lengths >= 1) & (self.lines >= 1) & (self.lines <= rows)
+                & (self.columns >= 1) & (self.columns <= cols))
+
+    def _overlapping_maps_numpy(self):
+        if not len(self):
+            return []
+        visible = self._on_screen()
+        map_index = self.map_index[visible]
+        cols = self.map_cols[map_index]
+        totals = (self.map_lines * self.map_cols)[map_index]
+
+        # Segmento [inicio, fin): byte de atributo en POS y datos, circular dentro del buffer
+        spans = np.minimum(self.lengths[visible] + 1, totals)
+        starts = ((self.lines[visible] - 1) * cols + self.columns[visible] - 1) % totals
+        ends = starts + spans
+        wraps = ends > totals
+
+        # Los segmentos que cruzan el final continúan en 0
+        segment_map = np.concatenate([map_index, map_index[wraps]])
+        segment_start = np.concatenate([starts, np.zeros(int(wraps.sum()), dtype=np.int64)])
+        segment_end = np.concatenate([np.minimum(ends, totals), (ends - totals)[wraps]])
+
+        # Desplazar cada mapa a su propio tramo para ordenar todo de una vez
+        map_base = np.concatenate([[0], np.cumsum(self.map_lines * self.map_cols)[:-1]])
+        segment_start = segment_start + map_base[segment_map]
+        segment_end = segment_end + map_base[segment_map]
+
+        if not len(segment_start):
+            return []
+        order = np.argsort(segment_start, kind="stable")
+        sorted_start = segment_start[order]
+        running_end = np.maximum.accumulate(segment_end[order])
+        overlapped = np.empty(len(order), dtype=bool)
+        overlapped[0] = False
+        overlapped[1:] = sorted_start[1:] < running_end[:-1]
+        return np.unique(segment_map[order][overlapped]).tolist()
+
+    def _map_pairs(self, m: int) -> List[Tuple[int, int]]:
+        start = self.map_starts[m]
+        end = self.map_starts[m + 1] if m + 1 < len(self.map_starts) else len(self)
+        rows, cols = int(self.map_lines[m]), int(self.map_cols[m])
+        placements = [self.placement(index) for index in range(start, end)]
+        placements = [p for p in placements
+                      if p.length >= 1 and 1 <= p.line <= rows and 1 <= p.column <= cols]
+        return [(first.index, second.index) for first, second in find_overlaps(placements, (rows, cols))]
+
+
+def validate_columns(columns: FieldColumns) -> List[ValidationFinding]:
+    """
+    Hallazgos de límites, longitud y superposición para todos los campos, con
+    los mismos códigos y mensajes que el motor de reglas, ordenados por mapa,
+    campo y regla (las superposiciones al final de cada mapa).
+    """
+    rule_order = {code: position for position, code in enumerate(BOUNDS_RULES)}
+    rows = []
+    for code, indices in columns.bounds_violations().items():
+        for index in indices:
+            m = int(columns.map_index[index])
+            rows.append((m, 0, index, rule_order[code], code, index))
+    for first, second in columns.overlapping_pairs():
+        m = int(columns.map_index[first])
+        rows.append((m, 1, first, second, "FIELD_OVERLAP", second))
+    rows.sort()
+
+    findings = []
+    for m, _, first, _, code, index in rows:
+        map_name = columns.map_names[m] if columns.map_names else ""
+        field_name = columns.names[index] if columns.names else ""
+        position = (int(columns.lines[index]), int(columns.columns[index]))
+        if code == "FIELD_OVERLAP":
+            first_name = columns.names[first] if columns.names else str(first)
+            map_size = (int(columns.map_lines[m]), int(columns.map_cols[m]))
+            if data_overlap(columns.placement(first), columns.placement(index), map_size):
+                message = f"Campos superpuestos: {first_name} y {field_name}"
+            else:
+                code = "ATTR_COLLISION"
+                message = f"Byte de atributo en conflicto: {first_name} y {field_name}"
+        else:
+            local = index - columns.map_starts[m] + 1
+            map_size = (int(columns.map_lines[m]), int(columns.map_cols[m]))
+            message = f"Campo {local}: {_BOUNDS_CHECKS[code](columns.placement(index), map_size)[0]}"
+        findings.append(ValidationFinding(code, ERROR, message, map_name, field_name, position))
+    return findings
+
+
+def validate_maps_columnar(maps, use_numpy: Optional[bool] = None) -> List[ValidationFinding]:
+    """Valida límites y superposiciones de una lista de mapas en bloque"""
+    return validate_columns(FieldColumns.from_maps(maps, use_numpy))
@@ -0,0 +1,220 @@
+"""
+Modo diferencial del generador: compara un mapa con su fuente anterior y
+produce solo las sentencias DFHMDF modificadas, añadidas o eliminadas.
+"""
+from bisect import bisect_left
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
+import sys
+from pathlib import Path
+
+# Añadir src al path para imports
+src_path = Path(__file__).parent.parent
+sys.path.insert(0, str(src_path))
+
+from models import BMSMap, BMSField
+from .source import BMSStatement, field_state, scan_statements, unmodeled_operands
+from .parser import parse_field_statement
+
+
+@dataclass
+class StatementChange:
+    """
+    Cambio sobre una sentencia DFHMDF del fuente anterior.
+
+    old_start/old_end es el rango de líneas reemplazado (1-based, inclusivo).
+    Para "added" el rango está vacío (old_end = old_start - 1) y las líneas
+    nuevas se insertan antes de old_start.
+    """
+    kind: str  # "changed", "added" o "removed"
+    key: str   # nombre del campo o POS=(línea,columna) para campos sin nombre
+    old_start: int
+    old_end: int
+    old_lines: List[str] = field(default_factory=list)
+    new_lines: List[str] = field(default_factory=list)
+
+
+def diff_map_source(generator, bms_map: BMSMap, previous_source: str) -> List[StatementChange]:
+    """
+    Compara los campos de bms_map con las sentencias DFHMDF de previous_source.
+
+    Los campos se emparejan por nombre (o por POS si el nombre es automático).
+    Los campos emparejados que mantienen el orden relativo (subsecuencia
+    creciente más larga) se comparan en su sitio; el resto se eliminan y se
+    insertan en su nueva posición, ya que BMS exige los campos ordenados.
+
+    Una sentencia cuenta como modificada solo si el campo que describe cambió
+    en el modelo; al regenerarla se conservan sus operandos no modelados
+    (JUSTIFY, GRPNAME, OCCURS...), igual que en BMSSourceDocument.
+    """
+    statements = scan_statements(previous_source)
+    previous_fields = [s for s in statements if s.directive == 'DFHMDF']
+
+    # Índice del fuente anterior por clave
+    by_key: Dict[Tuple, List[BMSStatement]] = {}
+    for statement in previous_fields:
+        by_key.setdefault(_statement_key(generator, statement), []).append(statement)
+    for candidates in by_key.values():
+        candidates.reverse()  # pop() devuelve la primera aparición
+
+    # Emparejar cada campo actual con su sentencia anterior
+    entries: List[Tuple[BMSField, BMSStatement, Optional[BMSStatement]]] = []
+    for bms_field in generator.ordered_fields(bms_map):
+        code = generator.generate_field_code(bms_field)
+        new_statement = scan_statements(code)[0]
+        candidates = by_key.get(_statement_key(generator, new_statement))
+        old_statement = candidates.pop() if candidates else None
+        if old_statement is not None:
+            extra = unmodeled_operands(old_statement)
+            if extra:
+                new_statement = scan_statements(generator.generate_field_code(bms_field, extra))[0]
+        entries.append((bms_field, new_statement, old_statement))
+
+    stable = _longest_increasing(
+        [(index, old.start_line) for index, (_, _, old) in enumerate(entries) if old]
+    )
+
+    changes: List[StatementChange] = []
+    matched = set()
+    anchor = _header_anchor(statements, previous_fields)
+
+    for index, (bms_field, new_statement, old_statement) in enumerate(entries):
+        key = _display_key(new_statement, bms_field)
+
+        if old_statement is not None:
+            matched.add(id(old_statement))
+            if index in stable:
+                if _field_changed(bms_field, old_statement):
+                    changes.append(StatementChange(
+                        "changed", key, old_statement.start_line, old_statement.end_line,
+                        old_statement.lines, new_statement.lines
+                    ))
+                anchor = old_statement.end_line
+                continue
+            # Fuera de orden: se elimina en su sitio y se inserta en el nuevo
+            changes.append(StatementChange(
+                "removed", key, old_statement.start_line, old_statement.end_line, old_statement.lines, []
+            ))
+
+        changes.append(StatementChange("added", key, anchor + 1, anchor, [], new_statement.lines))
+
+    for statement in previous_fields:
+        if id(statement) not in matched:
+            changes.append(StatementChange(
+                "removed", statement.label or _pos_key(statement.parameters),
+                statement.start_line, statement.end_line, statement.lines, []
+            ))
+
+    # Orden por posición en el fuente anterior; las inserciones van antes
+    # que cualquier otro cambio que empiece en la misma línea
+    changes.sort(key=lambda c: (c.old_start, 0 if c.kind == "added" else 1))
+    return changes
+
+
+def apply_statement_changes(previous_source: str, changes: List[StatementChange]) -> str:
+    """Aplica los cambios al fuente anterior y retorna el fuente resultante"""
+    lines = previous_source.split('\n')
+    result: List[str] = []
+    position = 1
+
+    for change in sorted(changes, key=lambda c: (c.old_start, 0 if c.kind == "added" else 1)):
+        result.extend(lines[position - 1:change.old_start - 1])
+        result.extend(change.new_lines)
+        position = max(position, change.old_end + 1, change.old_start)
+
+    result.extend(lines[position - 1:])
+    return "\n".join(result)
+
+
+def format_patch(changes: List[StatementChange], old_name: str = "a", new_name: str = "b") -> str:
+    """Formatea los cambios como un parche unificado sin líneas de contexto"""
+    if not changes:
+        return ""
+
+    output = [f"--- {old_name}", f"+++ {new_name}"]
+    delta = 0
+
+    for change in changes:
+        old_count = change.old_end - change.old_start + 1
+        new_count = len(change.new_lines)
+        new_start = change.old_start + delta
+
+        # Convención unificada: un rango vacío indica la línea anterior
+        old_header = change.old_start if old_count else change.old_start - 1
+        new_header = new_start if new_count else new_start - 1
+
+        output.append(f"@@ -{old_header},{old_count} +{new_header},{new_count} @@ {change.kind} {change.key}")
+        output.extend(f"-{line}" for line in change.old_lines)
+        output.extend(f"+{line}" for line in change.new_lines)
+        delta += new_count - old_count
+
+    return "\n".join(output) + "\n"
+
+
+def _field_changed(bms_field: BMSField, statement: BMSStatement) -> bool:
+    """
+    Compara el campo con el que describe la sentencia anterior. El nombre ya
+    coincide por el emparejamiento (o ambos son automáticos), así que se
+    compara el resto del estado y no el texto: el formato original no cuenta.
+    """
+    previous = parse_field_statement(statement)
+    return previous is None or field_state(previous)[1:] != field_state(bms_field)[1:]
+
+
+def _statement_key(generator, statement: BMSStatement) -> Tuple:
+    """Clave de emparejamiento: nombre del campo, o POS si no tiene nombre o es automático"""
+    label = statement.label
+    if label and not generator._is_auto_generated_name(label):
+        return ("name", label)
+    return ("pos", _pos_key(statement.parameters))
+
+
+def _pos_key(parameters: str) -> str:
+    """Extrae el operando POS=(...) como texto"""
+    start = parameters.find("POS=")
+    if start < 0:
+        return ""
+    end = parameters.find(")", start)
+    return parameters[start:end + 1] if end >= 0 else parameters[start:]
+
+
+def _display_key(statement: BMSStatement, bms_field: BMSField) -> str:
+    return statement.label or f"POS=({bms_field.line},{bms_field.column})"
+
+
+def _header_anchor(statements: List[BMSStatement], previous_fields: List[BMSStatement]) -> int:
+    """Línea tras la cual se insertan los campos que van antes que cualquier otro"""
+    for statement in statements:
+        if statement.directive == 'DFHMDI':
+            return statement.end_line
+    if previous_fields:
+        return previous_fields[0].start_line - 1
+    headers = [s for s in statements if s.directive == 'DFHMSD']
+    return headers[0].end_line if headers else 0
+
+
+def _longest_increasing(pairs: List[Tuple[int, int]]) -> set:
+    """
+    Retorna los índices de la subsecuencia más larga con valores crecientes
+    (O(n log n), patience sorting).
+    """
+    tails: List[int] = []      # valor final de cada longitud
+    tail_pos: List[int] = []   # posición en pairs del final de cada longitud
+    previous: List[int] = []
+
+    for pos, (_, value) in enumerate(pairs):
+        length = bisect_left(tails, value)
+        if length == len(tails):
+            tails.append(value)
+            tail_pos.append(pos)
+        else:
+            tails[length] = value
+            tail_pos[length] = pos
+        previous.append(tail_pos[length - 1] if length else -1)
+
+    stable = set()
+    pos = tail_pos[-1] if tail_pos else -1
+    while pos >= 0:
+        stable.add(pairs[pos][0])
+        pos = previous[pos]
+    return stable
@@ -1,7 +1,7 @@
 """
 Generador de código BMS desde modelos
 """
-from typing import List, Optional
+from typing import Dict, List, Optional
 import sys
 import os
 from pathlib import Path
@@ -10,23 +10,52 @@ from pathlib import Path
 src_path = Path(__file__).parent.parent
 sys.path.insert(0, str(src_path))
 
-from models import BMSProject, BMSMap, BMSField
-import re
+from models import BMSProject, BMSMap, BMSField, DEFAULT_CTRL
+from .templates import TemplateSet, CONTENT_END_COLUMN, CONTINUATION_MARKER, TITLE_COMMENT_PREFIX
+from .diff import StatementChange, diff_map_source, format_patch
+from .names import is_auto_generated_name
+from .validation import ValidationEngine, ValidationFinding, is_valid_bms_name
+
+
+# Columna de inicio de las líneas de continuación (el contenido termina en la 71
+# y el marcador va en la 72, ver templates.py)
+CONTINUATION_COLUMN = 16
+CONTINUATION_INDENT = " " * (CONTINUATION_COLUMN - 1)
+
+
+def _quote_literal(value: str) -> str:
+    """Devuelve un literal BMS entre apóstrofos con ' y & duplicados"""
+    return "'" + value.replace("'", "''").replace("&", "&&") + "'"
+
+
+def _is_quoted_operand(operand: str) -> bool:
+    """Indica si un operando es un literal entre apóstrofos (INITIAL='...', PICIN='...')"""
+    return "='" in operand and operand.endswith("'")
 
 
 class BMSGenerator:
     """Clase para generar código BMS desde modelos"""
     
-    def __init__(self):
-        self.templates = self._load_templates()
+    def __init__(self, canonical: bool = False, templates: Optional[Dict[str, str]] = None,
+                 template_vars: Optional[Dict[str, str]] = None):
+        """
+        Si canonical es True se genera la forma canónica del mapa: atributos y
+        CTRL en orden fijo, literales con apóstrofos y ampersands duplicados y
+        valores por defecto explícitos, de modo que pantallas idénticas producen
+        exactamente los mismos bytes.
+        
+        templates permite reemplazar las plantillas del sitio (comment_banner,
+        mapset_header, map_header, map_footer, mapset_footer) y template_vars
+        define variables constantes que se resuelven al compilarlas.
+        """
+        self.canonical = canonical
+        self.templates = self._load_templates(templates, template_vars)
+        self.validation_engine = ValidationEngine()
         
-    def _load_templates(self) -> dict:
-        """Carga plantillas de código BMS"""
-        return {
-            "mapset_header": "{mapset_name:<8} DFHMSD TYPE=&SYSPARM,MODE={mode},LANG={lang},          *\n               TERM={term},CTRL=({ctrl}),STORAGE={storage}",
-            "map_header": "{map_name:<8} DFHMDI SIZE=({lines},{cols})",
-            "mapset_footer": "         DFHMSD TYPE=FINAL\n         END"
-        }
+    def _load_templates(self, templates: Optional[Dict[str, str]] = None,
+                        template_vars: Optional[Dict[str, str]] = None) -> TemplateSet:
+        """Carga y compila las plantillas de código BMS (una sola vez por generador)"""
+        return TemplateSet(templates, template_vars)
         
     def generate_map_code(self, bms_map: BMSMap) -> str:
         """Genera el código BMS para un mapa específico"""
@@ -35,45 +64,83 @@ class BMSGenerator:
             
         lines = []
         
+        # Banner de comentarios del sitio (vacío por defecto)
+        if self.templates["comment_banner"]:
+            lines.append(self.templates["comment_banner"].render({
+                "mapset_name": bms_map.mapset_name,
+                "map_name": bms_map.name
+            }))
+        
         # Cabecera del mapset
-        ctrl_str = ",".join(bms_map.ctrl) if bms_map.ctrl else "FREEKB,FRSET"
-        header = self.templates["mapset_header"].format(
-            mapset_name=bms_map.mapset_name,
-            mode=bms_map.mode,
-            lang=bms_map.lang,
-            term=bms_map.term,
-            ctrl=ctrl_str,
-            storage=bms_map.storage
-        ).strip()
+        if self.canonical:
+            ctrl_str = ",".join(bms_map.canonical_ctrl())
+        else:
+            ctrl_str = ",".join(bms_map.ctrl) if bms_map.ctrl else ",".join(DEFAULT_CTRL)
+        header = self.templates["mapset_header"].render({
+            "mapset_name": bms_map.mapset_name,
+            "mode": bms_map.mode,
+            "lang": bms_map.lang,
+            "term": bms_map.term,
+            "ctrl": ctrl_str,
+            "storage": bms_map.storage
+        })
         lines.append(header)
         
         # Cabecera del mapa
-        map_header = self.templates["map_header"].format(
-            map_name=bms_map.name,
-            lines=bms_map.size[0],
-            cols=bms_map.size[1]
-        ).strip()
+        map_header = self.templates["map_header"].render({
+            "map_name": bms_map.name,
+            "lines": bms_map.size[0],
+            "cols": bms_map.size[1]
+        })
         lines.append(map_header)
         
         # Título si existe
         if bms_map.title:
-            lines.append(f"*        TITLE: {bms_map.title}")
+            lines.append(TITLE_COMMENT_PREFIX + bms_map.title)
             
         # Campos ordenados por posición
-        sorted_fields = sorted(bms_map.fields, key=lambda f: (f.line, f.column))
-        
-        for field in sorted_fields:
+        for field in self.ordered_fields(bms_map):
             field_code = self.generate_field_code(field)
             lines.append(field_code)
             
-        # Pie del mapset
-        footer = self.templates["mapset_footer"].strip()
+        # Pie del mapa (vacío por defecto) y del mapset
+        if self.templates["map_footer"]:
+            lines.append(self.templates["map_footer"].render({"map_name": bms_map.name}))
+        footer = self.templates["mapset_footer"].render({"mapset_name": bms_map.mapset_name})
         lines.append(footer)
         
-        return "\n".join(lines)
+        code = "\n".join(lines)
         
-    def generate_field_code(self, field: BMSField) -> str:
-        """Genera el código BMS para un campo específico"""
+        # En modo canónico la salida siempre termina en un único salto de línea
+        return code + "\n" if self.canonical else code
+        
+    def ordered_fields(self, bms_map: BMSMap) -> List[BMSField]:
+        """Campos en el orden de generación: por posición (y por nombre en modo canónico, para desempatar)"""
+        if self.canonical:
+            return sorted(bms_map.fields, key=lambda f: (f.line, f.column, f.name))
+        return sorted(bms_map.fields, key=lambda f: (f.line, f.column))
+        
+    def generate_diff(self, bms_map: BMSMap, previous_source: str) -> List[StatementChange]:
+        """
+        Compara el mapa con el fuente generado o parseado anteriormente y retorna
+        solo las sentencias DFHMDF cambiadas, añadidas o eliminadas, con sus
+        rangos de líneas en el fuente anterior.
+        """
+        if not bms_map:
+            return []
+        return diff_map_source(self, bms_map, previous_source)
+        
+    def generate_patch(self, bms_map: BMSMap, previous_source: str, old_name: str = "a", new_name: str = "b") -> str:
+        """Genera un parche unificado mínimo (sin contexto) entre el fuente anterior y el mapa"""
+        return format_patch(self.generate_diff(bms_map, previous_source), old_name, new_name)
+        
+    def generate_field_code(self, field: BMSField, extra_params: Optional[List[str]] = None) -> str:
+        """
+        Genera el código BMS para un campo específico.
+        
+        extra_params son operandos adicionales (no modelados en BMSField) que se
+        añaden al final, por ejemplo los conservados del fuente original.
+        """
         if not field:
             return ""
             
@@ -84,9 +151,19 @@ class BMSGenerator:
         field_name = "" if is_auto_generated_name else field.name
         
         # Construir la línea completa del campo
-        return self._build_field_line(field_name, field)
+        return self._build_field_line(field_name, field, extra_params)
         
-    def _build_field_line(self, field_name: str, field: BMSField) -> str:
+    def render_statement(self, label: str, directive: str, operands: List[str]) -> str:
+        """Renderiza una sentencia BMS arbitraria (DFHMSD, DFHMDI...) manejando continuaciones"""
+        prefix = f"{label:<8} {directive} "
+        if not operands:
+            return prefix.rstrip()
+        full_line = prefix + ",".join(operands)
+        if len(full_line) > CONTENT_END_COLUMN:
+            return self._build_continuation_line(prefix, operands[0], operands[1:])
+        return full_line
+        
+    def _build_field_line(self, field_name: str, field: BMSField, extra_params: Optional[List[str]] = None) -> str:
         """Construye la línea BMS para un campo, manejando continuaciones"""
         
         # Construir parámetros base
@@ -94,12 +171,45 @@ class BMSGenerator:
         length_param = f"LENGTH={field.length}"
         
         # Construir parámetros adicionales
+        if self.canonical:
+            params = self._build_canonical_params(field)
+        else:
+            params = self._build_params(field)
+        if extra_params:
+            params = params + list(extra_params)
+        
+        # Construir línea base
+        base_params = f"{pos_param},{length_param}"
+        if params:
+            all_params = base_params + "," + ",".join(params)
+        else:
+            all_params = base_params
+            
+        # Determinar formato según nombre y longitud
+        if field_name:
+            # Campo con nombre: "NOMBRE   DFHMDF ..."
+            prefix = f"{field_name:<8} DFHMDF "
+        else:
+            # Campo sin nombre: "         DFHMDF ..."
+            prefix = "         DFHMDF "
+            
+        full_line = prefix + all_params
+        
+        # Verificar si necesita continuación (línea > 71 caracteres)
+        if len(full_line) > CONTENT_END_COLUMN:
+            # Necesita continuación - dividir los parámetros
+            return self._build_continuation_line(prefix, base_params, params)
+        else:
+            return full_line
+            
+    def _build_params(self, field: BMSField) -> List[str]:
+        """Construye los operandos adicionales de un campo (después de POS y LENGTH)"""
         params = []
         
         # INITIAL siempre va primero después de LENGTH
         if field.initial_value:
-            escaped_value = field.initial_value.replace("'", "''")
-            params.append(f"INITIAL='{escaped_value}'")
+            # Apóstrofos y ampersands duplicados (el parser los reduce al leer)
+            params.append(f"INITIAL={_quote_literal(field.initial_value)}")
             
         # ATTRB
         if field.attributes:
@@ -125,159 +235,122 @@ class BMSGenerator:
         # HILIGHT
         if field.hilight:
             params.append(f"HILIGHT={field.hilight}")
-        
-        # Construir línea base
-        base_params = f"{pos_param},{length_param}"
-        if params:
-            all_params = base_params + "," + ",".join(params)
-        else:
-            all_params = base_params
             
-        # Determinar formato según nombre y longitud
-        if field_name:
-            # Campo con nombre: "NOMBRE   DFHMDF ..."
-            prefix = f"{field_name:<8} DFHMDF "
-        else:
-            # Campo sin nombre: "         DFHMDF ..."
-            prefix = "         DFHMDF "
+        return params
+        
+    def _build_canonical_params(self, field: BMSField) -> List[str]:
+        """
+        Construye los operandos adicionales en forma canónica:
+        - ATTRB siempre explícito (ASKIP,NORM por defecto) y en orden fijo
+        - Literales con apóstrofos y ampersands duplicados
+        - COLOR y HILIGHT en mayúsculas
+        """
+        params = []
+        
+        if field.initial_value:
+            params.append(f"INITIAL={_quote_literal(field.initial_value)}")
             
-        full_line = prefix + all_params
+        attrs = [attr.value for attr in field.canonical_attributes()]
+        params.append(f"ATTRB=({','.join(attrs) if attrs else 'ASKIP,NORM'})")
         
-        # Verificar si necesita continuación (línea > 71 caracteres)
-        if len(full_line) > 71:
-            # Necesita continuación - dividir los parámetros
-            return self._build_continuation_line(prefix, base_params, params)
-        else:
-            return full_line
+        picin = field.picin or field.picture
+        if picin:
+            params.append(f"PICIN={_quote_literal(picin)}")
+        if field.picout:
+            params.append(f"PICOUT={_quote_literal(field.picout)}")
+            
+        if field.color:
+            params.append(f"COLOR={field.color.upper()}")
+        if field.hilight:
+            params.append(f"HILIGHT={field.hilight.upper()}")
+            
+        return params
             
     def _build_continuation_line(self, prefix: str, base_params: str, additional_params: list) -> str:
-        """Construye una línea con continuación BMS"""
+        """
+        Construye una sentencia BMS con continuaciones según las reglas del ensamblador:
+        - Columnas 1-71: contenido de la sentencia
+        - Columna 72: marcador de continuación ('*') si la sentencia sigue
+        - Columna 16: inicio del contenido en cada línea de continuación
         
-        # Primera línea: DFHMDF + parámetros básicos + primer parámetro adicional si cabe
-        first_line = prefix + base_params
+        Los operandos se empaquetan por ancho usando longitudes precalculadas, y los
+        literales que no caben en una línea se parten en la columna 71.
+        """
+        operands = [base_params] + list(additional_params)
+        widths = [len(operand) for operand in operands]
+        last_index = len(operands) - 1
         
-        remaining_params = additional_params[:]
+        lines = []
+        current = [prefix]
+        used = len(prefix)
         
-        # Intentar agregar parámetros a la primera línea hasta llegar al límite
-        while remaining_params:
-            next_param = remaining_params[0]
-            test_line = first_line + "," + next_param
+        for index, operand in enumerate(operands):
+            # Ancho del operando más la coma separadora si no es el último
+            needed = widths[index] + (0 if index == last_index else 1)
             
-            # Dejar espacio para ",          *" (12 caracteres)
-            if len(test_line) + 12 <= 71:
-                first_line = test_line
-                remaining_params.pop(0)
+            if used + needed <= CONTENT_END_COLUMN:
+                current.append(operand)
+                used += widths[index]
+            elif CONTINUATION_COLUMN - 1 + needed <= CONTENT_END_COLUMN or not _is_quoted_operand(operand):
+                # Cabe en una línea nueva (o no se puede partir): saltar de línea
+                lines.append(current)
+                current = [CONTINUATION_INDENT, operand]
+                used = len(CONTINUATION_INDENT) + widths[index]
             else:
-                break
-        
-        # Si quedan parámetros, crear línea de continuación
-        if remaining_params:
-            first_line += ",          *"
-            continuation_line = f"               {','.join(remaining_params)}"
-            return first_line + "\n" + continuation_line
-        else:
-            return first_line
+                # Literal demasiado largo: partirlo en la columna 71
+                keyword_width = operand.index("'") + 1
+                if used + keyword_width >= CONTENT_END_COLUMN:
+                    lines.append(current)
+                    current = [CONTINUATION_INDENT]
+                    used = len(CONTINUATION_INDENT)
+                    
+                start = 0
+                while needed - start > CONTENT_END_COLUMN - used:
+                    # Se llena hasta la columna 71: un blanco de relleno formaría
+                    # parte del literal, y el ensamblador une un '' partido
+                    cut = start + CONTENT_END_COLUMN - used
+                    current.append(operand[start:cut])
+                    lines.append(current)
+                    current = [CONTINUATION_INDENT]
+                    used = len(CONTINUATION_INDENT)
+                    start = cut
+                    
+                current.append(operand[start:])
+                used += widths[index] - start
+                
+            if index != last_index:
+                current.append(",")
+                used += 1
+                
+        # Todas las líneas menos la última llevan el marcador en la columna 72
+        rendered = ["".join(parts).ljust(CONTENT_END_COLUMN) + CONTINUATION_MARKER for parts in lines]
+        rendered.append("".join(current))
+        return "\n".join(rendered)
         
     def validate_map(self, bms_map: BMSMap) -> List[str]:
         """Valida un mapa BMS y retorna lista de errores"""
-        errors = []
-        
         if not bms_map:
-            errors.append("Mapa no puede ser None")
-            return errors
-            
-        # Validar nombre del mapa
-        if not bms_map.name or not self._is_valid_name(bms_map.name):
-            errors.append("Nombre del mapa inválido (debe ser alfanumérico, máximo 8 caracteres)")
-            
-        # Validar nombre del mapset
-        if not bms_map.mapset_name or not self._is_valid_name(bms_map.mapset_name):
-            errors.append("Nombre del mapset inválido (debe ser alfanumérico, máximo 8 caracteres)")
-            
-        # Validar tamaño
-        if bms_map.size[0] < 1 or bms_map.size[0] > 24:
-            errors.append("Número de líneas debe estar entre 1 y 24")
-            
-        if bms_map.size[1] < 1 or bms_map.size[1] > 80:
-            errors.append("Número de columnas debe estar entre 1 y 80")
-            
-        # Validar campos
-        field_names = set()
-        for i, field in enumerate(bms_map.fields):
-            field_errors = self.validate_field(field, bms_map.size)
-            errors.extend([f"Campo {i+1}: {err}" for err in field_errors])
-            
-            # Verificar nombres únicos
-            if field.name in field_names:
-                errors.append(f"Nombre de campo duplicado: {field.name}")
-            field_names.add(field.name)
-            
-        return errors
+            return ["Mapa no puede ser None"]
+        return [finding.message for finding in self.validate_map_findings(bms_map)]
+        
+    def validate_map_findings(self, bms_map: BMSMap) -> List[ValidationFinding]:
+        """
+        Valida un mapa y retorna hallazgos estructurados (código, severidad,
+        campo, posición). Los resultados por campo se cachean: tras una
+        edición solo se reejecutan las reglas afectadas.
+        """
+        return self.validation_engine.validate(bms_map)
         
     def validate_field(self, field: BMSField, map_size: tuple) -> List[str]:
         """Valida un campo BMS"""
-        errors = []
-        
         if not field:
-            errors.append("Campo no puede ser None")
-            return errors
-            
-        # Validar nombre
-        if not field.name or not self._is_valid_name(field.name):
-            errors.append("Nombre del campo inválido")
-            
-        # Validar posición
-        if field.line < 1 or field.line > map_size[0]:
-            errors.append(f"Línea fuera de rango (1-{map_size[0]})")
-            
-        if field.column < 1 or field.column > map_size[1]:
-            errors.append(f"Columna fuera de rango (1-{map_size[1]})")
-            
-        # Validar longitud
-        if field.length < 1:
-            errors.append("Longitud debe ser mayor a 0")
-            
-        # Verificar que el campo no se salga de la pantalla
-        if field.column + field.length - 1 > map_size[1]:
-            errors.append("Campo se extiende más allá del ancho de la pantalla")
-            
-        return errors
+            return ["Campo no puede ser None"]
+        return self.validation_engine.validate_field(field, map_size)
         
     def _is_valid_name(self, name: str) -> bool:
         """Valida si un nombre es válido para BMS (alfanumérico, max 8 chars)"""
-        if not name or len(name) > 8:
-            return False
-        return re.match(r'^[A-Za-z][A-Za-z0-9]*$', name) is not None
+        return is_valid_bms_name(name)
 
     def _is_auto_generated_name(self, name: str) -> bool:
         """Determina si un nombre de campo es generado automáticamente por la aplicación"""
-        if not name:
-            return True
-            
-        # Patrones de nombres automáticos generados por la aplicación:
-        
-        # 1. FIELD01, FIELD02, etc. (del parser estructurado)
-        if re.match(r'^FIELD\d{2}$', name):
-            return True
-            
-        # 2. CAMPO01, CAMPO02, etc. (de nuevo campo manual)
-        if re.match(r'^CAMPO\d{2}$', name):
-            return True
-            
-        # 3. FIELD_línea_columna (de parsing legacy sin nombre)
-        if re.match(r'^FIELD_\d+_\d+$', name):
-            return True
-            
-        # 4. Nombres genéricos
-        if name in ['UNNAMED', 'UNNAMED_FIELD', 'FIELD', 'CAMPO']:
-            return True
-            
-        # 5. Nombres que empiecen con prefijos específicos de generación automática
-        # Solo consideramos patrones específicos, no cualquier cosa que empiece con estos prefijos
-        if re.match(r'^AUTO_[A-Z0-9_]+$', name):
-            return True
-            
-        if re.match(r'^GEN_[A-Z0-9_]+$', name):
-            return True
-            
-        return False
+        return is_auto_generated_name(name)
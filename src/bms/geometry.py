@@ -0,0 +1,103 @@
+"""
+Geometría del buffer 3270: posiciones de campos como desplazamientos lineales
+y detección de superposiciones por barrido.
+
+En BMS, POS=(línea,columna) es la posición del byte de atributo y los datos
+ocupan las LENGTH posiciones siguientes.
+"""
+import heapq
+from typing import Iterable, List, Tuple
+
+
+def buffer_offset(line: int, column: int, cols: int = 80) -> int:
+    """Desplazamiento en el buffer (0-based) de una posición (línea, columna) 1-based"""
+    return (line - 1) * cols + column - 1
+
+
+def field_span(field, cols: int = 80) -> Tuple[int, int]:
+    """
+    Rango [inicio, fin) que ocupa un campo en el buffer: el byte de atributo
+    en POS seguido de los datos. El rango puede terminar después del final
+    del buffer.
+    """
+    start = buffer_offset(field.line, field.column, cols)
+    return start, start + 1 + max(field.length, 0)
+
+
+def field_segments(field, size: Tuple[int, int] = (24, 80)) -> List[Tuple[int, int]]:
+    """
+    Segmentos [inicio, fin) del campo dentro del buffer. Un campo que se sale
+    del final del buffer continúa en la posición 0 (el buffer 3270 es
+    circular), por lo que puede devolver dos segmentos.
+    """
+    start, end = field_span(field, size[1])
+    return _circular_segments(start, end - start, size[0] * size[1])
+
+
+def data_segments(field, size: Tuple[int, int] = (24, 80)) -> List[Tuple[int, int]]:
+    """Segmentos [inicio, fin) de los datos del campo (sin el byte de atributo)"""
+    start = buffer_offset(field.line, field.column, size[1]) + 1
+    return _circular_segments(start, max(field.length, 0), size[0] * size[1])
+
+
+def _circular_segments(start: int, length: int, total: int) -> List[Tuple[int, int]]:
+    if length <= 0:
+        return []
+    if length >= total:
+        return [(0, total)]
+    start %= total
+    end = start + length
+    if end <= total:
+        return [(start, end)]
+    return [(start, total), (0, end - total)]
+
+
+def wraps_around(field, size: Tuple[int, int] = (24, 80)) -> bool:
+    """Indica si el campo (con su byte de atributo) cruza el final del buffer"""
+    return len(field_segments(field, size)) > 1
+
+
+def find_overlaps(fields: Iterable, size: Tuple[int, int] = (24, 80), exclude_field=None) -> List[Tuple]:
+    """
+    Pares de campos cuyos rangos en el buffer se superponen.
+
+    Barrido sobre desplazamientos: los segmentos se ordenan por inicio y se
+    mantiene un montículo de segmentos activos por fin. Cada segmento solo
+    se compara con los activos, por lo que el coste es O(n log n + k) para
+    k superposiciones. Los pares se devuelven en el orden de la lista.
+    """
+    order = {}
+    segments = []
+    for index, bms_field in enumerate(fields):
+        if bms_field is exclude_field:
+            continue
+        order[index] = bms_field
+        for start, end in field_segments(bms_field, size):
+            segments.append((start, end, index))
+    segments.sort()
+
+    active: List[Tuple[int, int]] = []  # (fin, índice)
+    pairs = set()
+    for start, end, index in segments:
+        while active and active[0][0] <= start:
+            heapq.heappop(active)
+        for _, other in active:
+            if other != index:
+                pairs.add((other, index) if other < index else (index, other))
+        heapq.heappush(active, (end, index))
+
+    return [(order[first], order[second]) for first, second in sorted(pairs)]
+
+
+def spans_overlap(field1, field2, size: Tuple[int, int] = (24, 80)) -> bool:
+    """Verifica si dos campos se superponen en el buffer"""
+    return _segments_intersect(field_segments(field1, size), field_segments(field2, size))
+
+
+def data_overlap(field1, field2, size: Tuple[int, int] = (24, 80)) -> bool:
+    """Verifica si los datos de dos campos se superponen (sin contar los bytes de atributo)"""
+    return _segments_intersect(data_segments(field1, size), data_segments(field2, size))
+
+
+def _segments_intersect(first: List[Tuple[int, int]], second: List[Tuple[int, int]]) -> bool:
+    return any(start1 < end2 and start2 < end1 for start1, end1 in first for start2, end2 in second)
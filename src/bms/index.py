@@ -0,0 +1,248 @@
+"""
+Índice invertido de un proyecto para consultas entre mapas.
+
+Relaciona cada nombre de campo con los mapas que lo usan, cada literal
+INITIAL con sus posiciones y cada firma de diseño (pantalla completa,
+cabecera y pie) con los mapas que la comparten. Se construye de forma
+incremental a medida que se cargan los mapas: añadir, quitar o actualizar
+un mapa solo recorre los campos de ese mapa, y las consultas son búsquedas
+directas en diccionarios.
+"""
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, NamedTuple, Optional
+import hashlib
+import sys
+from pathlib import Path
+
+# Añadir src al path para imports
+src_path = Path(__file__).parent.parent
+sys.path.insert(0, str(src_path))
+
+from models import BMSMap, BMSProject
+
+
+# Líneas que se consideran cabecera y pie de la pantalla
+HEADER_LINES = 3
+FOOTER_LINES = 2
+
+# Tipos de firma de diseño
+LAYOUT_KINDS = ("screen", "header", "footer")
+
+
+class LiteralPosition(NamedTuple):
+    """Aparición de un literal INITIAL"""
+    bms_map: BMSMap
+    field_name: str
+    line: int
+    column: int
+
+
+@dataclass
+class _MapEntry:
+    """Aportaciones de un mapa al índice (para poder retirarlas)"""
+    bms_map: BMSMap
+    field_names: Dict[str, int]
+    literals: Dict[str, List[LiteralPosition]]
+    layouts: Dict[str, Optional[str]]
+
+
+def _field_layout(bms_field) -> str:
+    # El diseño es la geometría y los atributos; nombres y literales se indexan aparte
+    attributes = "+".join(attr.value for attr in bms_field.canonical_attributes())
+    return f"{bms_field.line},{bms_field.column},{bms_field.length},{attributes}"
+
+
+def _signature(parts: List[str]) -> Optional[str]:
+    if not parts:
+        return None
+    data = "|".join(sorted(parts)).encode("utf-8")
+    return hashlib.blake2b(data, digest_size=16).hexdigest()
+
+
+def layout_signatures(bms_map: BMSMap, header_lines: int = HEADER_LINES,
+                      footer_lines: int = FOOTER_LINES) -> Dict[str, Optional[str]]:
+    """
+    Firmas de diseño de un mapa: pantalla completa (incluye el tamaño),
+    cabecera (campos de las primeras header_lines líneas) y pie (campos de
+    las últimas footer_lines líneas). None si la zona no tiene campos.
+    """
+    rows = bms_map.size[0]
+    screen, header, footer = [], [], []
+    for bms_field in bms_map.fields:
+        layout = _field_layout(bms_field)
+        screen.append(layout)
+        if bms_field.line <= header_lines:
+            header.append(layout)
+        if bms_field.line > rows - footer_lines:
+            # El pie se compara por línea relativa al final de la pantalla
+            footer.append(f"{bms_field.line - rows}:{layout.split(',', 1)[1]}")
+    screen_signature = _signature(screen)
+    if screen_signature:
+        screen_signature = _signature([f"{rows}x{bms_map.size[1]}", screen_signature])
+    return {"screen": screen_signature, "header": _signature(header), "footer": _signature(footer)}
+
+
+class ProjectIndex:
+    """
+    Índice invertido de los mapas de un proyecto.
+
+    Los mapas se identifican por objeto (no por nombre), de modo que un mapa
+    renombrado se actualiza con update_map sin dejar entradas huérfanas.
+    """
+
+    def __init__(self, header_lines: int = HEADER_LINES, footer_lines: int = FOOTER_LINES):
+        self.header_lines = header_lines
+        self.footer_lines = footer_lines
+        self._entries: Dict[int, _MapEntry] = {}
+        # nombre de campo -> {id(mapa): mapa}
+        self._field_maps: Dict[str, Dict[int, BMSMap]] = {}
+        # literal -> {id(mapa): [posiciones]}
+        self._literal_positions: Dict[str, Dict[int, List[LiteralPosition]]] = {}
+        # tipo de firma -> firma -> {id(mapa): mapa}
+        self._layout_maps: Dict[str, Dict[str, Dict[int, BMSMap]]] = {kind: {} for kind in LAYOUT_KINDS}
+
+    @classmethod
+    def from_project(cls, project: Optional[BMSProject], **kwargs) -> "ProjectIndex":
+        index = cls(**kwargs)
+        if project:
+            index.add_maps(project.maps)
+        return index
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, bms_map: BMSMap) -> bool:
+        return id(bms_map) in self._entries
+
+    # ---- Mantenimiento ----
+
+    def add_maps(self, maps: Iterable[BMSMap]):
+        for bms_map in maps:
+            self.add_map(bms_map)
+
+    def add_map(self, bms_map: BMSMap):
+        """Indexa un mapa (si ya estaba indexado, lo actualiza)"""
+        key = id(bms_map)
+        if key in self._entries:
+            self.remove_map(bms_map)
+
+        field_names: Dict[str, int] = {}
+        literals: Dict[str, List[LiteralPosition]] = {}
+        for bms_field in bms_map.fields:
+            if bms_field.name:
+                field_names[bms_field.name] = field_names.get(bms_field.name, 0) + 1
+            if bms_field.initial_value:
+                literals.setdefault(bms_field.initial_value, []).append(
+                    LiteralPosition(bms_map, bms_field.name, bms_field.line, bms_field.column))
+        layouts = layout_signatures(bms_map, self.header_lines, self.footer_lines)
+
+        self._entries[key] = _MapEntry(bms_map, field_names, literals, layouts)
+        for name in field_names:
+            self._field_maps.setdefault(name, {})[key] = bms_map
+        for literal, positions in literals.items():
+            self._literal_positions.setdefault(literal, {})[key] = positions
+        for kind, signature in layouts.items():
+            if signature:
+                self._layout_maps[kind].setdefault(signature, {})[key] = bms_map
+
+    def remove_map(self, bms_map: BMSMap) -> bool:
+        """Retira las aportaciones de un mapa; False si no estaba indexado"""
+        key = id(bms_map)
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return False
+        for name in entry.field_names:
+            _discard(self._field_maps, name, key)
+        for literal in entry.literals:
+            _discard(self._literal_positions, literal, key)
+        for kind, signature in entry.layouts.items():
+            if signature:
+                _discard(self._layout_maps[kind], signature, key)
+        return True
+
+    def update_map(self, bms_map: BMSMap):
+        """Reindexa un mapa modificado (solo recorre sus campos)"""
+        self.add_map(bms_map)
+
+    def sync(self, project: Optional[BMSProject]):
+        """Ajusta el índice a los mapas del proyecto: indexa los nuevos y retira los eliminados"""
+        maps = project.maps if project else []
+        current = {id(bms_map) for bms_map in maps}
+        for key in [key for key in self._entries if key not in current]:
+            self.remove_map(self._entries[key].bms_map)
+        for bms_map in maps:
+            if id(bms_map) not in self._entries:
+                self.add_map(bms_map)
+
+    def clear(self):
+        self._entries.clear()
+        self._field_maps.clear()
+        self._literal_positions.clear()
+        for maps in self._layout_maps.values():
+            maps.clear()
+
+    # ---- Consultas ----
+
+    def maps_with_field(self, field_name: str) -> List[BMSMap]:
+        """Mapas que tienen un campo con ese nombre"""
+        return list(self._field_maps.get(field_name, {}).values())
+
+    def field_map_count(self, field_name: str) -> int:
+        return len(self._field_maps.get(field_name, ()))
+
+    def literal_positions(self, literal: str) -> List[LiteralPosition]:
+        """Posiciones (mapa, campo, línea, columna) donde aparece un literal INITIAL"""
+        positions: List[LiteralPosition] = []
+        for map_positions in self._literal_positions.get(literal, {}).values():
+            positions.extend(map_positions)
+        return positions
+
+    def layout_of(self, bms_map: BMSMap) -> Dict[str, Optional[str]]:
+        """Firmas de diseño con las que está indexado un mapa"""
+        entry = self._entries.get(id(bms_map))
+        return dict(entry.layouts) if entry else {}
+
+    def maps_with_layout(self, signature: str, kind: str = "screen") -> List[BMSMap]:
+        """Mapas que comparten una firma de diseño"""
+        return list(self._layout_maps[kind].get(signature, {}).values())
+
+    def same_layout(self, bms_map: BMSMap, kind: str = "screen") -> List[BMSMap]:
+        """Otros mapas con el mismo diseño (pantalla, cabecera o pie) que el indicado"""
+        signature = self.layout_of(bms_map).get(kind)
+        if not signature:
+            return []
+        return [other for other in self.maps_with_layout(signature, kind) if other is not bms_map]
+
+    # ---- Informes ----
+
+    def shared_field_names(self, min_maps: int = 2) -> Dict[str, List[BMSMap]]:
+        """Nombres de campo presentes en al menos min_maps mapas"""
+        return {name: list(maps.values()) for name, maps in self._field_maps.items() if len(maps) >= min_maps}
+
+    def shared_literals(self, min_maps: int = 2) -> Dict[str, List[LiteralPosition]]:
+        """Literales INITIAL repetidos en al menos min_maps mapas"""
+        return {literal: self.literal_positions(literal)
+                for literal, maps in self._literal_positions.items() if len(maps) >= min_maps}
+
+    def duplicate_layouts(self, kind: str = "screen") -> List[List[BMSMap]]:
+        """Grupos de mapas con el mismo diseño (solo grupos de dos o más)"""
+        return [list(maps.values()) for maps in self._layout_maps[kind].values() if len(maps) > 1]
+
+    def summary(self) -> Dict[str, int]:
+        return {
+            "maps": len(self._entries),
+            "field_names": len(self._field_maps),
+            "shared_field_names": sum(1 for maps in self._field_maps.values() if len(maps) > 1),
+            "literals": len(self._literal_positions),
+            "shared_literals": sum(1 for maps in self._literal_positions.values() if len(maps) > 1),
+            **{f"duplicate_{kind}_layouts": len(self.duplicate_layouts(kind)) for kind in LAYOUT_KINDS},
+        }
+
+
+def _discard(index: Dict[str, Dict[int, object]], value: str, key: int):
+    maps = index.get(value)
+    if maps is None:
+        return
+    maps.pop(key, None)
+    if not maps:
+        del index[value]
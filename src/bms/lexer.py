@@ -0,0 +1,184 @@
+"""
+Analizador léxico de líneas de código BMS para el resaltado de sintaxis.
+
+Cada línea se divide en tramos (inicio, fin, tipo) que la cubren por
+completo: etiqueta, macro, clave de operando, literal, número, marca de
+continuación, comentario y texto. El resultado se memoiza por contenido de
+la línea, de modo que las líneas que no cambian nunca se vuelven a analizar.
+"""
+from functools import lru_cache
+from typing import NamedTuple, Tuple
+import re
+
+
+# Tipos de tramo
+LABEL = "label"
+MACRO = "macro"
+OPERAND_KEY = "operand_key"
+LITERAL = "literal"
+NUMBER = "number"
+CONTINUATION = "continuation"
+COMMENT = "comment"
+TEXT = "text"
+
+# Columnas del formato de ensamblador (1-based)
+CONTENT_END_COLUMN = 71
+CONTINUATION_COLUMN = 72
+CONTINUATION_START_COLUMN = 16
+
+# Instrucciones que aparecen en un fuente BMS
+KNOWN_MACROS = frozenset({"DFHMSD", "DFHMDI", "DFHMDF", "END", "PRINT", "TITLE", "EJECT", "SPACE"})
+
+# Elementos de la zona de operandos
+_OPERAND_PATTERN = re.compile(
+    r"(?P<key>[A-Za-z@#$][A-Za-z0-9@#$]*)(?==)"   # CLAVE=
+    r"|(?P<literal>'(?:[^']|'')*(?P<close>')?)"   # 'literal' (sin cierre sigue en la línea siguiente)
+    r"|(?P<number>\d+)(?![\w@#$&.-])"             # número
+    r"|(?P<word>[\w@#$&][\w@#$&.-]*)"             # valor (ASKIP, 3270-2, &SYSPARM...)
+    r"|(?P<space>\s+)"                          # fin de los operandos
+    r"|(?P<other>.)"                             # = , ( ) y otros signos
+)
+
+
+# Resto de un literal que viene de la línea anterior
+_LITERAL_REST_PATTERN = re.compile(r"(?:[^']|'')*(?P<close>')?")
+
+
+class Token(NamedTuple):
+    """Tramo de una línea: [start, end) con su tipo"""
+    start: int
+    end: int
+    kind: str
+
+
+@lru_cache(maxsize=16384)
+def scan_line(line: str, in_literal: bool = False) -> Tuple[Tuple[Token, ...], bool]:
+    """
+    Divide una línea BMS en tramos consecutivos. in_literal indica que la
+    línea continúa un literal abierto en la anterior. Retorna los tramos y si
+    queda un literal abierto al final (resultado memoizado por línea y estado).
+    """
+    if not line:
+        return (), in_literal
+    tokens = []
+    content = line[:CONTENT_END_COLUMN]
+    open_literal = False
+    if not in_literal and (content.startswith("*") or content.lstrip().startswith("//")):
+        tokens.append(Token(0, len(content), COMMENT))
+    else:
+        open_literal = _tokenize_statement(content, tokens, in_literal)
+    _tokenize_tail(line, tokens)
+    # El literal solo continúa si la línea lleva marca de continuación
+    open_literal = open_literal and tokens[-1].kind == CONTINUATION
+    return _merge(tokens), open_literal
+
+
+def tokenize_line(line: str, in_literal: bool = False) -> Tuple[Token, ...]:
+    """Tramos de una línea (ver scan_line)"""
+    return scan_line(line, in_literal)[0]
+
+
+def _tokenize_statement(content: str, tokens: list, in_literal: bool) -> bool:
+    """Analiza la zona de sentencia; retorna True si termina con un literal abierto"""
+    position = 0
+    length = len(content)
+
+    if in_literal:
+        # El literal continúa en la columna 16
+        start = min(CONTINUATION_START_COLUMN - 1, length)
+        if start:
+            tokens.append(Token(0, start, TEXT))
+        match = _LITERAL_REST_PATTERN.match(content, start)
+        tokens.append(Token(start, match.end(), LITERAL))
+        if match.group("close") is None:
+            return True
+        position = match.end()
+    else:
+        # Etiqueta en la columna 1
+        if not content[0].isspace():
+            end = _word_end(content, 0)
+            tokens.append(Token(0, end, LABEL))
+            position = end
+        position = _skip_spaces(content, position, tokens)
+        if position >= length:
+            return False
+
+        # Instrucción; las líneas de continuación empiezan directamente por operandos
+        end = _word_end(content, position)
+        word = content[position:end]
+        has_label = bool(tokens) and tokens[0].kind == LABEL
+        if has_label or word.upper() in KNOWN_MACROS or ("=" not in word and "'" not in word):
+            tokens.append(Token(position, end, MACRO))
+            position = _skip_spaces(content, end, tokens)
+
+    # Operandos hasta el primer blanco fuera de un literal; el resto son comentarios
+    while position < length:
+        match = _OPERAND_PATTERN.match(content, position)
+        kind = match.lastgroup
+        start, end = match.span()
+        if kind == "space":
+            tokens.append(Token(start, end, TEXT))
+            if end < length:
+                tokens.append(Token(end, length, COMMENT))
+            return False
+        tokens.append(Token(start, end, {
+            "key": OPERAND_KEY, "literal": LITERAL, "number": NUMBER,
+        }.get(kind, TEXT)))
+        if kind == "literal" and match.group("close") is None:
+            return True
+        position = end
+    return False
+
+
+def _tokenize_tail(line: str, tokens: list):
+    """Marca de continuación (columna 72) y secuencia (73-80)"""
+    if len(line) < CONTINUATION_COLUMN:
+        return
+    marker = line[CONTINUATION_COLUMN - 1]
+    tokens.append(Token(CONTINUATION_COLUMN - 1, CONTINUATION_COLUMN,
+                        TEXT if marker.isspace() else CONTINUATION))
+    if len(line) > CONTINUATION_COLUMN:
+        tokens.append(Token(CONTINUATION_COLUMN, len(line), COMMENT))
+
+
+def _word_end(text: str, position: int) -> int:
+    while position < len(text) and not text[position].isspace():
+        position += 1
+    return position
+
+
+def _skip_spaces(text: str, position: int, tokens: list) -> int:
+    start = position
+    while position < len(text) and text[position].isspace():
+        position += 1
+    if position > start:
+        tokens.append(Token(start, position, TEXT))
+    return position
+
+
+def _merge(tokens: list) -> Tuple[Token, ...]:
+    """Une tramos contiguos del mismo tipo (menos widgets al dibujar)"""
+    merged = []
+    for token in tokens:
+        if token.start == token.end:
+            continue
+        if merged and merged[-1].kind == token.kind and merged[-1].end == token.start:
+            merged[-1] = Token(merged[-1].start, token.end, token.kind)
+        else:
+            merged.append(token)
+    return tuple(merged)
+
+
+def line_segments(line: str, in_literal: bool = False) -> Tuple[Tuple[str, str], ...]:
+    """Texto y tipo de cada tramo de una línea"""
+    return tuple((line[token.start:token.end], token.kind) for token in tokenize_line(line, in_literal))
+
+
+def literal_states(lines) -> list:
+    """Para cada línea, si empieza dentro de un literal abierto en la anterior"""
+    states = []
+    in_literal = False
+    for line in lines:
+        states.append(in_literal)
+        in_literal = scan_line(line, in_literal)[1]
+    return states
@@ -0,0 +1,59 @@
+"""
+Clasificación de nombres BMS: validez y nombres generados automáticamente.
+
+Los patrones se compilan una sola vez (los de nombres automáticos en una
+única expresión combinada) y el resultado se memoiza por nombre distinto,
+ya que un mapa grande repite pocas formas de nombre muchas veces.
+"""
+from dataclasses import dataclass
+from functools import lru_cache
+import re
+
+
+# Longitud máxima de un nombre en ensamblador
+MAX_NAME_LENGTH = 8
+# Los campos con nombre generan en el mapa simbólico etiquetas con sufijo
+# (L, F, A, I, O), por lo que su nombre no debe pasar de 7 caracteres
+MAX_FIELD_NAME_LENGTH = 7
+
+# Letras, dígitos y caracteres nacionales (@ # $) permitidos por el ensamblador
+_NAME_PATTERN = re.compile(r'[A-Za-z@#$][A-Za-z0-9@#$]*')
+
+# Nombres generados por la aplicación, en una sola expresión:
+#   FIELD01, FIELD100...  (parser estructurado)
+#   CAMPO01, CAMPO100...  (nuevo campo manual)
+#   FIELD_línea_columna   (parsing legacy sin nombre)
+#   nombres genéricos y prefijos AUTO_ / GEN_
+_AUTO_NAME_PATTERN = re.compile(
+    r'FIELD\d{2,}|CAMPO\d{2,}|FIELD_\d+_\d+'
+    r'|UNNAMED|UNNAMED_FIELD|FIELD|CAMPO'
+    r'|AUTO_[A-Z0-9_]+|GEN_[A-Z0-9_]+'
+)
+
+
+@dataclass(frozen=True)
+class NameInfo:
+    """Resultado de clasificar un nombre"""
+    valid: bool            # Nombre BMS válido (1-8 caracteres, empieza por letra o @#$)
+    auto_generated: bool   # Generado por la aplicación (no se emite como etiqueta)
+    suffix_safe: bool      # Cabe con el sufijo del mapa simbólico (máximo 7 caracteres)
+
+
+@lru_cache(maxsize=65536)
+def classify_name(name: str) -> NameInfo:
+    """Clasifica un nombre (resultado memoizado por nombre)"""
+    if not name:
+        return NameInfo(valid=False, auto_generated=True, suffix_safe=True)
+    valid = len(name) <= MAX_NAME_LENGTH and _NAME_PATTERN.fullmatch(name) is not None
+    auto_generated = _AUTO_NAME_PATTERN.fullmatch(name) is not None
+    return NameInfo(valid, auto_generated, len(name) <= MAX_FIELD_NAME_LENGTH)
+
+
+def is_valid_name(name: str) -> bool:
+    """Valida si un nombre es válido para BMS"""
+    return classify_name(name).valid
+
+
+def is_auto_generated_name(name: str) -> bool:
+    """Determina si un nombre de campo es generado automáticamente por la aplicación"""
+    return classify_name(name).auto_generated
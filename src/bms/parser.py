@@ -0,0 +1,374 @@
+"""
+Parser de código fuente BMS hacia los modelos de datos
+"""
+import dataclasses
+import re
+from typing import List, Optional, Tuple, Dict
+import sys
+from pathlib import Path
+
+# Añadir src al path para imports
+src_path = Path(__file__).parent.parent
+sys.path.insert(0, str(src_path))
+
+from models import BMSMap, BMSField, FieldType, FieldAttribute
+from .source import BMSStatement, scan_statements, split_operands
+
+
+def parse_bms_content(bms_map: BMSMap, content: str) -> List[BMSStatement]:
+    """
+    Parsea el contenido de un archivo BMS completo sobre bms_map.
+    
+    Retorna las sentencias del fuente con sus rangos de líneas; las
+    sentencias DFHMDF que generaron un campo lo referencian en 'field'.
+    """
+    statements = scan_statements(content)
+    current_mapset_name = None
+    
+    for statement in statements:
+        if statement.kind != "statement":
+            continue
+            
+        line_info = statement.info
+        directive = line_info['directive']
+        
+        if directive == 'DFHMSD':
+            # DFHMSD TYPE=FINAL cierra el mapset y no lo redefine
+            if 'TYPE=FINAL' in line_info['parameters'].upper():
+                continue
+            # Parsear mapset y propiedades generales
+            current_mapset_name = _parse_mapset_definition(line_info, bms_map)
+            
+        elif directive == 'DFHMDI':
+            # Parsear propiedades del mapa
+            _parse_map_definition(line_info, bms_map, current_mapset_name)
+            
+        elif directive == 'DFHMDF':
+            # Parsear definición de campo
+            line_info['field'] = _parse_field_definition_structured(bms_map, line_info)
+            
+    return statements
+
+def parse_bms_maps(content: str, default_name: str = "MAPA01") -> List[BMSMap]:
+    """
+    Parsea un mapset completo separando sus mapas: cada DFHMDI inicia un mapa
+    nuevo con las propiedades del DFHMSD, y los DFHMDF pertenecen al último
+    DFHMDI. Los campos anteriores a cualquier DFHMDI forman un mapa con el
+    nombre por defecto. Sin sentencias DFHMDI ni DFHMDF se retorna un único
+    mapa vacío con las propiedades del mapset.
+    """
+    mapset = BMSMap(name=default_name, mapset_name="MAPSET01")
+    maps: List[BMSMap] = []
+    current: Optional[BMSMap] = None
+    current_mapset_name = None
+    
+    for statement in scan_statements(content):
+        if statement.kind != "statement":
+            continue
+        line_info = statement.info
+        directive = line_info['directive']
+        
+        if directive == 'DFHMSD':
+            if 'TYPE=FINAL' in line_info['parameters'].upper():
+                continue
+            current_mapset_name = _parse_mapset_definition(line_info, mapset)
+        elif directive == 'DFHMDI':
+            current = dataclasses.replace(mapset, fields=[], ctrl=list(mapset.ctrl))
+            _parse_map_definition(line_info, current, current_mapset_name)
+            maps.append(current)
+        elif directive == 'DFHMDF':
+            if current is None:
+                current = dataclasses.replace(mapset, fields=[], ctrl=list(mapset.ctrl))
+                maps.append(current)
+            line_info['field'] = _parse_field_definition_structured(current, line_info)
+            
+    return maps or [mapset]
+
+def parse_field_statement(statement: BMSStatement) -> Optional[BMSField]:
+    """Parsea una sentencia DFHMDF aislada sin añadir el campo a ningún mapa"""
+    return _parse_field_definition_structured(BMSMap(name="", mapset_name=""), dict(statement.info))
+
+def _parse_mapset_definition(line_info: Dict, bms_map: BMSMap) -> Optional[str]:
+    """Parsea definición DFHMSD para obtener nombre del mapset y propiedades"""
+    try:
+        mapset_name = line_info['label'] if line_info['label'] else "MAPSET01"
+        parameters = line_info['parameters']
+        
+        # Actualizar el mapset del mapa
+        if mapset_name:
+            bms_map.mapset_name = mapset_name
+            
+        # Parsear parámetros adicionales del mapset
+        # TYPE=&SYSPARM, MODE=INOUT, LANG=COBOL, etc.
+        for operand in split_operands(parameters):
+            keyword, _, value = operand.partition('=')
+            keyword = keyword.strip().upper()
+            value = value.strip()
+            if not value:
+                continue
+            if keyword in ('MODE', 'LANG', 'TERM', 'STORAGE'):
+                setattr(bms_map, keyword.lower(), value)
+            elif keyword == 'CTRL':
+                bms_map.ctrl = [item.strip() for item in value.strip('()').split(',') if item.strip()]
+        
+        return mapset_name
+        
+    except Exception as e:
+        return None
+
+def _parse_map_definition(line_info: Dict, bms_map: BMSMap, mapset_name: Optional[str]):
+    """Parsea definición DFHMDI para obtener nombre del mapa y propiedades"""
+    try:
+        map_name = line_info['label'] if line_info['label'] else bms_map.name
+        parameters = line_info['parameters']
+        
+        # Actualizar nombre del mapa
+        if map_name:
+            bms_map.name = map_name
+            
+        # Parsear SIZE si está presente
+        size_match = re.search(r'SIZE=\((\d+),(\d+)\)', parameters)
+        if size_match:
+            rows = int(size_match.group(1))
+            cols = int(size_match.group(2))
+            bms_map.size = (rows, cols)
+            
+        # Asignar mapset si está disponible
+        if mapset_name:
+            bms_map.mapset_name = mapset_name
+            
+    except Exception as e:
+        pass
+
+def _parse_field_definition_structured(bms_map: BMSMap, line_info: Dict) -> Optional[BMSField]:
+    """
+    Parsea una definición de campo DFHMDF usando estructura posicional:
+    - Label: nombre del campo (pos 1-9)
+    - Parameters: POS, LENGTH, INITIAL, ATTRB, COLOR (pos 16-71)
+    """
+    try:
+        # Nombre del campo desde el label o generar uno
+        field_name = line_info['label'] if line_info['label'] else _generate_field_name(bms_map)
+        
+        # Validar nombre del campo
+        if not field_name or len(field_name) > 8:
+            field_name = _generate_field_name(bms_map)
+            
+        parameters = line_info['parameters']
+        
+        # Valores por defecto
+        line_num = 1
+        column = 1
+        length = 1
+        field_type = FieldType.LABEL
+        initial_value = ""
+        attributes = []
+        color = None
+        hilight = None
+        picin = None
+        picout = None
+        
+        # Parsear parámetros específicos
+        pos_result = _extract_pos_structured(parameters)
+        if pos_result:
+            line_num, column = pos_result
+            
+        length = _extract_length_structured(parameters)
+        initial_value = _extract_initial_structured(parameters)
+        has_name = bool(line_info['label'])  # Verificar si tiene nombre de campo
+        field_type = _determine_field_type_structured(parameters, initial_value, has_name)
+        attributes = _extract_attributes_structured(parameters)
+        color = _extract_color_structured(parameters)
+        hilight = _extract_hilight_structured(parameters)
+        picin = _extract_picin_structured(parameters)
+        picout = _extract_picout_structured(parameters)
+        
+        # Crear el campo solo si tiene información válida
+        if line_num > 0 and column > 0 and length > 0:
+            field = BMSField(
+                name=field_name,
+                line=line_num,
+                column=column,
+                length=length,
+                field_type=field_type,
+                initial_value=initial_value,
+                attributes=attributes,
+                color=color,
+                hilight=hilight
+            )
+            
+            # Asignar PICIN y PICOUT si están disponibles
+            if picin:
+                field.picin = picin
+            if picout:
+                field.picout = picout
+                
+            bms_map.add_field(field)
+            return field
+            
+    except Exception as e:
+        # Si hay error en el parseo, continuar con el siguiente campo
+        pass
+    return None
+
+def _generate_field_name(bms_map: BMSMap) -> str:
+    """Genera un nombre único para un campo"""
+    field_count = len(bms_map.fields) + 1
+    return f"FIELD{field_count:02d}"
+
+# ========== FUNCIONES DE EXTRACCIÓN ESTRUCTURADA ==========
+
+def _extract_pos_structured(parameters: str) -> Optional[Tuple[int, int]]:
+    """Extrae POS=(línea,columna) de los parámetros"""
+    try:
+        pos_match = re.search(r'POS=\((\d+),(\d+)\)', parameters)
+        if pos_match:
+            line_num = int(pos_match.group(1))
+            column = int(pos_match.group(2))
+            return (line_num, column)
+    except:
+        pass
+    return None
+
+def _extract_length_structured(parameters: str) -> int:
+    """Extrae LENGTH=valor de los parámetros"""
+    try:
+        length_match = re.search(r'LENGTH=(\d+)', parameters)
+        if length_match:
+            return int(length_match.group(1))
+    except:
+        pass
+    return 1
+
+def _extract_literal_structured(parameters: str, keyword: str) -> Optional[str]:
+    """
+    Extrae un literal KEYWORD='valor' de los parámetros.
+    Los apóstrofos y ampersands duplicados ('' y &&) se reducen a uno solo.
+    """
+    literal_match = re.search(keyword + r"=(?:'((?:[^']|'')*)'|\"([^\"]*)\")", parameters)
+    if not literal_match:
+        return None
+    if literal_match.group(1) is not None:
+        return literal_match.group(1).replace("''", "'").replace("&&", "&")
+    return literal_match.group(2)
+
+def _extract_initial_structured(parameters: str) -> str:
+    """Extrae INITIAL='valor' de los parámetros"""
+    try:
+        # Buscar INITIAL='...' o INITIAL="..."
+        initial_value = _extract_literal_structured(parameters, "INITIAL")
+        if initial_value is not None:
+            return initial_value
+    except Exception:
+        pass
+    return ""
+
+def _extract_attributes_structured(parameters: str) -> List[FieldAttribute]:
+    """Extrae ATTRB=(lista,de,atributos) de los parámetros"""
+    attributes = []
+    try:
+        # Buscar ATTRB=(atrib1,atrib2,atrib3) o ATTRB=atrib
+        attrb_match = re.search(r'ATTRB=\(([^)]+)\)', parameters)
+        if not attrb_match:
+            # Buscar ATTRB=atributo_simple
+            attrb_match = re.search(r'ATTRB=([A-Z]+)', parameters)
+            
+        if attrb_match:
+            attrb_text = attrb_match.group(1)
+            # Dividir por comas y procesar cada atributo
+            attr_list = [attr.strip() for attr in attrb_text.split(',')]
+            
+            for attr_str in attr_list:
+                attr_str = attr_str.strip().upper()
+                # Mapear a FieldAttribute
+                if attr_str == 'ASKIP':
+                    attributes.append(FieldAttribute.ASKIP)
+                elif attr_str == 'PROT':
+                    attributes.append(FieldAttribute.PROT)
+                elif attr_str == 'UNPROT':
+                    attributes.append(FieldAttribute.UNPROT)
+                elif attr_str == 'NUM':
+                    attributes.append(FieldAttribute.NUM)
+                elif attr_str == 'BRT':
+                    attributes.append(FieldAttribute.BRT)
+                elif attr_str == 'NORM':
+                    attributes.append(FieldAttribute.NORM)
+                elif attr_str == 'DRK':
+                    attributes.append(FieldAttribute.DRK)
+                elif attr_str == 'IC':
+                    attributes.append(FieldAttribute.IC)
+                elif attr_str == 'FSET':
+                    attributes.append(FieldAttribute.FSET)
+    except:
+        pass
+        
+    return attributes
+
+def _extract_color_structured(parameters: str) -> Optional[str]:
+    """Extrae COLOR=valor de los parámetros"""
+    try:
+        color_match = re.search(r'COLOR=([A-Z]+)', parameters)
+        if color_match:
+            return color_match.group(1).upper()
+    except:
+        pass
+    return None
+
+def _extract_hilight_structured(parameters: str) -> Optional[str]:
+    """Extrae HILIGHT=valor de los parámetros"""
+    try:
+        hilight_match = re.search(r'HILIGHT=([A-Z]+)', parameters)
+        if hilight_match:
+            return hilight_match.group(1).upper()
+    except:
+        pass
+    return None
+
+def _extract_picin_structured(parameters: str) -> Optional[str]:
+    """Extrae PICIN='valor' de los parámetros"""
+    try:
+        return _extract_literal_structured(parameters, "PICIN")
+    except Exception:
+        pass
+    return None
+
+def _extract_picout_structured(parameters: str) -> Optional[str]:
+    """Extrae PICOUT='valor' de los parámetros"""
+    try:
+        return _extract_literal_structured(parameters, "PICOUT")
+    except Exception:
+        pass
+    return None
+
+def _determine_field_type_structured(parameters: str, initial_value: str, has_name: bool) -> FieldType:
+    """
+    Determina el tipo de campo basado en la lógica propuesta:
+    - Si no tiene nombre y no tiene ATTRB -> LABEL
+    - Si tiene ATTRB (independiente del nombre) -> INPUT (puede cargar ATTRB, INITIAL, COLOR, HILIGHT, PICIN, PICOUT)
+    - Si tiene PICIN -> INPUT
+    - Si tiene valor inicial -> LABEL
+    """
+    parameters_upper = parameters.upper()
+    
+    # Si tiene PICIN, definitivamente es un campo de entrada
+    if 'PICIN=' in parameters_upper:
+        return FieldType.INPUT
+        
+    # Si tiene ATTRB, es un INPUT (independiente de si tiene nombre o no)
+    if 'ATTRB=' in parameters_upper or 'ATTRB(' in parameters_upper:
+        return FieldType.INPUT
+        
+    # Si no tiene nombre y no tiene ATTRB, es un LABEL
+    if not has_name and 'ATTRB' not in parameters_upper:
+        return FieldType.LABEL
+        
+    # Si tiene PICOUT pero no PICIN, es de salida
+    if 'PICOUT=' in parameters_upper and 'PICIN=' not in parameters_upper:
+        return FieldType.OUTPUT
+        
+    # Si tiene valor inicial, probablemente es una etiqueta
+    if initial_value:
+        return FieldType.LABEL
+        
+    # Por defecto, es etiqueta
+    return FieldType.LABEL
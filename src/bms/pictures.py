@@ -0,0 +1,135 @@
+"""
+Análisis de cadenas de picture de PICIN/PICOUT (COBOL y PL/I).
+
+Calcula cuántas posiciones de pantalla ocupa una picture, p. ej.
+'ZZ,ZZ9.99' -> 9 y '9(8)' -> 8, para compararlo con LENGTH del campo.
+Acepta la repetición de COBOL (símbolo seguido de '(n)') y la de PL/I
+('(n)' antes del símbolo). Los resultados se memoizan por picture: un
+inventario repite unos pocos cientos de pictures distintas.
+"""
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Optional
+
+
+# Símbolos que no ocupan posición: punto decimal implícito (V), escalado
+# (P), signo sin posición propia (S en COBOL) y exponente implícito (K en PL/I)
+ZERO_WIDTH_SYMBOLS = frozenset("VPSK")
+
+# Símbolos que ocupan una posición por aparición
+DISPLAY_SYMBOLS = frozenset("9XAZ*B0/,.+-$ETIRY")
+
+# Símbolos de dos caracteres (crédito / débito)
+TWO_CHARACTER_SYMBOLS = ("CR", "DB")
+
+# Símbolos que representan un dígito
+DIGIT_SYMBOLS = frozenset("9Z*TIRY")
+
+
+@dataclass(frozen=True)
+class PictureInfo:
+    """Resultado de analizar una picture"""
+    picture: str
+    display_length: int = 0   # Posiciones que ocupa en pantalla
+    digits: int = 0           # Posiciones de dígito (9, Z, *...)
+    decimals: int = 0         # Dígitos a la derecha del punto decimal (V o .)
+    signed: bool = False
+    error: Optional[str] = None
+
+    @property
+    def valid(self) -> bool:
+        return self.error is None
+
+
+@lru_cache(maxsize=4096)
+def parse_picture(picture: str) -> PictureInfo:
+    """Analiza una picture (resultado memoizado por picture)"""
+    text = picture.strip().upper()
+    if not text:
+        return PictureInfo(picture, error="Picture vacía")
+
+    display_length = digits = decimals = 0
+    signed = after_point = False
+    index = 0
+    pending_count = None  # Repetición PL/I pendiente: (n)símbolo
+    last_symbol = None    # Último símbolo simple leído (destino de una repetición COBOL)
+
+    def read_count(position):
+        end = text.find(")", position)
+        if end < 0:
+            return None, position
+        number = text[position + 1:end].strip()
+        if not number.isdigit() or int(number) < 1:
+            return None, position
+        return int(number), end + 1
+
+    while index < len(text):
+        char = text[index]
+
+        if char == "(":
+            count, following = read_count(index)
+            if count is None:
+                return PictureInfo(picture, error=f"Repetición inválida en la posición {index + 1}")
+            if last_symbol is not None:
+                # Repetición COBOL: se aplica al símbolo anterior (ya contado una vez)
+                if last_symbol not in ZERO_WIDTH_SYMBOLS:
+                    display_length += count - 1
+                if last_symbol in DIGIT_SYMBOLS:
+                    digits += count - 1
+                    if after_point:
+                        decimals += count - 1
+                last_symbol = None
+            else:
+                # Repetición PL/I: se aplica al símbolo siguiente
+                pending_count = count
+            index = following
+            continue
+
+        if char == "F" and text.startswith("F(", index):
+            # Factor de escala de PL/I: F(n) o F(-n), no ocupa posición
+            end = text.find(")", index)
+            if end < 0:
+                return PictureInfo(picture, error="Factor de escala F(n) sin cerrar")
+            index = end + 1
+            last_symbol = None
+            continue
+
+        repeat = pending_count or 1
+        pending_count = None
+        symbol_text = text[index:index + 2]
+        if symbol_text in TWO_CHARACTER_SYMBOLS:
+            display_length += 2 * repeat
+            signed = True
+            index += 2
+            last_symbol = None
+            continue
+
+        if char in ZERO_WIDTH_SYMBOLS:
+            if char == "S":
+                signed = True
+            if char == "V":
+                after_point = True
+        elif char in DISPLAY_SYMBOLS:
+            display_length += repeat
+            if char in DIGIT_SYMBOLS:
+                digits += repeat
+                if after_point:
+                    decimals += repeat
+            if char in "+-":
+                signed = True
+            if char == ".":
+                after_point = True
+        else:
+            return PictureInfo(picture, error=f"Símbolo '{char}' no válido en la posición {index + 1}")
+        last_symbol = char if repeat == 1 else None
+        index += 1
+
+    if pending_count is not None:
+        return PictureInfo(picture, error="Repetición sin símbolo al final de la picture")
+    return PictureInfo(picture, display_length, digits, decimals, signed)
+
+
+def picture_length(picture: str) -> Optional[int]:
+    """Posiciones de pantalla de una picture (None si no es válida)"""
+    info = parse_picture(picture)
+    return info.display_length if info.valid else None
@@ -0,0 +1,201 @@
+"""
+Modelo de ocupación de la pantalla: un propietario por celda del buffer.
+
+Permite consultar en O(1) qué campo cubre una celda, buscar huecos libres
+para colocar campos nuevos y obtener las superposiciones sin recorrer la
+lista de campos en cada consulta.
+"""
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from .geometry import buffer_offset, field_segments
+
+
+class ScreenBuffer:
+    """
+    Buffer de pantalla de lines x cols celdas.
+
+    Cada celda guarda el campo que la ocupa (None, un campo o una lista de
+    campos si hay superposición) y un contador de ocupación en un bytearray.
+    Un campo ocupa su byte de atributo y sus datos, con la misma geometría
+    que bms.geometry. Las celdas con más de un propietario se mantienen en
+    un conjunto para informar superposiciones sin recorrer el buffer.
+    """
+
+    def __init__(self, size: Tuple[int, int] = (24, 80), fields: Iterable = ()):
+        self.lines, self.cols = size
+        self.total = self.lines * self.cols
+        self._owners: List = [None] * self.total
+        self._counts = bytearray(self.total)
+        self._conflicts = set()
+        self._placed: Dict[int, Tuple] = {}  # id(campo) -> (campo, (línea, columna, longitud))
+        for bms_field in fields:
+            self.add_field(bms_field)
+
+    @classmethod
+    def from_map(cls, bms_map) -> "ScreenBuffer":
+        """Construye el buffer de un mapa en una sola pasada"""
+        return cls(tuple(bms_map.size), bms_map.fields)
+
+    @property
+    def size(self) -> Tuple[int, int]:
+        return (self.lines, self.cols)
+
+    # ---- Actualización ----
+
+    def add_field(self, bms_field):
+        """Registra un campo en las celdas que ocupa"""
+        placed = self._placed.get(id(bms_field))
+        if placed is not None:
+            # Liberar la posición anterior conservando el orden de registro
+            self._release_cells(bms_field, placed[1])
+        geometry = (bms_field.line, bms_field.column, bms_field.length)
+        self._placed[id(bms_field)] = (bms_field, geometry)
+        for start, end in self._segments(geometry):
+            for offset in range(start, end):
+                self._claim(offset, bms_field)
+
+    def remove_field(self, bms_field):
+        """Libera las celdas que ocupaba un campo (según su última posición registrada)"""
+        placed = self._placed.pop(id(bms_field), None)
+        if placed is not None:
+            self._release_cells(bms_field, placed[1])
+
+    def update_field(self, bms_field) -> bool:
+        """Vuelve a registrar un campo si cambió su posición o longitud; indica si cambió"""
+        placed = self._placed.get(id(bms_field))
+        if placed and placed[1] == (bms_field.line, bms_field.column, bms_field.length):
+            return False
+        self.add_field(bms_field)
+        return True
+
+    def sync(self, fields: Iterable) -> int:
+        """
+        Sincroniza el buffer con una lista de campos: registra los nuevos,
+        actualiza los modificados y libera los eliminados. Retorna el número
+        de campos actualizados.
+        """
+        current = set()
+        updated = 0
+        for bms_field in fields:
+            current.add(id(bms_field))
+            if self.update_field(bms_field):
+                updated += 1
+        for field_id in [fid for fid in self._placed if fid not in current]:
+            self.remove_field(self._placed[field_id][0])
+            updated += 1
+        return updated
+
+    def _segments(self, geometry: Tuple[int, int, int]) -> List[Tuple[int, int]]:
+        line, column, length = geometry
+        if length < 1 or not (1 <= line <= self.lines and 1 <= column <= self.cols):
+            return []  # Fuera de la pantalla: no ocupa celdas
+        return field_segments(_Placement(line, column, length), self.size)
+
+    def _release_cells(self, bms_field, geometry: Tuple[int, int, int]):
+        for start, end in self._segments(geometry):
+            for offset in range(start, end):
+                self._release(offset, bms_field)
+
+    def _claim(self, offset: int, bms_field):
+        owner = self._owners[offset]
+        if owner is None:
+            self._owners[offset] = bms_field
+        elif isinstance(owner, list):
+            owner.append(bms_field)
+        else:
+            self._owners[offset] = [owner, bms_field]
+        if self._counts[offset] < 255:
+            self._counts[offset] += 1
+        if self._counts[offset] > 1:
+            self._conflicts.add(offset)
+
+    def _release(self, offset: int, bms_field):
+        owner = self._owners[offset]
+        if isinstance(owner, list):
+            owner.remove(bms_field)
+            remaining = len(owner)
+            self._owners[offset] = owner[0] if remaining == 1 else owner
+        else:
+            self._owners[offset] = None
+            remaining = 0
+        self._counts[offset] = min(remaining, 255)
+        if self._counts[offset] <= 1:
+            self._conflicts.discard(offset)
+
+    # ---- Consultas ----
+
+    def owners_at(self, line: int, column: int) -> List:
+        """Campos que ocupan una celda (incluyendo bytes de atributo)"""
+        if not (1 <= line <= self.lines and 1 <= column <= self.cols):
+            return []
+        owner = self._owners[buffer_offset(line, column, self.cols)]
+        if owner is None:
+            return []
+        return list(owner) if isinstance(owner, list) else [owner]
+
+    def field_at(self, line: int, column: int, include_attribute: bool = False):
+        """Campo cuyos datos cubren la celda (O(1)); None si la celda está libre"""
+        offset = buffer_offset(line, column, self.cols)
+        for bms_field in self.owners_at(line, column):
+            if include_attribute or offset != self._attribute_offset(bms_field):
+                return bms_field
+        return None
+
+    def is_free(self, line: int, column: int, length: int) -> bool:
+        """Indica si un campo de la longitud dada (con su atributo) cabe libre en la posición"""
+        segments = self._segments((line, column, length))
+        if not segments or column + length > self.cols:
+            return False
+        return not any(any(self._counts[start:end]) for start, end in segments)
+
+    def find_free_run(self, length: int, start: Tuple[int, int] = (1, 1)) -> Optional[Tuple[int, int]]:
+        """
+        Primera posición (línea, columna) desde start donde cabe un campo de
+        la longitud dada (byte de atributo en la posición y datos a
+        continuación) sin solaparse ni salirse de la línea. La búsqueda se
+        hace sobre el bytearray de ocupación (bytes.find).
+        """
+        if length < 1 or length + 1 > self.cols:
+            return None
+        needle = bytes(length + 1)  # byte de atributo + datos
+        offset = buffer_offset(start[0], start[1], self.cols)
+        while offset < self.total:
+            found = self._counts.find(needle, offset)
+            if found < 0:
+                return None
+            if found % self.cols + length + 1 <= self.cols:
+                return (found // self.cols + 1, found % self.cols + 1)
+            # Los datos se saldrían de la línea: continuar en la siguiente
+            offset = (found // self.cols + 1) * self.cols
+        return None
+
+    def overlaps(self) -> List[Tuple]:
+        """Pares de campos que comparten alguna celda"""
+        if not self._conflicts:
+            return []
+        order = {id(placed[0]): index for index, placed in enumerate(self._placed.values())}
+        pairs = {}
+        for offset in self._conflicts:
+            owners = sorted(self._owners[offset], key=lambda f: order[id(f)])
+            for i, first in enumerate(owners):
+                for second in owners[i + 1:]:
+                    pairs[(order[id(first)], order[id(second)])] = (first, second)
+        return [pairs[key] for key in sorted(pairs)]
+
+    def conflict_cells(self) -> List[Tuple[int, int]]:
+        """Celdas (línea, columna) ocupadas por más de un campo"""
+        return [(offset // self.cols + 1, offset % self.cols + 1) for offset in sorted(self._conflicts)]
+
+    def _attribute_offset(self, bms_field) -> int:
+        line, column, _ = self._placed[id(bms_field)][1]
+        return buffer_offset(line, column, self.cols)
+
+
+class _Placement:
+    """Posición registrada de un campo (la geometría usa line/column/length)"""
+    __slots__ = ("line", "column", "length")
+
+    def __init__(self, line: int, column: int, length: int):
+        self.line = line
+        self.column = column
+        self.length = length
@@ -0,0 +1,498 @@
+"""
+Representación de sentencias de código fuente BMS
+
+Divide un miembro BMS en sentencias lógicas (uniendo continuaciones) y
+conserva para cada una el rango de líneas y el texto original.
+"""
+from dataclasses import dataclass, field
+from typing import List, Optional, Dict
+
+from .templates import TITLE_COMMENT_PREFIX
+
+
+@dataclass
+class BMSStatement:
+    """Sentencia lógica de un fuente BMS con su rango de líneas (1-based, inclusivo)"""
+    kind: str  # "statement" (DFHMSD/DFHMDI/DFHMDF), "comment", "blank" u "other"
+    start_line: int
+    end_line: int
+    lines: List[str] = field(default_factory=list)
+    info: Optional[Dict] = None  # label, directive, parameters (solo para "statement")
+    
+    @property
+    def directive(self) -> str:
+        return self.info['directive'] if self.info else ""
+        
+    @property
+    def label(self) -> str:
+        return self.info['label'] if self.info else ""
+        
+    @property
+    def parameters(self) -> str:
+        return self.info['parameters'] if self.info else ""
+        
+    @property
+    def text(self) -> str:
+        return "\n".join(self.lines)
+
+
+def scan_statements(content: str) -> List[BMSStatement]:
+    """
+    Divide el contenido BMS en sentencias lógicas según especificaciones IBM:
+    - Pos 1-9: Nombre del label (vacío para labels, 8 caracteres para campos)
+    - Pos 10-15: DFHMSD, DFHMDI, DFHMDF según corresponda
+    - Pos 16-71: Parámetros y valores
+    - Pos 72: '*' o '-' para continuación en línea siguiente (pos 16)
+    
+    Cada línea del contenido pertenece exactamente a una sentencia, de modo
+    que unir el texto de todas reproduce el contenido original.
+    """
+    lines = content.split('\n')
+    statements = []
+    
+    i = 0
+    while i < len(lines):
+        line = lines[i]
+        
+        # Líneas vacías y comentarios (líneas que empiezan con * en pos 1)
+        if not line.strip():
+            statements.append(BMSStatement("blank", i + 1, i + 1, [line]))
+            i += 1
+            continue
+        if line.startswith('*'):
+            statements.append(BMSStatement("comment", i + 1, i + 1, [line]))
+            i += 1
+            continue
+            
+        # Analizar la estructura de la línea según posiciones BMS
+        line_info = _parse_bms_line_structure(line)
+        
+        if not line_info:
+            statements.append(BMSStatement("other", i + 1, i + 1, [line]))
+            i += 1
+            continue
+            
+        start = i
+        i += 1
+        
+        # Procesar líneas con continuación
+        if _has_continuation(line):
+            # Recopilar todas las líneas de continuación
+            while i < len(lines) and _is_continuation_line(lines[i]):
+                i += 1
+                if not _has_continuation(lines[i - 1]):
+                    break
+                    
+            # Unir líneas de continuación
+            full_line = _join_bms_continuation_lines(lines[start:i])
+            line_info = _parse_bms_line_structure(full_line, joined=True)
+            
+        statements.append(BMSStatement(
+            "statement" if line_info else "other", start + 1, i, lines[start:i], line_info
+        ))
+        
+    return statements
+
+def _parse_bms_line_structure(line: str, joined: bool = False) -> Optional[Dict]:
+    """
+    Analiza la estructura de una línea BMS según posiciones específicas:
+    Maneja dos formatos:
+    1. Con nombre: "NOMBRE   DFHMDF ..." (nombre en pos 1-9, DFHMDF en pos 10-15)
+    2. Sin nombre: "         DFHMDF ..." o "DFHMDF ..." (DFHMDF en pos 10-15 o pos 1)
+    
+    Si joined es True la línea proviene de unir continuaciones y no se
+    aplica el límite de la posición 71.
+    """
+    if len(line) < 6:  # Mínimo para contener DFHMDF/DFHMDI/DFHMSD
+        return None
+    
+    # Primer intento: formato estándar con nombre (pos 1-9, DFHMDF en pos 10-15)
+    if len(line) >= 15:
+        label_section = line[0:9].strip()
+        directive_section = line[9:16].strip() if len(line) > 15 else line[9:15].strip()
+        
+        if directive_section in ['DFHMSD', 'DFHMDI', 'DFHMDF']:
+            # Para líneas unidas (continuaciones), extraer todos los parámetros sin límite de posición 71
+            if joined:
+                parameters_section = line[16:].strip()
+                continuation_marker = ""  # Las líneas unidas ya no tienen marcador
+            else:
+                # Línea normal, respetar límite de posición 71
+                parameters_section = line[16:71].strip() if len(line) > 71 else line[16:].strip()
+                continuation_marker = line[71:72] if len(line) > 71 else ""
+            
+            return {
+                'label': label_section,
+                'directive': directive_section,
+                'parameters': parameters_section,
+                'continuation': continuation_marker in ['*', '-'],
+                'raw_line': line
+            }
+    
+    # Segundo intento: DFHMDF al inicio de la línea (formato compacto)
+    if line.strip().startswith(('DFHMSD', 'DFHMDI', 'DFHMDF')):
+        parts = line.strip().split(None, 1)  # Dividir en máximo 2 partes
+        directive_section = parts[0]
+        parameters_section = parts[1] if len(parts) > 1 else ""
+        
+        # Buscar marcador de continuación al final
+        continuation = False
+        if len(line) > 71 and line[71] in ['*', '-']:
+            continuation = True
+        elif parameters_section.endswith(('*', '-')):
+            continuation = True
+            
+        return {
+            'label': "",  # Sin nombre de campo
+            'directive': directive_section,
+            'parameters': parameters_section,
+            'continuation': continuation,
+            'raw_line': line
+        }
+        
+    return None
+
+def _has_continuation(line: str) -> bool:
+    """
+    Verifica si una línea tiene marcador de continuación.
+    Busca * o - al final de la línea (preferiblemente en pos 72, pero puede estar en otras posiciones)
+    """
+    line_stripped = line.rstrip()
+    
+    # Si la línea termina con * o -, tiene continuación
+    if line_stripped.endswith('*') or line_stripped.endswith('-'):
+        return True
+        
+    # Verificación adicional: si hay exactamente posición 72 con marcador
+    if len(line) > 71 and line[71] in ['*', '-']:
+        return True
+        
+    return False
+
+def _is_continuation_line(line: str) -> bool:
+    """
+    Verifica si una línea es continuación de la anterior.
+    Las líneas de continuación tienen:
+    - Posiciones 1-15: espacios en blanco
+    - Posición 16+: contenido de continuación
+    """
+    if not line.strip():
+        return False
+    
+    # Una línea de continuación debe tener espacios en posiciones 1-15 y contenido después
+    if len(line) >= 16:
+        return line[0:15].strip() == "" and line[15:].strip() != ""
+    
+    return False
+
+def _strip_continuation_marker(line: str) -> str:
+    """Elimina el marcador de continuación (pos 72 o final de línea) de una línea"""
+    if len(line) > 71 and line[71] in ['*', '-']:
+        return line[:71]
+    line_stripped = line.rstrip()
+    if line_stripped.endswith(('*', '-')):
+        return line_stripped[:-1]
+    return line
+
+def _fills_content_area(line: str) -> bool:
+    """Indica si la línea (sin marcador) tiene contenido hasta la pos 71 que no cierra un operando"""
+    return len(line) >= 71 and line[70] not in (' ', ',')
+
+def _join_bms_continuation_lines(lines: List[str]) -> str:
+    """
+    Une líneas de continuación BMS respetando las posiciones:
+    - Primera línea: completa (hasta pos 71)
+    - Líneas siguientes: desde posición 16, separadas por comas
+    - Literales partidos en la pos 71 se unen sin separador, conservando espacios
+    """
+    if not lines:
+        return ""
+        
+    if len(lines) == 1:
+        # Remover marcador de continuación si existe
+        line = lines[0]
+        if len(line) > 71 and line[71] in ['*', '-']:
+            return line[:71].rstrip()
+        return line
+        
+    # Primera línea (sin marcador de continuación)
+    result = _strip_continuation_marker(lines[0])
+    in_literal = result.count("'") % 2 == 1
+    filled = _fills_content_area(result)
+    if not in_literal:
+        result = result.rstrip()
+    
+    # Líneas de continuación (desde posición 16)
+    for cont_line in lines[1:]:
+        if len(cont_line) < 16:
+            continue
+        stripped = _strip_continuation_marker(cont_line)
+        cont_content = stripped[15:]
+        # Una línea llena hasta la pos 71 sigue sin separador en la pos 16
+        # (por ejemplo un '' partido entre las dos líneas)
+        joined = in_literal or filled
+        filled = _fills_content_area(stripped)
+        if not joined:
+            cont_content = cont_content.lstrip()
+        in_literal = (in_literal + cont_content.count("'")) % 2 == 1
+        if not in_literal:
+            cont_content = cont_content.rstrip()
+        if not cont_content:
+            continue
+        # Agregar coma entre operandos si no está presente (nunca dentro de un literal)
+        if not joined and not result.endswith(',') and not cont_content.startswith(','):
+            result += ","
+        result += cont_content
+                
+    return result
+
+def split_operands(parameters: str) -> List[str]:
+    """Divide los parámetros de una sentencia en operandos (respetando paréntesis y literales)"""
+    operands = []
+    depth = 0
+    in_literal = False
+    start = 0
+    
+    for index, char in enumerate(parameters):
+        if char == "'":
+            in_literal = not in_literal
+        elif in_literal:
+            continue
+        elif char == '(':
+            depth += 1
+        elif char == ')':
+            depth -= 1
+        elif char == ',' and depth == 0:
+            operands.append(parameters[start:index])
+            start = index + 1
+            
+    if parameters[start:]:
+        operands.append(parameters[start:])
+    return [operand for operand in operands if operand]
+
+def _operand_keyword(operand: str) -> str:
+    return operand.split('=', 1)[0].strip().upper()
+
+
+# Operandos DFHMDF representados en BMSField (el resto se conserva del fuente original)
+MODELED_FIELD_OPERANDS = {"POS", "LENGTH", "INITIAL", "ATTRB", "PICIN", "PICOUT", "COLOR", "HILIGHT"}
+
+
+def unmodeled_operands(statement: BMSStatement) -> List[str]:
+    """Operandos de una sentencia DFHMDF no representados en BMSField (JUSTIFY, GRPNAME, OCCURS...)"""
+    return [op for op in split_operands(statement.parameters)
+            if _operand_keyword(op) not in MODELED_FIELD_OPERANDS]
+
+def field_state(bms_field) -> tuple:
+    """Estado de un campo que afecta a su sentencia DFHMDF"""
+    return (
+        bms_field.name, bms_field.line, bms_field.column, bms_field.length,
+        tuple(bms_field.attributes), bms_field.initial_value, bms_field.picin,
+        bms_field.picout, bms_field.color, bms_field.hilight
+    )
+
+def _mapset_state(bms_map) -> Dict[str, object]:
+    """Operandos DFHMSD representados en BMSMap"""
+    return {
+        "MODE": bms_map.mode,
+        "LANG": bms_map.lang,
+        "TERM": bms_map.term,
+        "CTRL": f"({','.join(bms_map.ctrl)})" if bms_map.ctrl else None,
+        "STORAGE": bms_map.storage,
+    }
+
+
+class BMSSourceDocument:
+    """
+    Representación sin pérdida de un fuente BMS, mantenida junto al modelo.
+    
+    Guarda todas las sentencias del fuente original (comentarios, alineación,
+    operandos no modelados) y el estado de cada campo al cargarlo. Al
+    renderizar solo se regeneran las sentencias cuyo campo o mapa cambió;
+    el resto se escribe tal cual.
+    
+    Los cambios se detectan comparando el estado de cada campo con el
+    registrado (el modelo no avisa de sus modificaciones), por lo que cada
+    render recorre los campos; sin cambios se devuelve el texto anterior
+    sin recorrer las sentencias.
+    """
+    
+    def __init__(self, statements: List[BMSStatement], bms_map):
+        self.bms_map = bms_map
+        self.statements = list(statements)
+        self._field_states: Dict[int, tuple] = {}
+        self._map_state = None
+        self._text: Optional[str] = None  # Fuente del último render (o el original)
+        self._snapshot()
+        
+    def _snapshot(self):
+        """Registra el estado actual del modelo como el reflejado por el fuente"""
+        self._field_states = {
+            id(statement.info['field']): field_state(statement.info['field'])
+            for statement in self.statements
+            if statement.info and statement.info.get('field') is not None
+        }
+        self._map_state = self._current_map_state()
+        
+    def _current_map_state(self) -> tuple:
+        return (self.bms_map.mapset_name, self.bms_map.name, tuple(self.bms_map.size),
+                _mapset_state(self.bms_map), self.bms_map.title)
+        
+    def changed_fields(self) -> List:
+        """Campos nuevos o modificados desde la última sincronización"""
+        return [f for f in self.bms_map.fields if self._field_states.get(id(f)) != field_state(f)]
+        
+    def render(self, generator) -> str:
+        """
+        Sincroniza el documento con el modelo y retorna el fuente completo.
+        Solo las sentencias afectadas se regeneran con el generador.
+        """
+        changed = self.changed_fields()
+        if (not changed and len(self.bms_map.fields) == len(self._field_states)
+                and self._text is not None and self._current_map_state() == self._map_state):
+            return self._text  # Sin cambios (ni campos eliminados) desde el último render
+        current_ids = {id(f) for f in self.bms_map.fields}
+        changed_ids = {id(f) for f in changed}
+        
+        # 1. Conservar sentencias intactas; regenerar en su sitio las modificadas
+        #    que no cambiaron de posición; separar las que deben reubicarse
+        kept: List[BMSStatement] = []
+        # (campo, sentencia original): los movidos conservan sus operandos no modelados
+        pending = [(f, None) for f in changed if id(f) not in self._field_states]
+        for statement in self.statements:
+            bms_field = statement.info.get('field') if statement.info else None
+            if bms_field is None:
+                kept.append(statement)
+            elif id(bms_field) not in current_ids:
+                continue  # Campo eliminado
+            elif id(bms_field) not in changed_ids:
+                kept.append(statement)
+            elif self._field_states[id(bms_field)][1:3] == (bms_field.line, bms_field.column):
+                kept.append(self._render_field(generator, bms_field, statement))
+            else:
+                pending.append((bms_field, statement))
+                
+        # 2. Insertar campos nuevos o movidos en orden de posición
+        if pending:
+            pending.sort(key=lambda entry: (entry[0].line, entry[0].column))
+            kept = self._merge_fields(generator, kept, pending)
+            
+        # 3. Cabeceras DFHMSD/DFHMDI si cambiaron las propiedades del mapa
+        self.statements = self._render_headers(generator, kept)
+        
+        # Renumerar rangos de líneas y registrar el nuevo estado
+        line_number = 1
+        for statement in self.statements:
+            statement.start_line = line_number
+            line_number += len(statement.lines)
+            statement.end_line = line_number - 1
+        self._snapshot()
+        
+        self._text = "\n".join(line for statement in self.statements for line in statement.lines)
+        return self._text
+        
+    def _render_field(self, generator, bms_field, original: Optional[BMSStatement] = None) -> BMSStatement:
+        """Regenera la sentencia DFHMDF de un campo conservando los operandos no modelados"""
+        extra = unmodeled_operands(original) if original is not None else []
+        code = generator.generate_field_code(bms_field, extra)
+        statement = scan_statements(code)[0]
+        statement.info['field'] = bms_field
+        return statement
+        
+    def _merge_fields(self, generator, statements: List[BMSStatement], pending: List) -> List[BMSStatement]:
+        """
+        Intercala los campos pendientes, pares (campo, sentencia original o
+        None), entre las sentencias DFHMDF existentes según su posición
+        """
+        field_indexes = [i for i, s in enumerate(statements) if s.directive == 'DFHMDF']
+        if field_indexes:
+            tail_index = field_indexes[-1] + 1
+        else:
+            headers = [i for i, s in enumerate(statements) if s.directive == 'DFHMDI']
+            tail_index = headers[0] + 1 if headers else len(statements)
+            
+        merged: List[BMSStatement] = []
+        next_pending = 0
+        for index, statement in enumerate(statements):
+            if index == tail_index:
+                while next_pending < len(pending):
+                    merged.append(self._render_field(generator, *pending[next_pending]))
+                    next_pending += 1
+            bms_field = statement.info.get('field') if statement.info else None
+            if bms_field is not None:
+                position = (bms_field.line, bms_field.column)
+                while next_pending < len(pending) and (pending[next_pending][0].line, pending[next_pending][0].column) < position:
+                    merged.append(self._render_field(generator, *pending[next_pending]))
+                    next_pending += 1
+            merged.append(statement)
+            
+        while next_pending < len(pending):
+            merged.append(self._render_field(generator, *pending[next_pending]))
+            next_pending += 1
+        return merged
+        
+    def _render_headers(self, generator, statements: List[BMSStatement]) -> List[BMSStatement]:
+        """Regenera DFHMSD/DFHMDI solo con los operandos del mapa que cambiaron (y el comentario TITLE)"""
+        old_mapset_name, old_map_name, old_size, old_mapset_ops, old_title = self._map_state
+        if old_title != self.bms_map.title:
+            statements = self._render_title(statements)
+        new_mapset_ops = _mapset_state(self.bms_map)
+        changed_ops = {key: value for key, value in new_mapset_ops.items()
+                       if value is not None and old_mapset_ops.get(key) != value}
+        
+        mapset_changed = bool(changed_ops) or old_mapset_name != self.bms_map.mapset_name
+        map_changed = old_map_name != self.bms_map.name or old_size != tuple(self.bms_map.size)
+        if not mapset_changed and not map_changed:
+            return statements
+            
+        result = []
+        mapset_done = map_done = False
+        for statement in statements:
+            if (mapset_changed and not mapset_done and statement.directive == 'DFHMSD'
+                    and 'TYPE=FINAL' not in statement.parameters.upper()):
+                statement = self._rewrite_statement(generator, statement, self.bms_map.mapset_name, changed_ops)
+                mapset_done = True
+            elif map_changed and not map_done and statement.directive == 'DFHMDI':
+                size_ops = {}
+                if old_size != tuple(self.bms_map.size):
+                    size_ops["SIZE"] = f"({self.bms_map.size[0]},{self.bms_map.size[1]})"
+                statement = self._rewrite_statement(generator, statement, self.bms_map.name, size_ops)
+                map_done = True
+            result.append(statement)
+        return result
+        
+    def _render_title(self, statements: List[BMSStatement]) -> List[BMSStatement]:
+        """Reemplaza, añade tras el DFHMDI o elimina el comentario TITLE del mapa"""
+        title = self.bms_map.title
+        result = []
+        done = False
+        for statement in statements:
+            if not done and statement.kind == "comment" and statement.lines[0].startswith(TITLE_COMMENT_PREFIX):
+                done = True
+                if title:
+                    result.append(BMSStatement("comment", 0, 0, [TITLE_COMMENT_PREFIX + title]))
+                continue
+            result.append(statement)
+        if not done and title:
+            headers = [i for i, s in enumerate(result) if s.directive == 'DFHMDI']
+            position = headers[0] + 1 if headers else 0
+            result.insert(position, BMSStatement("comment", 0, 0, [TITLE_COMMENT_PREFIX + title]))
+        return result
+        
+    def _rewrite_statement(self, generator, statement: BMSStatement, label: str, replacements: Dict) -> BMSStatement:
+        """Reemplaza (o añade) operandos de una sentencia conservando el resto"""
+        operands = []
+        seen = set()
+        for operand in split_operands(statement.parameters):
+            keyword = _operand_keyword(operand)
+            if keyword in replacements:
+                operands.append(f"{keyword}={replacements[keyword]}")
+                seen.add(keyword)
+            else:
+                operands.append(operand)
+        for keyword, value in replacements.items():
+            if keyword not in seen:
+                operands.append(f"{keyword}={value}")
+                
+        code = generator.render_statement(label, statement.directive, operands)
+        return scan_statements(code)[0]
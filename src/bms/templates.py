@@ -0,0 +1,121 @@
+"""
+Plantillas compiladas para las cabeceras y pies del código BMS
+"""
+from string import Formatter
+from typing import Dict, List, Optional, Tuple
+
+
+# Límites de columnas de una sentencia BMS (ensamblador)
+CONTENT_END_COLUMN = 71     # Última columna con contenido
+CONTINUATION_MARKER = "*"   # Marcador de continuación en la columna 72
+TITLE_COMMENT_PREFIX = "*        TITLE: "  # Comentario con el título, tras el DFHMDI
+
+# Plantillas por defecto (formato str.format)
+DEFAULT_TEMPLATES = {
+    "comment_banner": "",
+    "mapset_header": "{mapset_name:<8} DFHMSD TYPE=&SYSPARM,MODE={mode},LANG={lang},          *\n               TERM={term},CTRL=({ctrl}),STORAGE={storage}",
+    "map_header": "{map_name:<8} DFHMDI SIZE=({lines},{cols})",
+    "map_footer": "",
+    "mapset_footer": "         DFHMSD TYPE=FINAL\n         END",
+}
+
+# Variables disponibles en cada plantilla
+TEMPLATE_SLOTS = {
+    "comment_banner": {"mapset_name", "map_name"},
+    "mapset_header": {"mapset_name", "mode", "lang", "term", "ctrl", "storage"},
+    "map_header": {"map_name", "lines", "cols"},
+    "map_footer": {"map_name"},
+    "mapset_footer": {"mapset_name"},
+}
+
+
+class CompiledTemplate:
+    """
+    Plantilla analizada una sola vez.
+
+    Cada línea se guarda como una lista de segmentos literales con huecos
+    precalculados para las variables, de modo que renderizar solo rellena
+    esos huecos y une los segmentos. Las variables constantes (del sitio)
+    se resuelven al compilar.
+
+    Las líneas que terminan en espacios seguidos de '*' (y no son
+    comentarios) son líneas continuadas: al renderizar se alinea el
+    marcador en la columna 72.
+    """
+
+    def __init__(self, name: str, text: str, allowed_slots: Optional[set] = None,
+                 constants: Optional[Dict[str, str]] = None):
+        self.name = name
+        self.text = text
+        self._lines: List[Tuple[List[str], List[Tuple[int, str, str]], bool]] = []
+        constants = constants or {}
+
+        for raw_line in text.split("\n") if text else []:
+            continued = False
+            stripped = raw_line.rstrip()
+            if (not stripped.startswith("*") and stripped.endswith(CONTINUATION_MARKER)
+                    and stripped[:-1] != stripped[:-1].rstrip()):
+                continued = True
+                raw_line = stripped[:-1].rstrip()
+
+            parts: List[str] = []
+            slots: List[Tuple[int, str, str]] = []
+            for literal, field_name, format_spec, conversion in Formatter().parse(raw_line):
+                if literal:
+                    parts.append(literal)
+                if field_name is None:
+                    continue
+                if conversion:
+                    raise ValueError(f"Plantilla '{name}': conversión no soportada en {{{field_name}!{conversion}}}")
+                if field_name in constants:
+                    # Variable del sitio: se resuelve una sola vez al compilar
+                    parts.append(format(constants[field_name], format_spec or ""))
+                elif allowed_slots is not None and field_name not in allowed_slots:
+                    raise ValueError(f"Plantilla '{name}': variable desconocida {{{field_name}}}")
+                else:
+                    slots.append((len(parts), field_name, format_spec or ""))
+                    parts.append("")
+
+            self._lines.append((parts, slots, continued))
+
+    def __bool__(self) -> bool:
+        return bool(self._lines)
+
+    def render(self, values: Dict[str, object]) -> str:
+        """Renderiza la plantilla rellenando los huecos con los valores dados"""
+        rendered = []
+        for parts, slots, continued in self._lines:
+            if slots:
+                parts = parts[:]
+                for index, field_name, format_spec in slots:
+                    if field_name not in values:
+                        raise ValueError(f"Plantilla '{self.name}': sin valor para la variable {{{field_name}}}")
+                    parts[index] = format(values[field_name], format_spec)
+            line = "".join(parts)
+            if continued:
+                line = line.ljust(CONTENT_END_COLUMN) + CONTINUATION_MARKER
+            rendered.append(line)
+        return "\n".join(rendered)
+
+
+class TemplateSet:
+    """Conjunto de plantillas compiladas usado por BMSGenerator"""
+
+    def __init__(self, templates: Optional[Dict[str, str]] = None,
+                 constants: Optional[Dict[str, str]] = None):
+        sources = dict(DEFAULT_TEMPLATES)
+        for key, text in (templates or {}).items():
+            if key not in DEFAULT_TEMPLATES:
+                raise ValueError(f"Plantilla desconocida: {key}")
+            sources[key] = text
+
+        self._compiled = {
+            key: CompiledTemplate(key, text, TEMPLATE_SLOTS[key], constants)
+            for key, text in sources.items()
+        }
+
+    def __getitem__(self, key: str) -> CompiledTemplate:
+        return self._compiled[key]
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._compiled
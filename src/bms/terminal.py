@@ -0,0 +1,110 @@
+"""
+Modelos de terminal 3270: tamaño de pantalla por TERM y geometría del buffer.
+
+Cada combinación de terminal y tamaño de mapa se resuelve una sola vez en un
+TerminalGeometry precalculado, de modo que validar miles de mapas no vuelve
+a derivar la geometría por cada uno.
+"""
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Optional, Tuple
+
+
+# Tamaño de pantalla (líneas, columnas) de cada modelo 3270
+TERMINAL_SIZES = {
+    "3270-1": (12, 40),
+    "3270-2": (24, 80),
+    "3270-3": (32, 80),
+    "3270-4": (43, 80),
+    "3270-5": (27, 132),
+}
+
+# Alias de TERM que BMS acepta para el modelo por defecto
+TERMINAL_ALIASES = {
+    "3270": "3270-2",
+    "ALL": "3270-2",
+}
+
+DEFAULT_TERMINAL = "3270-2"
+
+
+@dataclass(frozen=True)
+class TerminalGeometry:
+    """
+    Geometría de un buffer 3270.
+
+    En BMS, POS=(línea,columna) indica la posición del byte de atributo; los
+    datos del campo ocupan las LENGTH posiciones siguientes. El buffer es
+    lineal: un campo puede continuar en la línea siguiente y, al final de la
+    pantalla, volver a la posición 0 (wrap).
+    """
+    term: str
+    lines: int
+    cols: int
+    known: bool = True  # False si TERM no es un modelo conocido
+
+    @property
+    def total(self) -> int:
+        return self.lines * self.cols
+
+    @property
+    def size(self) -> Tuple[int, int]:
+        return (self.lines, self.cols)
+
+    def offset(self, line: int, column: int) -> int:
+        """Desplazamiento (0-based) de una posición 1-based"""
+        return (line - 1) * self.cols + column - 1
+
+    def position(self, offset: int) -> Tuple[int, int]:
+        """Posición (línea, columna) 1-based de un desplazamiento"""
+        offset %= self.total
+        return (offset // self.cols + 1, offset % self.cols + 1)
+
+    def attribute_offset(self, line: int, column: int) -> int:
+        return self.offset(line, column)
+
+    def data_range(self, line: int, column: int, length: int) -> Tuple[int, int]:
+        """Rango [inicio, fin) de los datos del campo (sin normalizar el wrap)"""
+        start = self.offset(line, column) + 1
+        return (start, start + max(length, 0))
+
+    def fits(self, size: Tuple[int, int]) -> bool:
+        """Indica si un mapa del tamaño dado cabe en la pantalla del terminal"""
+        return 1 <= size[0] <= self.lines and 1 <= size[1] <= self.cols
+
+    def wraps_line(self, line: int, column: int, length: int) -> bool:
+        """Los datos continúan en la línea siguiente"""
+        return column + length > self.cols
+
+    def wraps_buffer(self, line: int, column: int, length: int) -> bool:
+        """Los datos pasan del final del buffer y continúan en la posición 0"""
+        return self.data_range(line, column, length)[1] > self.total
+
+
+def terminal_geometry(term: Optional[str], size: Optional[Tuple[int, int]] = None) -> TerminalGeometry:
+    """
+    Geometría del terminal indicado por TERM. Para terminales desconocidos se
+    usa el tamaño del mapa (o el del modelo por defecto). Los objetos se
+    cachean: hay uno solo por modelo de terminal.
+    """
+    name = (term or DEFAULT_TERMINAL).strip().upper()
+    name = TERMINAL_ALIASES.get(name, name)
+    if name in TERMINAL_SIZES:
+        return _known_terminal(name)
+    return _unknown_terminal(name, tuple(size) if size else TERMINAL_SIZES[DEFAULT_TERMINAL])
+
+
+@lru_cache(maxsize=None)
+def _known_terminal(name: str) -> TerminalGeometry:
+    lines, cols = TERMINAL_SIZES[name]
+    return TerminalGeometry(name, lines, cols)
+
+
+@lru_cache(maxsize=256)
+def _unknown_terminal(name: str, size: Tuple[int, int]) -> TerminalGeometry:
+    return TerminalGeometry(name, size[0], size[1], known=False)
+
+
+def map_geometry(bms_map) -> TerminalGeometry:
+    """Geometría del terminal de un mapa"""
+    return terminal_geometry(bms_map.term, tuple(bms_map.size))
@@ -0,0 +1,417 @@
+"""
+Motor de validación basado en reglas con caché incremental.
+
+Cada regla declara las propiedades de campo y de mapa de las que depende.
+El motor guarda los resultados por campo y, tras una edición, solo vuelve a
+ejecutar las reglas afectadas por las propiedades que cambiaron.
+"""
+from collections import OrderedDict
+from operator import attrgetter
+from dataclasses import dataclass, field as dataclass_field
+from typing import Callable, Dict, FrozenSet, List, Optional, Tuple
+import time
+
+from .geometry import data_overlap
+from .names import MAX_FIELD_NAME_LENGTH, classify_name
+from .pictures import parse_picture
+from .screen import ScreenBuffer
+from .terminal import map_geometry
+
+
+# Severidades de los hallazgos
+ERROR = "error"
+WARNING = "warning"
+
+
+@dataclass
+class ValidationFinding:
+    """Resultado estructurado de una regla de validación"""
+    code: str
+    severity: str
+    message: str               # Texto mostrado al usuario (compatible con validate_map)
+    map_name: str = ""
+    field_name: str = ""
+    position: Optional[Tuple[int, int]] = None  # (línea, columna) del campo
+    # Campos implicados (objetos BMSField), para marcarlos en el editor visual
+    subjects: Tuple = dataclass_field(default=(), repr=False, compare=False)
+
+    def to_dict(self) -> Dict:
+        return {
+            "code": self.code,
+            "severity": self.severity,
+            "message": self.message,
+            "map": self.map_name,
+            "field": self.field_name,
+            "line": self.position[0] if self.position else None,
+            "column": self.position[1] if self.position else None,
+        }
+
+
+@dataclass(frozen=True)
+class ValidationRule:
+    """
+    Regla de validación.
+
+    scope "map": check(bms_map) sobre el mapa.
+    scope "field": check(field, map_size) sobre cada campo; se cachea por
+    campo y se reejecuta cuando cambia alguna propiedad de field_depends
+    (o de map_depends en el mapa).
+    Cada check retorna la lista de mensajes (vacía si la regla se cumple).
+    """
+    code: str
+    scope: str
+    check: Callable
+    field_depends: FrozenSet[str] = frozenset()
+    map_depends: FrozenSet[str] = frozenset()
+    severity: str = ERROR
+
+
+def is_valid_bms_name(name: str) -> bool:
+    """Valida si un nombre es válido para BMS (alfanumérico o @#$, max 8 chars)"""
+    return classify_name(name).valid
+
+
+# ---- Reglas de mapa ----
+
+def _check_map_name(bms_map) -> List[str]:
+    if not bms_map.name or not is_valid_bms_name(bms_map.name):
+        return ["Nombre del mapa inválido (debe ser alfanumérico, máximo 8 caracteres)"]
+    return []
+
+def _check_mapset_name(bms_map) -> List[str]:
+    if not bms_map.mapset_name or not is_valid_bms_name(bms_map.mapset_name):
+        return ["Nombre del mapset inválido (debe ser alfanumérico, máximo 8 caracteres)"]
+    return []
+
+def _check_map_lines(bms_map) -> List[str]:
+    # El máximo depende del modelo de terminal (TERM)
+    max_lines = map_geometry(bms_map).lines
+    if bms_map.size[0] < 1 or bms_map.size[0] > max_lines:
+        return [f"Número de líneas debe estar entre 1 y {max_lines}"]
+    return []
+
+def _check_map_columns(bms_map) -> List[str]:
+    max_cols = map_geometry(bms_map).cols
+    if bms_map.size[1] < 1 or bms_map.size[1] > max_cols:
+        return [f"Número de columnas debe estar entre 1 y {max_cols}"]
+    return []
+
+def _check_terminal(bms_map) -> List[str]:
+    if not map_geometry(bms_map).known:
+        return [f"Terminal desconocido (TERM={bms_map.term}); se usa el tamaño del mapa"]
+    return []
+
+
+# ---- Reglas de campo ----
+
+def _check_field_name(field, map_size) -> List[str]:
+    if not field.name or not is_valid_bms_name(field.name):
+        return ["Nombre del campo inválido"]
+    return []
+
+def _check_field_name_suffix(field, map_size) -> List[str]:
+    # Los nombres generados no se emiten como etiqueta y no llevan sufijo
+    info = classify_name(field.name)
+    if info.valid and not info.auto_generated and not info.suffix_safe:
+        return [f"Nombre del campo de más de {MAX_FIELD_NAME_LENGTH} caracteres: "
+                "no admite los sufijos del mapa simbólico (L, F, A, I, O)"]
+    return []
+
+def _check_field_line(field, map_size) -> List[str]:
+    if field.line < 1 or field.line > map_size[0]:
+        return [f"Línea fuera de rango (1-{map_size[0]})"]
+    return []
+
+def _check_field_column(field, map_size) -> List[str]:
+    if field.column < 1 or field.column > map_size[1]:
+        return [f"Columna fuera de rango (1-{map_size[1]})"]
+    return []
+
+def _check_field_length(field, map_size) -> List[str]:
+    if field.length < 1:
+        return ["Longitud debe ser mayor a 0"]
+    return []
+
+def _check_field_width(field, map_size) -> List[str]:
+    # POS es el byte de atributo: los datos ocupan las columnas column+1..column+length
+    if field.column + field.length > map_size[1]:
+        return ["Campo se extiende más allá del ancho de la pantalla"]
+    return []
+
+def _check_buffer_wrap(field, map_size) -> List[str]:
+    end = (field.line - 1) * map_size[1] + field.column + field.length
+    if field.line <= map_size[0] and end > map_size[0] * map_size[1]:
+        return ["Campo pasa del final de la pantalla y continúa en la posición (1,1)"]
+    return []
+
+def _check_pictures(field, map_size) -> List[str]:
+    # picture es el nombre antiguo de PICIN (se emite como PICIN si no hay picin)
+    messages = []
+    for keyword, picture in (("PICIN", field.picin or field.picture), ("PICOUT", field.picout)):
+        if not picture:
+            continue
+        info = parse_picture(picture)
+        if not info.valid:
+            messages.append(f"{keyword} '{picture}' inválido: {info.error}")
+        elif info.display_length != field.length:
+            messages.append(f"{keyword} '{picture}' ocupa {info.display_length} posiciones "
+                            f"pero LENGTH={field.length}")
+    return messages
+
+
+def _attribute_names(field) -> List[str]:
+    return [str(getattr(attr, "value", attr)).upper() for attr in field.attributes]
+
+# Grupos de atributos mutuamente excluyentes en ATTRB
+_EXCLUSIVE_ATTRIBUTES = (("ASKIP", "PROT", "UNPROT"), ("BRT", "NORM", "DRK"))
+
+def _check_attribute_conflicts(field, map_size) -> List[str]:
+    names = set(_attribute_names(field))
+    messages = []
+    for group in _EXCLUSIVE_ATTRIBUTES:
+        present = [name for name in group if name in names]
+        if len(present) > 1:
+            messages.append(f"Atributos incompatibles: {', '.join(present)}")
+    return messages
+
+def _check_numeric_askip(field, map_size) -> List[str]:
+    names = _attribute_names(field)
+    if "NUM" in names and "ASKIP" in names:
+        return ["NUM no tiene efecto en un campo ASKIP"]
+    return []
+
+
+MAP_RULES = [
+    ValidationRule("MAP_NAME", "map", _check_map_name, map_depends=frozenset({"name"})),
+    ValidationRule("MAPSET_NAME", "map", _check_mapset_name, map_depends=frozenset({"mapset_name"})),
+    ValidationRule("MAP_LINES", "map", _check_map_lines, map_depends=frozenset({"size", "term"})),
+    ValidationRule("MAP_COLUMNS", "map", _check_map_columns, map_depends=frozenset({"size", "term"})),
+    ValidationRule("TERM_UNKNOWN", "map", _check_terminal, map_depends=frozenset({"term"}), severity=WARNING),
+]
+
+FIELD_RULES = [
+    ValidationRule("FIELD_NAME", "field", _check_field_name, field_depends=frozenset({"name"})),
+    ValidationRule("FIELD_NAME_SUFFIX", "field", _check_field_name_suffix,
+                   field_depends=frozenset({"name"}), severity=WARNING),
+    ValidationRule("FIELD_LINE", "field", _check_field_line,
+                   field_depends=frozenset({"line"}), map_depends=frozenset({"size"})),
+    ValidationRule("FIELD_COLUMN", "field", _check_field_column,
+                   field_depends=frozenset({"column"}), map_depends=frozenset({"size"})),
+    ValidationRule("FIELD_LENGTH", "field", _check_field_length, field_depends=frozenset({"length"})),
+    ValidationRule("FIELD_WIDTH", "field", _check_field_width,
+                   field_depends=frozenset({"column", "length"}), map_depends=frozenset({"size"})),
+    ValidationRule("BUFFER_WRAP", "field", _check_buffer_wrap,
+                   field_depends=frozenset({"line", "column", "length"}), map_depends=frozenset({"size"})),
+    ValidationRule("PICTURE_LENGTH", "field", _check_pictures,
+                   field_depends=frozenset({"picin", "picout", "picture", "length"})),
+    ValidationRule("ATTRB_CONFLICT", "field", _check_attribute_conflicts,
+                   field_depends=frozenset({"attributes"})),
+    ValidationRule("ATTRB_NUM_ASKIP", "field", _check_numeric_askip,
+                   field_depends=frozenset({"attributes"}), severity=WARNING),
+]
+
+
+class _MapState:
+    """Resultados cacheados de la validación de un mapa"""
+
+    def __init__(self, bms_map):
+        self.bms_map = bms_map
+        self.map_values: Dict[str, object] = {}
+        self.map_results: Dict[str, List[str]] = {}
+        self.field_values: Dict[int, Tuple] = {}
+        self.field_results: Dict[int, Dict[str, List[str]]] = {}
+        self.screen: Optional[ScreenBuffer] = None
+
+
+class ValidationEngine:
+    """
+    Ejecuta reglas de mapa y de campo con caché por campo.
+
+    validate() compara las propiedades de las que dependen las reglas con
+    las de la última validación y solo reejecuta las reglas afectadas. Las
+    comprobaciones entre campos (nombres duplicados y superposiciones) se
+    resuelven con un conjunto de nombres y con un ScreenBuffer actualizado
+    incrementalmente.
+    """
+
+    MAX_CACHED_MAPS = 8
+
+    def __init__(self, map_rules: Optional[List[ValidationRule]] = None,
+                 field_rules: Optional[List[ValidationRule]] = None):
+        self.map_rules = list(MAP_RULES if map_rules is None else map_rules)
+        self.field_rules = list(FIELD_RULES if field_rules is None else field_rules)
+        self._field_props = sorted(set().union(*(r.field_depends for r in self.field_rules)))
+        self._field_snapshot = _tuple_getter(self._field_props)
+        self._map_props = sorted(set().union(*(r.map_depends for r in self.map_rules + self.field_rules)))
+        self._states: "OrderedDict[int, _MapState]" = OrderedDict()
+        self.rules_run = 0  # Contador de ejecuciones de reglas (diagnóstico)
+
+    def reset(self, bms_map=None):
+        """Descarta la caché de un mapa (o de todos)"""
+        if bms_map is None:
+            self._states.clear()
+        else:
+            self._states.pop(id(bms_map), None)
+
+    def validate(self, bms_map, timings: Optional[Dict[str, List[float]]] = None,
+                 owner=None) -> List[ValidationFinding]:
+        """
+        Valida el mapa reutilizando los resultados de las reglas no afectadas.
+        Si se indica timings, acumula en él [ejecuciones, segundos] por regla.
+        owner es el objeto al que pertenece la caché (por defecto el propio
+        mapa): permite validar instantáneas sucesivas de un mismo mapa.
+        """
+        state = self._state_for(bms_map if owner is None else owner)
+        checks = {
+            rule.code: rule.check if timings is None else _timed(rule, timings)
+            for rule in self.map_rules + self.field_rules
+        }
+        map_name = bms_map.name
+
+        # Reglas de mapa y propiedades del mapa que cambiaron
+        map_values = {prop: _map_value(bms_map, prop) for prop in self._map_props}
+        changed_map = {prop for prop in self._map_props if state.map_values.get(prop, _MISSING) != map_values[prop]}
+        for rule in self.map_rules:
+            if rule.code not in state.map_results or rule.map_depends & changed_map:
+                state.map_results[rule.code] = checks[rule.code](bms_map)
+                self.rules_run += 1
+        state.map_values = map_values
+
+        findings = [
+            ValidationFinding(rule.code, rule.severity, message, map_name)
+            for rule in self.map_rules for message in state.map_results[rule.code]
+        ]
+
+        # Reglas de campo
+        map_size = bms_map.size
+        size_rules = {rule.code for rule in self.field_rules if rule.map_depends & changed_map}
+        seen_ids = set()
+        field_names = set()
+        for index, field in enumerate(bms_map.fields, 1):
+            field_id = id(field)
+            seen_ids.add(field_id)
+            values = self._field_snapshot(field)
+            previous = state.field_values.get(field_id)
+            results = state.field_results.get(field_id)
+
+            if previous is None or results is None:
+                results = {rule.code: checks[rule.code](field, map_size) for rule in self.field_rules}
+                self.rules_run += len(self.field_rules)
+                state.field_results[field_id] = results
+            elif previous != values or size_rules:
+                changed = {prop for prop, old, new in zip(self._field_props, previous, values) if old != new}
+                for rule in self.field_rules:
+                    if rule.field_depends & changed or rule.code in size_rules:
+                        results[rule.code] = checks[rule.code](field, map_size)
+                        self.rules_run += 1
+            state.field_values[field_id] = values
+
+            position = (field.line, field.column)
+            for rule in self.field_rules:
+                for message in results[rule.code]:
+                    findings.append(ValidationFinding(
+                        rule.code, rule.severity, f"Campo {index}: {message}",
+                        map_name, field.name, position, (field,)
+                    ))
+
+            # Verificar nombres únicos
+            if field.name in field_names:
+                findings.append(ValidationFinding(
+                    "DUPLICATE_NAME", ERROR, f"Nombre de campo duplicado: {field.name}",
+                    map_name, field.name, position, (field,)
+                ))
+            field_names.add(field.name)
+
+        # Olvidar campos eliminados
+        for field_id in [fid for fid in state.field_values if fid not in seen_ids]:
+            del state.field_values[field_id]
+            state.field_results.pop(field_id, None)
+
+        # Superposiciones (incluyendo el byte de atributo)
+        started = time.perf_counter()
+        if state.screen is None or state.screen.size != tuple(map_size):
+            state.screen = ScreenBuffer.from_map(bms_map)
+        else:
+            state.screen.sync(bms_map.fields)
+        size = tuple(map_size)
+        for first, second in state.screen.overlaps():
+            if data_overlap(first, second, size):
+                findings.append(ValidationFinding(
+                    "FIELD_OVERLAP", ERROR, f"Campos superpuestos: {first.name} y {second.name}",
+                    map_name, second.name, (second.line, second.column), (first, second)
+                ))
+            else:
+                # Solo coincide un byte de atributo con los datos (o atributo) del otro campo
+                findings.append(ValidationFinding(
+                    "ATTR_COLLISION", ERROR,
+                    f"Byte de atributo en conflicto: {first.name} y {second.name}",
+                    map_name, second.name, (second.line, second.column), (first, second)
+                ))
+        if timings is not None:
+            _accumulate(timings, "FIELD_OVERLAP", time.perf_counter() - started)
+
+        return findings
+
+    def validate_field(self, field, map_size) -> List[str]:
+        """Ejecuta las reglas de campo sobre un campo aislado (sin caché)"""
+        return [message for rule in self.field_rules for message in rule.check(field, map_size)]
+
+    def _state_for(self, bms_map) -> _MapState:
+        state = self._states.get(id(bms_map))
+        if state is None or state.bms_map is not bms_map:
+            state = _MapState(bms_map)
+            self._states[id(bms_map)] = state
+            while len(self._states) > self.MAX_CACHED_MAPS:
+                self._states.popitem(last=False)
+        else:
+            self._states.move_to_end(id(bms_map))
+        return state
+
+
+_MISSING = object()
+
+
+# Propiedades de campo que son listas (se copian como tuplas en las instantáneas
+# para detectar modificaciones en el sitio)
+_SEQUENCE_PROPERTIES = {"attributes"}
+
+
+def _tuple_getter(props: List[str]) -> Callable:
+    """Función que extrae las propiedades indicadas de un objeto como tupla"""
+    if not props:
+        return lambda obj: ()
+    getter = attrgetter(*props) if len(props) > 1 else (lambda obj, g=attrgetter(props[0]): (g(obj),))
+    sequences = [index for index, prop in enumerate(props) if prop in _SEQUENCE_PROPERTIES]
+    if not sequences:
+        return getter
+
+    def snapshot(obj):
+        values = list(getter(obj))
+        for index in sequences:
+            values[index] = tuple(values[index])
+        return tuple(values)
+    return snapshot
+
+
+def _accumulate(timings: Dict[str, List[float]], code: str, seconds: float):
+    entry = timings.setdefault(code, [0, 0.0])
+    entry[0] += 1
+    entry[1] += seconds
+
+
+def _timed(rule: ValidationRule, timings: Dict[str, List[float]]) -> Callable:
+    """Envuelve el check de una regla acumulando su tiempo de ejecución"""
+    check = rule.check
+
+    def run(*args):
+        started = time.perf_counter()
+        try:
+            return check(*args)
+        finally:
+            _accumulate(timings, rule.code, time.perf_counter() - started)
+    return run
+
+
+def _map_value(bms_map, prop: str):
+    value = getattr(bms_map, prop)
+    return tuple(value) if isinstance(value, list) else value
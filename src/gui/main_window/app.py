@@ -19,30 +19,55 @@ from utils import Config
 class BMSGeneratorApp:
     """Aplicación principal del BMS Generator"""
     
+    # Vistas que se pueden marcar con mark_dirty
+    REFRESH_VIEWS = frozenset({"tree", "canvas", "code"})
+    
     def __init__(self):
         self.current_project: Optional[BMSProject] = None
         self.current_map: Optional[BMSMap] = None
         self.current_file_path: Optional[str] = None  # Ruta del archivo BMS actual
-        self.bms_generator = BMSGenerator()
+        self.source_documents: dict = {}  # id(mapa) -> documento fuente BMS cargado (ida y vuelta)
+        self.screen_buffer = None  # Ocupación de celdas del mapa actual
+        self.screen_buffer_map = None
+        self.project_index = None  # Índice entre mapas del proyecto actual (se crea al consultarlo)
+        self.project_index_project = None
+        self.project_index_stale: dict = {}  # id(mapa) -> mapa editado desde la última consulta
         self.config = Config()
+        self.bms_generator = self._create_generator()
         self.should_exit = False  # Control para salir del loop
         
         # Estado de la GUI
         self.selected_field_index: int = -1
         self.selected_field: Optional[BMSField] = None
         self.field_selectables: dict = {}  # Para rastrear elementos selectables del árbol
+        self.field_lookup: dict = {}  # nombre -> (índice, campo) del mapa actual
+        self.field_lookup_map = None
+        self.dirty_views: set = set()  # Vistas a refrescar en el próximo frame (ver mark_dirty)
         
-        # Estado del arrastre
+        # Estado del arrastre (ver visual_editor.begin_field_drag)
         self.is_dragging: bool = False
-        self.drag_start_pos: tuple = (0, 0)
-        self.drag_offset: tuple = (0, 0)
+        self.drag_start_pos: tuple = (0, 0)  # (línea, columna, longitud) del campo al pulsar
+        self.drag_offset: tuple = (0, 0)     # Desplazamiento del ratón en píxeles
         
-        # Dimensiones del canvas
+        # Dimensiones del canvas (ventana visible); el tamaño de celda se
+        # recalcula según BMSMap.size y el zoom (visual_editor.update_canvas_geometry)
         self.canvas_width = 800
         self.canvas_height = 480
         self.cell_width = self.canvas_width / 80
         self.cell_height = self.canvas_height / 24
         
+        # Canvas retenido, vista de código virtualizada, árbol incremental,
+        # validación en vivo y generación de código en segundo plano
+        from .visual_editor import init_canvas_state, create_live_validation
+        from .code_view import init_code_view_state
+        from .project_tree import init_project_tree_state
+        from .generation import create_generation_service
+        init_canvas_state(self)
+        init_code_view_state(self)
+        init_project_tree_state(self)
+        create_live_validation(self)
+        create_generation_service(self)
+        
         # Configurar DearPyGUI
         dpg.create_context()
         self.setup_fonts()
@@ -59,6 +84,17 @@ class BMSGeneratorApp:
             min_height=600
         )
         
+    def _create_generator(self) -> BMSGenerator:
+        """Crea el generador BMS con las plantillas del sitio definidas en la configuración"""
+        try:
+            return BMSGenerator(
+                templates=self.config.get_templates(),
+                template_vars=self.config.get_template_vars()
+            )
+        except ValueError as e:
+            print(f"Plantillas de configuración inválidas, se usan las de por defecto: {e}")
+            return BMSGenerator()
+        
     def run(self):
         """Ejecuta la aplicación"""
         dpg.setup_dearpygui()
@@ -68,10 +104,56 @@ class BMSGeneratorApp:
         # Configurar callback para interceptar cierre del viewport
         dpg.set_exit_callback(self._on_window_close)
         
-        # Usar el método estándar de DearPyGUI
-        dpg.start_dearpygui()
+        # Bucle de render manual: entre frames se recogen los resultados de
+        # las tareas en segundo plano sin bloquear la interfaz
+        while dpg.is_dearpygui_running():
+            self.process_background_tasks()
+            dpg.render_dearpygui_frame()
+        self.live_validation_worker.shutdown()
+        self.generation_worker.shutdown()
         dpg.destroy_context()
         
+    def mark_dirty(self, *views):
+        """
+        Marca vistas para refrescarlas antes del próximo frame: "tree" (árbol
+        del proyecto), "canvas" (editor visual) y "code" (código BMS). Varias
+        marcas en el mismo frame producen un único refresco por vista.
+        """
+        unknown = set(views) - self.REFRESH_VIEWS
+        if unknown:
+            raise ValueError(f"Vistas desconocidas: {', '.join(sorted(unknown))}")
+        self.dirty_views.update(views)
+        if self.current_map is not None:
+            # El índice entre mapas se pone al día en la próxima consulta
+            self.project_index_stale[id(self.current_map)] = self.current_map
+        
+    def refresh_dirty_views(self):
+        """Refresca una sola vez cada vista marcada (llamado una vez por frame)"""
+        if not self.dirty_views:
+            return
+        dirty = self.dirty_views
+        self.dirty_views = set()
+        for view, refresh in (("tree", self.update_project_tree),
+                              ("canvas", self.update_visual_editor),
+                              ("code", self.update_bms_code_display)):
+            if view in dirty:
+                try:
+                    refresh()
+                except Exception as e:
+                    self.update_status(f"Error al refrescar la vista '{view}': {e}")
+        
+    def process_background_tasks(self):
+        """Aplica en el hilo de la interfaz los resultados de las tareas en segundo plano"""
+        from .visual_editor import apply_live_validation
+        from .generation import apply_code_generation
+        from .code_view import render_code_view
+        # Refrescos marcados por los callbacks desde el frame anterior
+        self.refresh_dirty_views()
+        apply_live_validation(self)
+        apply_code_generation(self)
+        # Filas de la vista de código según el desplazamiento actual
+        render_code_view(self)
+        
     def _on_window_close(self):
         """Callback que se ejecuta cuando se intenta cerrar la ventana"""
         # Si ya se confirmó la salida, permitir el cierre
@@ -100,15 +182,15 @@ class BMSGeneratorApp:
         create_properties_panel(self)
         
     def draw_screen_grid(self):
-        from .ui import draw_screen_grid
+        from .visual_editor import draw_screen_grid
         draw_screen_grid(self)
         
     def draw_field_on_canvas(self, field):
-        from .ui import draw_field_on_canvas
+        from .visual_editor import draw_field_on_canvas
         draw_field_on_canvas(self, field)
         
     def update_visual_editor(self):
-        from .ui import update_visual_editor
+        from .visual_editor import update_visual_editor
         update_visual_editor(self)
         
     def update_bms_code_display(self):
@@ -180,6 +262,10 @@ class BMSGeneratorApp:
         from .callbacks import show_about
         show_about(self)
         
+    def show_related_maps(self):
+        from .callbacks import show_related_maps
+        show_related_maps(self)
+        
     def exit_app(self):
         from .callbacks import exit_app
         exit_app(self)
@@ -187,7 +273,7 @@ class BMSGeneratorApp:
     # Métodos de parsing delegados
     def _parse_bms_content(self, bms_map, content):
         from .parsing import parse_bms_content
-        parse_bms_content(self, bms_map, content)
+        return parse_bms_content(self, bms_map, content)
         
     def _parse_field_definition(self, bms_map, line):
         from .parsing import parse_field_definition
@@ -238,9 +324,33 @@ class BMSGeneratorApp:
         from .utils import get_bms_code_content
         return get_bms_code_content(self)
         
+    def get_bms_save_content(self):
+        from .utils import get_bms_save_content
+        return get_bms_save_content(self)
+        
+    def get_source_document(self, bms_map):
+        from .utils import get_source_document
+        return get_source_document(self, bms_map)
+        
+    def register_source_document(self, document):
+        from .utils import register_source_document
+        register_source_document(self, document)
+        
+    def get_screen_buffer(self):
+        from .utils import get_screen_buffer
+        return get_screen_buffer(self)
+        
+    def find_field(self, field):
+        from .utils import find_field
+        return find_field(self, field)
+        
+    def get_project_index(self):
+        from .utils import get_project_index
+        return get_project_index(self)
+        
     # Métodos de UI adicionales
     def update_project_tree(self):
-        from .ui import update_project_tree
+        from .project_tree import update_project_tree
         update_project_tree(self)
         
     def update_map_properties(self):
@@ -272,6 +382,42 @@ class BMSGeneratorApp:
         from .callbacks import on_visual_editor_click
         on_visual_editor_click(self, sender, app_data)
         
+    def zoom_in_canvas(self):
+        from .callbacks import zoom_in_canvas
+        zoom_in_canvas(self)
+        
+    def zoom_out_canvas(self):
+        from .callbacks import zoom_out_canvas
+        zoom_out_canvas(self)
+        
+    def fit_canvas(self):
+        from .visual_editor import fit_canvas
+        fit_canvas(self)
+        
+    def on_canvas_mouse_wheel(self, sender, app_data):
+        from .callbacks import on_canvas_mouse_wheel
+        on_canvas_mouse_wheel(self, sender, app_data)
+        
+    def on_canvas_drag(self, sender, app_data):
+        from .callbacks import on_canvas_drag
+        on_canvas_drag(self, sender, app_data)
+        
+    def on_canvas_drag_end(self, sender, app_data):
+        from .callbacks import on_canvas_drag_end
+        on_canvas_drag_end(self, sender, app_data)
+        
+    def on_canvas_pan_start(self, sender, app_data):
+        from .callbacks import on_canvas_pan_start
+        on_canvas_pan_start(self, sender, app_data)
+        
+    def on_canvas_pan_drag(self, sender, app_data):
+        from .callbacks import on_canvas_pan_drag
+        on_canvas_pan_drag(self, sender, app_data)
+        
+    def on_canvas_pan_end(self, sender, app_data):
+        from .callbacks import on_canvas_pan_end
+        on_canvas_pan_end(self, sender, app_data)
+        
     def on_visual_editor_double_click(self, sender, app_data):
         from .callbacks import on_visual_editor_double_click
         on_visual_editor_double_click(self, sender, app_data)
@@ -3,6 +3,16 @@
 import dearpygui.dearpygui as dpg
 from pathlib import Path
 from models import BMSProject, BMSMap, BMSField, FieldType, FieldAttribute
+from bms.source import BMSSourceDocument
+from bms.terminal import terminal_geometry
+from .generation import current_generated_code, request_code_generation
+from .visual_editor import (
+    ZOOM_STEP, begin_field_drag, canvas_hit_test, end_field_drag, pan_canvas,
+    restore_field_drawing, set_canvas_zoom, update_field_drag,
+)
+
+# Celdas que desplaza cada paso de la rueda sobre el canvas
+WHEEL_PAN_CELLS = 3
 
 def new_project(app):
     """Crea un nuevo proyecto"""
@@ -12,10 +22,9 @@ def new_project(app):
     app.current_project = BMSProject(name="Nuevo Proyecto")
     app.current_map = None  # Limpiar mapa actual también
     app.current_file_path = None  # Limpiar archivo actual
-    app.update_project_tree()
+    app.source_documents.clear()
     app.update_map_properties()
-    app.update_visual_editor()
-    app.update_bms_code_display()
+    app.mark_dirty("tree", "canvas", "code")
     app.update_status("Nuevo proyecto creado")
 
 def new_map(app):
@@ -27,10 +36,8 @@ def new_map(app):
         new_map_obj = BMSMap(name="NUEVO_MAPA", mapset_name="MAPSET01")
         app.current_project.add_map(new_map_obj)
         app.current_map = new_map_obj
-        app.update_project_tree()
         app.update_map_properties()
-        app.update_visual_editor()
-        app.update_bms_code_display()
+        app.mark_dirty("tree", "canvas", "code")
         app.update_status("Nuevo mapa creado")
     else:
         app.update_status("Primero debe crear un proyecto")
@@ -39,16 +46,16 @@ def new_field(app):
     """Crea un nuevo campo"""
     if app.current_map:
         field_count = len(app.current_map.fields) + 1
+        # Colocar el campo en el primer hueco libre de la pantalla
+        line, column = app.get_screen_buffer().find_free_run(10) or (1, 1)
         new_field_obj = BMSField(
             name=f"CAMPO{field_count:02d}",
-            line=1,
-            column=1,
+            line=line,
+            column=column,
             length=10
         )
         app.current_map.add_field(new_field_obj)
-        app.update_project_tree()
-        app.update_visual_editor()
-        app.update_bms_code_display()
+        app.mark_dirty("tree", "canvas", "code")
         app.update_status("Nuevo campo añadido")
     else:
         app.update_status("Primero debe crear un mapa")
@@ -151,15 +158,14 @@ def _load_bms_file_with_content(app, file_path, content):
         new_map = BMSMap(name=map_name, mapset_name="MAPSET01")
         
         # Parsear el contenido BMS básico
-        app._parse_bms_content(new_map, content)
+        statements = app._parse_bms_content(new_map, content)
         
         app.current_project.add_map(new_map)
         app.current_map = new_map
+        app.register_source_document(BMSSourceDocument(statements, new_map))
         
-        app.update_project_tree()
         app.update_map_properties()
-        app.update_visual_editor()
-        app.update_bms_code_display()
+        app.mark_dirty("tree", "canvas", "code")
         
         # Validar el mapa cargado
         errors = app.bms_generator.validate_map(new_map)
@@ -286,6 +292,9 @@ def _load_json_project(app, file_path):
             
             app.current_project.add_map(bms_map)
         
+        # Un proyecto JSON no tiene fuente BMS que conservar
+        app.source_documents.clear()
+        
         # Establecer el primer mapa como actual si existe
         if app.current_project.maps:
             app.current_map = app.current_project.maps[0]
@@ -293,10 +302,8 @@ def _load_json_project(app, file_path):
             app.current_map = None
         
         # Actualizar la interfaz
-        app.update_project_tree()
         app.update_map_properties()
-        app.update_visual_editor()
-        app.update_bms_code_display()
+        app.mark_dirty("tree", "canvas", "code")
         
         app.update_status(f"Proyecto JSON cargado: {project_name}")
         
@@ -317,8 +324,8 @@ def save_bms(app):
         return
         
     try:
-        # Obtener el código BMS directamente del generador
-        bms_code = app.get_bms_code_content()
+        # Obtener el código BMS (conservando el formato del fuente original)
+        bms_code = app.get_bms_save_content()
         
         # Verificar que hay contenido válido
         if not bms_code or bms_code.strip() == "// No hay mapa seleccionado":
@@ -376,8 +383,8 @@ def _save_bms_as_callback(app, sender, app_data):
             if not any(file_path.endswith(ext) for ext in ['.bms', '.txt']):
                 file_path += '.bms'
                 
-            # Obtener el código BMS directamente del generador
-            bms_code = app.get_bms_code_content()
+            # Obtener el código BMS (conservando el formato del fuente original)
+            bms_code = app.get_bms_save_content()
             
             # Verificar que hay contenido válido
             if not bms_code or bms_code.strip() == "// No hay mapa seleccionado":
@@ -458,9 +465,7 @@ def apply_field_changes(app):
                 app.selected_field.attributes.append(FieldAttribute.UNPROT)
                 
         # Actualizar visualización
-        app.update_visual_editor()
-        app.update_bms_code_display()
-        app.update_project_tree()
+        app.mark_dirty("tree", "canvas", "code")
         
         app.update_status(f"Cambios aplicados al campo: {name}")
         
@@ -591,7 +596,7 @@ def _confirm_generate_only(app):
     if app.selected_field:
         apply_field_changes(app)
     # Generar y mostrar código BMS
-    app.update_bms_code_display()
+    app.mark_dirty("code")
     app.update_status("Código BMS generado y mostrado")
 
 def _confirm_generate_and_save(app):
@@ -601,7 +606,7 @@ def _confirm_generate_and_save(app):
     if app.selected_field:
         apply_field_changes(app)
     # Generar y mostrar código BMS
-    app.update_bms_code_display()
+    app.mark_dirty("code")
     # Abrir diálogo para guardar
     app.save_bms_as()
     app.update_status("Código BMS generado - Guardar archivo")
@@ -764,8 +769,10 @@ def _export_bms_callback(app, sender, app_data):
             if not any(file_path.endswith(ext) for ext in ['.bms', '.txt']):
                 file_path += '.bms'
                 
-            # Generar el código BMS
-            bms_code = app.bms_generator.generate_map_code(app.current_map)
+            # Generar el código BMS (o reutilizar el de la vista si está al día)
+            bms_code = current_generated_code(app)
+            if bms_code is None:
+                bms_code = app.bms_generator.generate_map_code(app.current_map)
             
             # Guardar el archivo BMS
             with open(file_path, 'w', encoding='utf-8') as f:
@@ -823,6 +830,50 @@ def show_about(app):
         dpg.add_button(label="[X] Cerrar", callback=lambda: dpg.delete_item("about_dialog"), width=-1)
         dpg.bind_item_theme(dpg.last_item(), about_close_theme)
 
+def _related_map_names(maps, exclude=None) -> str:
+    names = sorted(bms_map.name for bms_map in maps if bms_map is not exclude)
+    return ", ".join(names) if names else "(ninguno)"
+
+def show_related_maps(app):
+    """
+    Muestra los mapas del proyecto relacionados con el mapa actual: los que
+    comparten su diseño (pantalla, cabecera o pie) y, si hay un campo
+    seleccionado, los que usan su nombre o su literal INITIAL. Las consultas
+    se resuelven con el índice entre mapas, que se pone al día aquí.
+    """
+    if not app.current_map:
+        app.update_status("No hay mapa seleccionado")
+        return
+    if dpg.does_item_exist("related_maps_dialog"):
+        dpg.delete_item("related_maps_dialog")
+        
+    index = app.get_project_index()
+    bms_map = app.current_map
+    field = app.selected_field
+    
+    with dpg.window(label=f"Mapas relacionados con {bms_map.name}", width=520, height=360,
+                    modal=True, tag="related_maps_dialog"):
+        dpg.add_text("Mismo diseño:")
+        for kind, label in (("screen", "Pantalla"), ("header", "Cabecera"), ("footer", "Pie")):
+            dpg.add_text(f"  {label}: {_related_map_names(index.same_layout(bms_map, kind))}", wrap=500)
+        dpg.add_separator()
+        if field is not None:
+            dpg.add_text(f"Campo {field.name}:")
+            dpg.add_text(f"  Mismo nombre: {_related_map_names(index.maps_with_field(field.name), bms_map)}",
+                         wrap=500)
+            if field.initial_value:
+                positions = [p for p in index.literal_positions(field.initial_value) if p.bms_map is not bms_map]
+                dpg.add_text(f"  Mismo literal INITIAL ({len(positions)}):")
+                for position in positions[:20]:
+                    dpg.add_text(f"    {position.bms_map.name} {position.field_name} "
+                                 f"({position.line},{position.column})")
+                if len(positions) > 20:
+                    dpg.add_text(f"    ... y {len(positions) - 20} más")
+        else:
+            dpg.add_text("Seleccione un campo para ver los mapas que usan su nombre o su literal")
+        dpg.add_separator()
+        dpg.add_button(label="[X] Cerrar", callback=lambda: dpg.delete_item("related_maps_dialog"), width=-1)
+
 def exit_app(app): 
     """Muestra confirmación antes de salir de la aplicación"""
     if dpg.does_item_exist("exit_confirmation_dialog"):
@@ -913,8 +964,7 @@ def on_project_tree_selection(app, sender, app_data):
             app.current_map = None
             app.deselect_field()
             app.update_map_properties()
-            app.update_visual_editor()
-            app.update_bms_code_display()
+            app.mark_dirty("canvas", "code")
             app.update_status("Proyecto seleccionado")
             
         elif item_type == "map":
@@ -924,8 +974,7 @@ def on_project_tree_selection(app, sender, app_data):
                 app.current_map = app.current_project.maps[map_index]
                 app.deselect_field()  # Limpiar selección de campo
                 app.update_map_properties()
-                app.update_visual_editor()
-                app.update_bms_code_display()
+                app.mark_dirty("canvas", "code")
                 app.update_status(f"Mapa seleccionado: {app.current_map.name}")
                 
         elif item_type == "field":
@@ -943,7 +992,7 @@ def on_project_tree_selection(app, sender, app_data):
                 if app.current_map != target_map:
                     app.current_map = target_map
                     app.update_map_properties()
-                    app.update_visual_editor()
+                    app.mark_dirty("canvas")
                     
                 # Seleccionar el campo
                 app.select_field(target_field)
@@ -983,7 +1032,7 @@ def on_project_tree_double_click(app, sender, app_data):
                 if app.current_map != target_map:
                     app.current_map = target_map
                     app.update_map_properties()
-                    app.update_visual_editor()
+                    app.mark_dirty("canvas")
                     
                 # Seleccionar el campo
                 app.select_field(target_field)
@@ -1001,8 +1050,7 @@ def on_project_tree_double_click(app, sender, app_data):
                 app.current_map = app.current_project.maps[map_index]
                 app.deselect_field()
                 app.update_map_properties()
-                app.update_visual_editor()
-                app.update_bms_code_display()
+                app.mark_dirty("canvas", "code")
                 
                 # Enfocar el panel de propiedades del mapa
                 if dpg.does_item_exist("map_properties_panel"):
@@ -1018,47 +1066,98 @@ def on_project_tree_double_click(app, sender, app_data):
 def on_visual_editor_click(app, sender, app_data):
     """Callback para clics en el editor visual"""
     try:
-        if not app.current_map:
+        # Celda bajo el puntero (coordenadas locales del canvas y geometría actual)
+        hit = canvas_hit_test(app)
+        if hit is None:
             return
-            
-        # Obtener posición del clic en el canvas
-        mouse_pos = dpg.get_mouse_pos(local=False)
-        
-        # Ajustar coordenadas considerando la posición del canvas
-        if dpg.does_item_exist("visual_editor_canvas"):
-            canvas_pos = dpg.get_item_pos("visual_editor_canvas")
-            relative_x = mouse_pos[0] - canvas_pos[0]
-            relative_y = mouse_pos[1] - canvas_pos[1]
-            
-            # Convertir coordenadas de píxeles a línea/columna
-            # Usar el tamaño de carácter aproximado (10x15 píxeles)
-            char_width = 10
-            char_height = 15
-            
-            grid_col = max(1, int(relative_x // char_width) + 1)
-            grid_line = max(1, int(relative_y // char_height) + 1)
-            
-            # Buscar si hay un campo en esa posición
-            clicked_field = None
-            for field in app.current_map.fields:
-                if (field.line == grid_line and 
-                    grid_col >= field.column and 
-                    grid_col < field.column + field.length):
-                    clicked_field = field
-                    break
+        grid_line, grid_col, clicked_field = hit
                     
-            if clicked_field:
-                # Seleccionar el campo encontrado
-                app.select_field(clicked_field)
-                app.update_status(f"Campo seleccionado: {clicked_field.name}")
-            else:
-                # Deseleccionar si no se encontró campo
-                app.deselect_field()
-                app.update_status(f"Posición: línea {grid_line}, columna {grid_col}")
+        if clicked_field:
+            # Seleccionar el campo encontrado (y preparar su arrastre)
+            app.select_field(clicked_field)
+            begin_field_drag(app, clicked_field, grid_line, grid_col)
+            app.update_status(f"Campo seleccionado: {clicked_field.name}")
+        else:
+            # Deseleccionar si no se encontró campo
+            app.deselect_field()
+            app.update_status(f"Posición: línea {grid_line}, columna {grid_col}")
                 
     except Exception as e:
         app.update_status(f"Error en clic del editor visual: {e}")
 
+def zoom_in_canvas(app):
+    """Acerca el canvas un paso"""
+    set_canvas_zoom(app, app.canvas_zoom * ZOOM_STEP)
+
+def zoom_out_canvas(app):
+    """Aleja el canvas un paso"""
+    set_canvas_zoom(app, app.canvas_zoom / ZOOM_STEP)
+
+def on_canvas_mouse_wheel(app, sender, app_data):
+    """Rueda sobre el canvas: Ctrl = zoom en el puntero, Mayús = horizontal, sin tecla = vertical"""
+    try:
+        if not dpg.does_item_exist("map_canvas") or not dpg.is_item_hovered("map_canvas"):
+            return
+        if dpg.is_key_down(dpg.mvKey_ModCtrl):
+            set_canvas_zoom(app, app.canvas_zoom * ZOOM_STEP ** app_data, dpg.get_drawing_mouse_pos())
+        elif dpg.is_key_down(dpg.mvKey_ModShift):
+            pan_canvas(app, -app_data * WHEEL_PAN_CELLS * app.cell_width, 0)
+        else:
+            pan_canvas(app, 0, -app_data * WHEEL_PAN_CELLS * app.cell_height)
+    except Exception as e:
+        app.update_status(f"Error al desplazar el canvas: {e}")
+
+def on_canvas_drag(app, sender, app_data):
+    """Arrastre con el botón izquierdo: vista previa de mover o redimensionar el campo pulsado"""
+    if app.drag_field is None:
+        return
+    try:
+        # app_data = [botón, dx, dy] acumulados desde que se pulsó
+        update_field_drag(app, app_data[1], app_data[2])
+    except Exception as e:
+        app.update_status(f"Error al arrastrar el campo: {e}")
+
+def on_canvas_drag_end(app, sender, app_data):
+    """Al soltar el botón se aplica al modelo la posición arrastrada"""
+    result = end_field_drag(app)
+    if result is None:
+        return
+    field, (line, column, length), conflict = result
+    if (line, column, length) == (field.line, field.column, field.length):
+        restore_field_drawing(app, field)
+        return
+    if conflict:
+        # No se permite soltar sobre otro campo
+        restore_field_drawing(app, field)
+        app.update_status(f"La posición L{line} C{column} (longitud {length}) está ocupada por otro campo")
+        return
+    field.line = line
+    field.column = column
+    field.length = length
+    if field is app.selected_field:
+        app.update_field_properties(field)
+    app.mark_dirty("canvas", "code")
+    app.update_status(f"Campo {field.name}: L{line} C{column}, longitud {length}")
+
+def on_canvas_pan_start(app, sender, app_data):
+    """Botón central sobre el canvas: empieza a desplazarlo"""
+    if dpg.does_item_exist("map_canvas") and dpg.is_item_hovered("map_canvas"):
+        app.canvas_pan_drag = (0, 0)
+
+def on_canvas_pan_drag(app, sender, app_data):
+    """Arrastre con el botón central: desplaza el canvas lo que movió el ratón desde el último evento"""
+    if app.canvas_pan_drag is None:
+        return
+    # app_data = [botón, dx, dy] acumulados desde el inicio del arrastre
+    _, dx, dy = app_data
+    last_x, last_y = app.canvas_pan_drag
+    app.canvas_pan_drag = (dx, dy)
+    if dx != last_x or dy != last_y:
+        pan_canvas(app, last_x - dx, last_y - dy)
+
+def on_canvas_pan_end(app, sender, app_data):
+    app.canvas_pan_drag = None
+
 def on_visual_editor_double_click(app, sender, app_data):
     """Callback para doble clic en el editor visual"""
     try:
@@ -1079,35 +1178,15 @@ def on_visual_editor_double_click(app, sender, app_data):
 def on_visual_editor_right_click(app, sender, app_data):
     """Callback para clic derecho en el editor visual"""
     try:
-        if not app.current_map:
+        # Buscar la celda y el campo bajo el puntero (igual que on_visual_editor_click)
+        hit = canvas_hit_test(app)
+        if hit is None:
             return
-            
-        # Obtener posición del clic
-        mouse_pos = dpg.get_mouse_pos(local=False)
+        grid_line, grid_col, right_clicked_field = hit
         
-        # Buscar si hay un campo en esa posición (similar a on_visual_editor_click)
-        if dpg.does_item_exist("visual_editor_canvas"):
-            canvas_pos = dpg.get_item_pos("visual_editor_canvas")
-            relative_x = mouse_pos[0] - canvas_pos[0]
-            relative_y = mouse_pos[1] - canvas_pos[1]
-            
-            char_width = 10
-            char_height = 15
-            
-            grid_col = max(1, int(relative_x // char_width) + 1)
-            grid_line = max(1, int(relative_y // char_height) + 1)
-            
-            # Buscar campo en esa posición
-            right_clicked_field = None
-            for field in app.current_map.fields:
-                if (field.line == grid_line and 
-                    grid_col >= field.column and 
-                    grid_col < field.column + field.length):
-                    right_clicked_field = field
-                    break
-            
-            # Mostrar menú contextual
-            _show_visual_editor_context_menu(app, mouse_pos, right_clicked_field, grid_line, grid_col)
+        # Mostrar menú contextual junto al puntero (coordenadas de la ventana)
+        mouse_pos = dpg.get_mouse_pos(local=False)
+        _show_visual_editor_context_menu(app, mouse_pos, right_clicked_field, grid_line, grid_col)
                 
     except Exception as e:
         app.update_status(f"Error en clic derecho del editor visual: {e}")
@@ -1191,9 +1270,7 @@ def _context_delete_field(app, field):
         app.current_map.fields.remove(field)
         if app.selected_field == field:
             app.deselect_field()
-        app.update_project_tree()
-        app.update_visual_editor()
-        app.update_bms_code_display()
+        app.mark_dirty("tree", "canvas", "code")
         app.update_status(f"Campo eliminado: {field.name}")
 
 def _context_new_field_at(app, line, column):
@@ -1209,9 +1286,7 @@ def _context_new_field_at(app, line, column):
         )
         app.current_map.add_field(new_field_obj)
         app.select_field(new_field_obj)
-        app.update_project_tree()
-        app.update_visual_editor()
-        app.update_bms_code_display()
+        app.mark_dirty("tree", "canvas", "code")
         app.update_status(f"Nuevo campo añadido en L{line} C{column}")
 
 def _context_move_field_to(app, line, column):
@@ -1221,8 +1296,7 @@ def _context_move_field_to(app, line, column):
         app.selected_field.line = line
         app.selected_field.column = column
         app.update_field_properties()
-        app.update_visual_editor()
-        app.update_bms_code_display()
+        app.mark_dirty("canvas", "code")
         app.update_status(f"Campo {app.selected_field.name} movido a L{line} C{column}")
 
 # ========== CALLBACKS DE PROPIEDADES DEL MAPA ==========
@@ -1236,20 +1310,27 @@ def apply_map_changes(app):
     try:
         # Obtener valores del panel de propiedades del mapa
         name = dpg.get_value("map_name_input")
-        mapset_name = dpg.get_value("map_mapset_input")
-        size = dpg.get_value("map_size_combo")
+        mapset_name = dpg.get_value("mapset_name_input")
         lang = dpg.get_value("map_lang_combo")
+        term = dpg.get_value("map_term_combo")
         
         # Actualizar el mapa
         app.current_map.name = name
         app.current_map.mapset_name = mapset_name
-        app.current_map.size = size
         app.current_map.lang = lang
+        if term and term != app.current_map.term:
+            # Ajustar el tamaño del mapa a la pantalla del nuevo terminal
+            screen = terminal_geometry(term)
+            # El tamaño puede venir como lista (mapas cargados de JSON)
+            current_size = tuple(app.current_map.size)
+            if current_size == terminal_geometry(app.current_map.term, current_size).size \
+                    or not screen.fits(app.current_map.size):
+                app.current_map.size = screen.size
+            app.current_map.term = term
+        app.update_map_properties()
         
         # Actualizar visualización
-        app.update_project_tree()
-        app.update_visual_editor()
-        app.update_bms_code_display()
+        app.mark_dirty("tree", "canvas", "code")
         
         app.update_status(f"Propiedades del mapa actualizadas: {name}")
         
@@ -1428,10 +1509,20 @@ def generate_preview(app):
         app.update_status("No hay mapa para generar vista previa")
         return
         
+    # Si el código de la vista está al día se muestra sin volver a generarlo
+    bms_code = current_generated_code(app)
+    if bms_code is not None:
+        _on_preview_generated(app, bms_code, None)
+        return
+    request_code_generation(app, "preview", lambda bms_code, error: _on_preview_generated(app, bms_code, error))
+    app.update_status("Generando vista previa...")
+
+def _on_preview_generated(app, bms_code, error):
+    """Muestra la vista previa cuando llega el código generado"""
+    if error is not None:
+        app.update_status(f"Error al generar vista previa: {error}")
+        return
     try:
-        # Generar el código BMS
-        bms_code = app.bms_generator.generate_map_code(app.current_map)
-        
         # Mostrar en ventana de vista previa
         _show_code_preview(app, bms_code)
         
@@ -1598,9 +1689,7 @@ def _confirm_delete_field(app):
         app.deselect_field()
         
         # Actualizar interfaz
-        app.update_project_tree()
-        app.update_visual_editor()
-        app.update_bms_code_display()
+        app.mark_dirty("tree", "canvas", "code")
         
         app.update_status(f"Campo eliminado: {field_name}")
         
@@ -1639,9 +1728,7 @@ def duplicate_selected_field(app):
         app.select_field(duplicated_field)
         
         # Actualizar interfaz
-        app.update_project_tree()
-        app.update_visual_editor()
-        app.update_bms_code_display()
+        app.mark_dirty("tree", "canvas", "code")
         
         app.update_status(f"Campo duplicado: {duplicated_field.name}")
         
@@ -0,0 +1,165 @@
+# code_view.py: Vista virtualizada del código BMS para PyBMS
+#
+# En lugar de crear un widget de texto por línea, la vista mantiene un grupo
+# reducido de filas que cubre la parte visible del contenedor y lo reutiliza
+# al desplazarse. Dos espaciadores (arriba y abajo) ocupan la altura de las
+# líneas no visibles para que la barra de desplazamiento refleje el total.
+
+from functools import lru_cache
+import dearpygui.dearpygui as dpg
+from bms import lexer
+
+CODE_CONTAINER = "bms_code_container"
+CODE_CONTENT = "bms_syntax_content"
+TOP_SPACER = "bms_code_top_spacer"
+BOTTOM_SPACER = "bms_code_bottom_spacer"
+
+# Altura de línea hasta poder medir la real tras el primer frame
+DEFAULT_LINE_HEIGHT = 17
+# Filas visibles supuestas mientras el contenedor aún no tiene tamaño
+DEFAULT_VISIBLE_ROWS = 40
+# Filas extra por encima y por debajo de la ventana visible
+ROW_MARGIN = 4
+
+# Color de cada tipo de tramo del analizador léxico
+CODE_COLORS = {
+    lexer.LABEL: (255, 215, 0),           # Dorado para nombres de campos
+    lexer.MACRO: (100, 149, 237),         # Azul para macros BMS
+    lexer.OPERAND_KEY: (135, 206, 250),   # Azul claro para claves de operando
+    lexer.LITERAL: (144, 238, 144),       # Verde claro para literales
+    lexer.NUMBER: (255, 182, 193),        # Rosa claro para números
+    lexer.CONTINUATION: (255, 140, 0),    # Naranja para la marca de continuación
+    lexer.COMMENT: (128, 128, 128),       # Gris para comentarios
+    lexer.TEXT: (220, 220, 220),          # Gris claro para texto normal
+}
+
+# Equivalencia con las claves de color usadas por add_colored_text_segments
+LEGACY_COLOR_KEYS = {
+    lexer.LABEL: 'field_name',
+    lexer.MACRO: 'keyword',
+    lexer.OPERAND_KEY: 'keyword',
+    lexer.LITERAL: 'string',
+    lexer.NUMBER: 'number',
+    lexer.CONTINUATION: 'comment',
+    lexer.COMMENT: 'comment',
+    lexer.TEXT: 'default',
+}
+
+
+@lru_cache(maxsize=16384)
+def colored_segments(line: str, in_literal: bool = False):
+    """Tramos (texto, color) de una línea (resultado memoizado por línea y estado)"""
+    if not line.strip():
+        # Línea vacía con altura fija
+        return ((" ", CODE_COLORS[lexer.TEXT]),)
+    return tuple((text, CODE_COLORS[kind]) for text, kind in lexer.line_segments(line, in_literal))
+
+
+def init_code_view_state(app):
+    """Estado de la vista de código (se llama desde BMSGeneratorApp.__init__)"""
+    app.code_view_lines = []          # Líneas del código mostrado
+    app.code_view_literals = []       # Si cada línea empieza dentro de un literal
+    app.code_view_rows = []           # Filas reutilizables (grupo horizontal)
+    app.code_view_row_state = []      # (línea, en literal) mostrada en cada fila
+    app.code_view_segments = []       # Por fila: [widget, (texto, color) mostrado]
+    app.code_view_first = -1          # Primera línea asignada a las filas
+    app.code_view_line_height = DEFAULT_LINE_HEIGHT
+    app.code_view_line_measured = False
+
+
+def create_code_view(app):
+    """Crea el contenido del contenedor de código (espaciadores y grupo de filas)"""
+    with dpg.theme() as compact_theme:
+        with dpg.theme_component(dpg.mvAll):
+            # Sin separación entre filas: la altura de cada línea es exacta
+            dpg.add_theme_style(dpg.mvStyleVar_ItemSpacing, 8, 0)
+    dpg.bind_item_theme(CODE_CONTAINER, compact_theme)
+    dpg.add_spacer(height=0, tag=TOP_SPACER, parent=CODE_CONTAINER)
+    dpg.add_group(tag=CODE_CONTENT, parent=CODE_CONTAINER)
+    dpg.add_spacer(height=0, tag=BOTTOM_SPACER, parent=CODE_CONTAINER)
+
+
+def set_code_view_text(app, code: str):
+    """Muestra un nuevo código: solo se reescriben las filas visibles que cambian"""
+    app.code_view_lines = code.split('\n')
+    app.code_view_literals = lexer.literal_states(app.code_view_lines)
+    app.code_view_first = -1
+    render_code_view(app)
+
+
+def _visible_rows(app) -> int:
+    height = dpg.get_item_rect_size(CODE_CONTAINER)[1] if dpg.does_item_exist(CODE_CONTAINER) else 0
+    if height <= 0:
+        return DEFAULT_VISIBLE_ROWS
+    return int(height // app.code_view_line_height) + 1
+
+
+def _measure_line_height(app):
+    """Mide la altura real de una fila una vez que se ha dibujado"""
+    if app.code_view_line_measured or not app.code_view_rows:
+        return
+    height = dpg.get_item_rect_size(app.code_view_rows[0])[1]
+    if height > 0:
+        app.code_view_line_measured = True
+        if height != app.code_view_line_height:
+            app.code_view_line_height = height
+            app.code_view_first = -1
+
+
+def _render_row(row, widgets, segments):
+    """Asigna los tramos a los textos de una fila, reconfigurando solo los que cambian"""
+    while len(widgets) < len(segments):
+        widgets.append([dpg.add_text(" ", parent=row), None])
+    for index, widget in enumerate(widgets):
+        segment = segments[index] if index < len(segments) else None
+        if widget[1] == segment:
+            continue
+        if segment is None:
+            dpg.configure_item(widget[0], show=False)
+        else:
+            dpg.configure_item(widget[0], default_value=segment[0], color=segment[1], show=True)
+        widget[1] = segment
+
+
+def render_code_view(app):
+    """
+    Asigna a las filas las líneas de la ventana visible. Se llama en cada
+    frame: si el desplazamiento no cambió la primera línea, no hace nada.
+    """
+    if not dpg.does_item_exist(CODE_CONTENT):
+        return
+    _measure_line_height(app)
+    line_height = app.code_view_line_height
+    lines = app.code_view_lines
+    visible = _visible_rows(app) + 2 * ROW_MARGIN
+    scroll = dpg.get_y_scroll(CODE_CONTAINER)
+    first = max(0, min(int(scroll // line_height) - ROW_MARGIN, len(lines) - visible))
+    if first == app.code_view_first and len(app.code_view_rows) >= visible:
+        return
+    app.code_view_first = first
+
+    # Ampliar el grupo de filas si la ventana creció
+    while len(app.code_view_rows) < visible:
+        app.code_view_rows.append(dpg.add_group(horizontal=True, horizontal_spacing=0, parent=CODE_CONTENT))
+        app.code_view_row_state.append(None)
+        app.code_view_segments.append([])
+
+    for row_index, row in enumerate(app.code_view_rows):
+        line_index = first + row_index
+        if line_index < len(lines):
+            state = (lines[line_index], app.code_view_literals[line_index])
+        else:
+            state = None
+        if state == app.code_view_row_state[row_index]:
+            continue
+        if state is None:
+            dpg.configure_item(row, show=False)
+        else:
+            if app.code_view_row_state[row_index] is None:
+                dpg.configure_item(row, show=True)
+            _render_row(row, app.code_view_segments[row_index], colored_segments(*state))
+        app.code_view_row_state[row_index] = state
+
+    shown = min(len(app.code_view_rows), max(len(lines) - first, 0))
+    dpg.configure_item(TOP_SPACER, height=first * line_height)
+    dpg.configure_item(BOTTOM_SPACER, height=max(len(lines) - first - shown, 0) * line_height)
@@ -0,0 +1,81 @@
+# generation.py: Generación del código BMS en segundo plano para PyBMS
+#
+# generate_map_code no se ejecuta en el hilo de la interfaz: cada edición
+# programa una generación en un BackgroundWorker, que conserva solo la última
+# petición (las ediciones seguidas se agrupan en una única generación). Los
+# consumidores (vista de código, vista previa) se acumulan hasta que llega el
+# resultado de la edición vigente y se atienden en process_background_tasks.
+# El hilo trabaja sobre una instantánea del mapa (MapSnapshots), nunca sobre
+# el mapa que editan los callbacks.
+
+from .workers import BackgroundWorker, MapSnapshots
+
+# Espera sin nuevas peticiones antes de generar (agrupa ráfagas de ediciones)
+GENERATION_DELAY = 0.05
+
+
+def create_generation_service(app):
+    """Crea el servicio de generación (se llama desde BMSGeneratorApp.__init__)"""
+    app.generation_worker = BackgroundWorker("bms-generation", GENERATION_DELAY)
+    app.map_snapshots = MapSnapshots()  # Copias de campos compartidas por los hilos de fondo
+    app.code_generation = 0           # Número de la última petición programada
+    app.generation_consumers = {}     # clave -> función (código, error) que espera el resultado
+    app.generated_code = None         # (petición, mapa, código) de la última generación aplicada
+
+
+def request_code_generation(app, key, consumer):
+    """
+    Programa la generación del mapa actual. consumer(código, error) se llama
+    en el hilo de la interfaz cuando llega el resultado; las peticiones que
+    aún no empezaron se reemplazan, pero sus consumidores se conservan (uno
+    por clave: varias ediciones seguidas refrescan la vista una sola vez).
+    """
+    if not app.current_map:
+        cancel_code_generation(app)
+        return
+    app.generation_consumers[key] = consumer
+    app.code_generation += 1
+    snapshot, _ = app.map_snapshots.take(app.current_map)
+    # La etiqueta (petición, mapa) solo sirve para descartar resultados obsoletos
+    app.generation_worker.submit(
+        (app.code_generation, app.current_map),
+        app.bms_generator.generate_map_code, snapshot
+    )
+
+
+def cancel_code_generation(app):
+    """Descarta la generación pendiente y sus consumidores"""
+    app.generation_worker.cancel()
+    app.generation_consumers.clear()
+
+
+def apply_code_generation(app):
+    """
+    Recoge los resultados del hilo de generación (llamado una vez por frame).
+    Se descartan los de una edición o un mapa que ya no son los actuales.
+    """
+    for result in app.generation_worker.poll():
+        generation, bms_map = result.tag
+        if generation != app.code_generation or bms_map is not app.current_map:
+            continue
+        if result.error is None:
+            app.generated_code = (generation, bms_map, result.value)
+        _deliver(app, result.value, result.error)
+
+
+def current_generated_code(app):
+    """Código ya generado si corresponde a la última edición del mapa actual (si no, None)"""
+    if app.generated_code is None or "code" in app.dirty_views:
+        # Una edición marcada en este frame aún no programó su generación
+        return None
+    generation, bms_map, code = app.generated_code
+    if generation != app.code_generation or bms_map is not app.current_map:
+        return None
+    return code
+
+
+def _deliver(app, code, error):
+    consumers = app.generation_consumers
+    app.generation_consumers = {}
+    for consumer in consumers.values():
+        consumer(code, error)
@@ -0,0 +1,193 @@
+# project_tree.py: Árbol del proyecto incremental para PyBMS
+#
+# El árbol no se reconstruye en cada edición: se compara el proyecto con los
+# nodos ya creados (por identidad de mapa y de campo) y solo se insertan,
+# eliminan o renombran los nodos afectados. Los campos de un mapa se crean
+# la primera vez que se expande su nodo (o cuando pasa a ser el mapa actual),
+# así el coste depende de lo que el usuario tiene a la vista.
+
+import dearpygui.dearpygui as dpg
+
+PROJECT_TREE = "project_tree"
+
+
+class MapNode:
+    """Nodo de un mapa en el árbol y los selectables de sus campos"""
+    __slots__ = ("bms_map", "node", "label", "populated", "fields")
+
+    def __init__(self, bms_map, node, label):
+        self.bms_map = bms_map
+        self.node = node
+        self.label = label
+        self.populated = False
+        self.fields = {}  # id(campo) -> [campo, selectable, etiqueta]
+
+
+def init_project_tree_state(app):
+    """Estado del árbol del proyecto (se llama desde BMSGeneratorApp.__init__)"""
+    app.tree_project = None           # Proyecto mostrado en el árbol
+    app.tree_project_node = None
+    app.tree_project_label = None
+    app.tree_maps_node = None
+    app.tree_map_nodes = {}           # id(mapa) -> MapNode
+    app.tree_nodes_by_item = {}       # nodo del mapa -> MapNode
+    app.tree_selectables_map = None   # Mapa del que provienen los field_selectables
+    app.tree_handlers = None          # Registro con el manejador de expansión
+
+
+def _map_label(bms_map) -> str:
+    return f"📄 {bms_map.name}"
+
+
+def _field_label(field) -> str:
+    return f"🔢 {field.name}"
+
+
+def _on_map_toggled(app, node):
+    """Crea los campos de un mapa la primera vez que se expande su nodo"""
+    map_node = app.tree_nodes_by_item.get(node)
+    if map_node is not None and not map_node.populated:
+        _sync_fields(app, map_node)
+
+
+def _on_field_clicked(app, sender, app_data, field):
+    if app_data:
+        from .ui import select_field
+        select_field(app, field)
+
+
+def _reset_tree(app):
+    """Vacía el árbol y olvida todos los nodos"""
+    dpg.delete_item(PROJECT_TREE, children_only=True)
+    app.tree_project = None
+    app.tree_project_node = None
+    app.tree_project_label = None
+    app.tree_maps_node = None
+    app.tree_map_nodes.clear()
+    app.tree_nodes_by_item.clear()
+    app.tree_selectables_map = None
+    app.field_selectables.clear()
+
+
+def _ensure_handlers(app):
+    if app.tree_handlers is None:
+        with dpg.item_handler_registry() as app.tree_handlers:
+            dpg.add_item_toggled_open_handler(callback=lambda sender, node: _on_map_toggled(app, node))
+    return app.tree_handlers
+
+
+def _create_map_node(app, bms_map, before=0):
+    label = _map_label(bms_map)
+    node = dpg.add_tree_node(label=label, parent=app.tree_maps_node, before=before,
+                             default_open=bms_map is app.current_map)
+    dpg.bind_item_handler_registry(node, _ensure_handlers(app))
+    map_node = MapNode(bms_map, node, label)
+    app.tree_map_nodes[id(bms_map)] = map_node
+    app.tree_nodes_by_item[node] = map_node
+    return map_node
+
+
+def _remove_map_node(app, map_node):
+    dpg.delete_item(map_node.node)
+    del app.tree_map_nodes[id(map_node.bms_map)]
+    del app.tree_nodes_by_item[map_node.node]
+    if app.tree_selectables_map is map_node.bms_map:
+        app.tree_selectables_map = None
+
+
+def _sync_fields(app, map_node) -> bool:
+    """
+    Ajusta los selectables de un mapa a sus campos: crea los nuevos (en su
+    posición), elimina los borrados y renombra los que cambiaron de nombre.
+    Retorna True si hubo algún cambio.
+    """
+    changed = not map_node.populated
+    map_node.populated = True
+    items = map_node.fields
+    seen = set()
+    next_item = 0
+    for field in reversed(map_node.bms_map.fields):
+        key = id(field)
+        seen.add(key)
+        entry = items.get(key)
+        if entry is None:
+            label = _field_label(field)
+            selectable = dpg.add_selectable(
+                label=label,
+                parent=map_node.node,
+                before=next_item,
+                default_value=field is app.selected_field,
+                callback=lambda sender, app_data, user_data: _on_field_clicked(app, sender, app_data, user_data),
+                user_data=field,
+            )
+            entry = items[key] = [field, selectable, label]
+            changed = True
+        else:
+            label = _field_label(field)
+            if label != entry[2]:
+                dpg.set_item_label(entry[1], label)
+                entry[2] = label
+                changed = True
+        next_item = entry[1]
+    if len(seen) != len(items):
+        for key in [key for key in items if key not in seen]:
+            dpg.delete_item(items.pop(key)[1])
+        changed = True
+    return changed
+
+
+def update_project_tree(app):
+    """
+    Actualiza el árbol del proyecto tocando solo los nodos que cambiaron.
+    Sin cambios en el proyecto no se hace ninguna llamada a DearPyGUI.
+    """
+    project = app.current_project
+    if project is None:
+        if app.tree_project is not None or app.tree_project_node is None:
+            _reset_tree(app)
+            # Nodo de texto en lugar del proyecto
+            app.tree_project_node = dpg.add_text("(Sin proyecto)", parent=PROJECT_TREE)
+        return
+
+    if project is not app.tree_project:
+        _reset_tree(app)
+        app.tree_project = project
+        app.tree_project_label = f"📁 {project.name}"
+        app.tree_project_node = dpg.add_tree_node(label=app.tree_project_label, parent=PROJECT_TREE,
+                                                  default_open=True)
+        app.tree_maps_node = dpg.add_tree_node(label="📋 Mapas", parent=app.tree_project_node,
+                                               default_open=True)
+    elif app.tree_project_label != f"📁 {project.name}":
+        app.tree_project_label = f"📁 {project.name}"
+        dpg.set_item_label(app.tree_project_node, app.tree_project_label)
+
+    # Mapas: se recorren en orden inverso para insertar los nuevos antes del siguiente
+    seen = set()
+    next_node = 0
+    current_changed = False
+    for bms_map in reversed(project.maps):
+        key = id(bms_map)
+        seen.add(key)
+        map_node = app.tree_map_nodes.get(key)
+        if map_node is None:
+            map_node = _create_map_node(app, bms_map, before=next_node)
+        elif map_node.label != _map_label(bms_map):
+            map_node.label = _map_label(bms_map)
+            dpg.set_item_label(map_node.node, map_node.label)
+        if map_node.populated or bms_map is app.current_map:
+            # Solo se comparan los campos de los mapas ya desplegados
+            if _sync_fields(app, map_node) and bms_map is app.current_map:
+                current_changed = True
+        next_node = map_node.node
+    if len(seen) != len(app.tree_map_nodes):
+        for map_node in [node for key, node in app.tree_map_nodes.items() if key not in seen]:
+            _remove_map_node(app, map_node)
+
+    # Los selectables por nombre corresponden al mapa actual
+    if current_changed or app.tree_selectables_map is not app.current_map:
+        app.field_selectables.clear()
+        map_node = app.tree_map_nodes.get(id(app.current_map)) if app.current_map is not None else None
+        if map_node is not None:
+            for field, selectable, _ in map_node.fields.values():
+                app.field_selectables[field.name] = selectable
+        app.tree_selectables_map = app.current_map
@@ -42,6 +42,11 @@ def add_colored_text_segments(self, text, colors):
 
 import dearpygui.dearpygui as dpg
 from models import FieldType, FieldAttribute
+from bms.terminal import TERMINAL_SIZES, DEFAULT_TERMINAL
+from .visual_editor import update_field_selection
+from bms.lexer import line_segments
+from .generation import cancel_code_generation, request_code_generation
+from .code_view import LEGACY_COLOR_KEYS, colored_segments, create_code_view, set_code_view_text
 
 def create_main_window(app):
     """Crea la ventana principal de la aplicación"""
@@ -69,6 +74,9 @@ def create_main_window(app):
                 dpg.add_separator()
                 dpg.add_menu_item(label="Salir", callback=app.exit_app)
                 
+            with dpg.menu(label="Proyecto"):
+                dpg.add_menu_item(label="Mapas relacionados...", callback=app.show_related_maps)
+                
             with dpg.menu(label="Ayuda"):
                 dpg.add_menu_item(label="Acerca de", callback=app.show_about)
         
@@ -148,8 +156,10 @@ def create_main_window(app):
                     # Pestaña del código BMS
                     with dpg.tab(label="Código BMS", tag="bms_code_tab"):
                         # Crear contenedor para código con syntax highlighting
+                        # (vista virtualizada: solo se crean widgets para las líneas visibles)
                         with dpg.child_window(width=-1, height=-1, tag="bms_code_container", border=False):
-                            dpg.add_text("// Código BMS se mostrará aquí", tag="bms_syntax_content")
+                            create_code_view(app)
+                        set_code_view_text(app, "// Código BMS se mostrará aquí")
             
             # Panel derecho - Propiedades
             with dpg.child_window(width=280, height=-1, tag="properties_panel"):
@@ -176,10 +186,34 @@ def create_visual_editor(app):
         dpg.add_text("Editor Visual de Mapa BMS")
         dpg.add_separator()
         
-        # Canvas para el mapa (simulando pantalla 24x80)
+        # Zoom (también Ctrl + rueda sobre el canvas; rueda y botón central desplazan)
+        with dpg.group(horizontal=True):
+            dpg.add_button(label="[-]", callback=app.zoom_out_canvas)
+            dpg.add_button(label="[+]", callback=app.zoom_in_canvas)
+            dpg.add_button(label="[=] Ajustar", callback=app.fit_canvas)
+            dpg.add_text("Zoom 100%", tag="canvas_zoom_label")
+        
+        # Canvas para el mapa: ventana sobre la pantalla (tamaño según BMSMap.size)
         with dpg.drawlist(width=app.canvas_width, height=app.canvas_height, tag="map_canvas"):
             # Dibujar grid de la pantalla
             app.draw_screen_grid()
+        
+        # Clics sobre el canvas (la celda se resuelve con canvas_hit_test)
+        with dpg.item_handler_registry(tag="map_canvas_handlers"):
+            dpg.add_item_clicked_handler(button=dpg.mvMouseButton_Left, callback=app.on_visual_editor_click)
+            dpg.add_item_clicked_handler(button=dpg.mvMouseButton_Right, callback=app.on_visual_editor_right_click)
+            dpg.add_item_double_clicked_handler(button=dpg.mvMouseButton_Left,
+                                                callback=app.on_visual_editor_double_click)
+        dpg.bind_item_handler_registry("map_canvas", "map_canvas_handlers")
+        
+        with dpg.handler_registry():
+            # Arrastre de campos con el botón izquierdo (mover / redimensionar)
+            dpg.add_mouse_drag_handler(button=dpg.mvMouseButton_Left, threshold=2, callback=app.on_canvas_drag)
+            dpg.add_mouse_release_handler(button=dpg.mvMouseButton_Left, callback=app.on_canvas_drag_end)
+            dpg.add_mouse_wheel_handler(callback=app.on_canvas_mouse_wheel)
+            dpg.add_mouse_click_handler(button=dpg.mvMouseButton_Middle, callback=app.on_canvas_pan_start)
+            dpg.add_mouse_drag_handler(button=dpg.mvMouseButton_Middle, threshold=1, callback=app.on_canvas_pan_drag)
+            dpg.add_mouse_release_handler(button=dpg.mvMouseButton_Middle, callback=app.on_canvas_pan_end)
             
 def create_properties_panel(app):
     """Crea el panel de propiedades"""
@@ -198,6 +232,12 @@ def create_properties_panel(app):
             default_value="COBOL",
             tag="map_lang_combo"
         )
+        dpg.add_combo(
+            label="Terminal",
+            items=list(TERMINAL_SIZES),
+            default_value=DEFAULT_TERMINAL,
+            tag="map_term_combo"
+        )
         
     with dpg.collapsing_header(label="Campo Seleccionado", default_open=True, tag="field_section_header"):
         dpg.add_input_text(label="Nombre", tag="field_name_input")
@@ -279,230 +319,61 @@ def update_field_properties(app, field):
         if dpg.does_item_exist(attr_id):
             dpg.set_value(attr_id, attr in field.attributes)
 
-def draw_screen_grid(app):
-    """Dibuja la cuadrícula de la pantalla 24x80"""
-    # Colores
-    grid_color = (100, 100, 100, 255)  # Gris claro
-    
-    # Líneas verticales
-    for i in range(81):  # 0 a 80
-        x = i * app.cell_width
-        dpg.draw_line(
-            (x, 0), (x, app.canvas_height),
-            color=grid_color,
-            thickness=1 if i % 10 == 0 else 0.5,
-            parent="map_canvas"
-        )
-        
-    # Líneas horizontales  
-    for i in range(25):  # 0 a 24
-        y = i * app.cell_height
-        dpg.draw_line(
-            (0, y), (app.canvas_width, y),
-            color=grid_color,
-            thickness=1 if i % 5 == 0 else 0.5,
-            parent="map_canvas"
-        )
-
-def draw_field_on_canvas(app, field):
-    """Dibuja un campo en el canvas visual"""
-    x = (field.column - 1) * app.cell_width
-    y = (field.line - 1) * app.cell_height
-    width = field.length * app.cell_width
-    height = app.cell_height
-    
-    # Color según si está seleccionado o tipo de campo
-    if field == app.selected_field:
-        color = (255, 255, 0, 200)  # Amarillo brillante para seleccionado
-        border_color = (255, 165, 0, 255)  # Borde naranja
-        border_thickness = 3
-    else:
-        # Color según tipo de campo
-        if field.field_type == FieldType.INPUT:
-            color = (0, 255, 0, 100)  # Verde claro
-        elif field.field_type == FieldType.OUTPUT:
-            color = (0, 0, 255, 100)  # Azul claro
-        elif field.field_type == FieldType.LABEL:
-            color = (255, 255, 0, 100)  # Amarillo claro
-        else:
-            color = (128, 128, 128, 100)  # Gris claro
-        border_color = (64, 64, 64, 255)  # Borde gris oscuro
-        border_thickness = 1
-        
-    # Dibujar rectángulo del campo
-    dpg.draw_rectangle(
-        (x, y), (x + width, y + height),
-        color=color,
-        fill=color,
-        parent="map_canvas"
-    )
-    
-    # Dibujar borde
-    dpg.draw_rectangle(
-        (x, y), (x + width, y + height),
-        color=border_color,
-        thickness=border_thickness,
-        parent="map_canvas"
-    )
-    
-    # Dibujar texto del campo
-    dpg.draw_text(
-        (x + 2, y + 2),
-        field.name,
-        color=(0, 0, 0, 255),
-        size=10,
-        parent="map_canvas"
-    )
-
-def update_visual_editor(app):
-    """Actualiza el editor visual con los campos del mapa actual"""
-    # Verificar que el canvas existe
-    if not dpg.does_item_exist("map_canvas"):
-        return
-        
-    # Limpiar canvas
-    dpg.delete_item("map_canvas", children_only=True)
-    
-    # Redibujar grid
-    app.draw_screen_grid()
-    
-    # Dibujar campos
-    if app.current_map:
-        for field in app.current_map.fields:
-            app.draw_field_on_canvas(field)
-
 def update_bms_code_display(app):
     """Actualiza la visualización del código BMS generado con syntax highlighting"""
-    # Verificar que el contenedor existe
-    if not dpg.does_item_exist("bms_code_container"):
-        return
-        
+    # Se programa aunque el contenedor aún no exista: cada edición debe
+    # invalidar el código generado que reutilizan el guardado y la exportación
     if app.current_map:
-        try:
-            # Generar código BMS usando el generador
-            bms_code = app.bms_generator.generate_map_code(app.current_map)
-            app.display_bms_code_with_colors(bms_code)
-        except Exception as e:
-            app.display_bms_code_with_colors(f"Error al generar código BMS: {e}")
+        # Generar código BMS en segundo plano: se muestra al llegar el resultado
+        request_code_generation(app, "display", lambda bms_code, error: app.display_bms_code_with_colors(
+            bms_code if error is None else f"Error al generar código BMS: {error}"
+        ))
     else:
+        cancel_code_generation(app)
         app.display_bms_code_with_colors("// No hay mapa seleccionado")
 
 def display_bms_code_with_colors(app, bms_code):
     """Muestra el código BMS con syntax highlighting manteniendo alineación"""
-    # Limpiar contenido anterior
-    if dpg.does_item_exist("bms_syntax_content"):
-        dpg.delete_item("bms_syntax_content")
-    
-    # Crear nuevo contenido con syntax highlighting
-    with dpg.group(tag="bms_syntax_content", parent="bms_code_container"):
-        lines = bms_code.split('\n')
-        for i, line in enumerate(lines):
-            if line.strip():
-                create_colored_line_monospace(app, line, f"line_{i}")
-            else:
-                # Línea vacía con altura fija
-                dpg.add_text(" ", tag=f"line_{i}")
+    # Vista virtualizada: reutiliza las filas visibles y solo reescribe las que cambian
+    set_code_view_text(app, bms_code)
 
 def create_colored_line_monospace(app, line, line_tag):
-    """Crea una línea con colores manteniendo alineación monoespaciada perfecta"""
-    # Definir colores
-    colors = {
-        'keyword': (100, 149, 237),      # Azul para palabras clave BMS
-        'field_name': (255, 215, 0),     # Dorado para nombres de campos
-        'string': (144, 238, 144),       # Verde claro para strings
-        'number': (255, 182, 193),       # Rosa claro para números
-        'comment': (128, 128, 128),      # Gris para comentarios
-        'default': (220, 220, 220)       # Gris claro para texto normal
-    }
-    
-    # Si es comentario, línea completa en gris
-    if line.strip().startswith('*') or line.strip().startswith('//'):
-        dpg.add_text(line, color=colors['comment'], tag=line_tag)
-        return
-    
-    # Identificar palabras clave BMS
-    bms_keywords = ['DFHMSD', 'DFHMDI', 'DFHMDF', 'TYPE', 'MODE', 'LANG', 'CTRL', 
-                   'STORAGE', 'TERM', 'POS', 'LENGTH', 'ATTRB', 'INITIAL', 
-                   'PICIN', 'PICOUT', 'COLOR', 'HILIGHT', 'SIZE', 'FREEKB', 
-                   'FRSET', 'END']
-    
-    # Determinar color principal de la línea
-    if any(keyword in line for keyword in bms_keywords):
-        dpg.add_text(line, color=colors['keyword'], tag=line_tag)
-    else:
-        # Línea normal
-        dpg.add_text(line, color=colors['default'], tag=line_tag)
+    """Crea una línea con colores por tramo manteniendo la alineación monoespaciada"""
+    with dpg.group(horizontal=True, horizontal_spacing=0, tag=line_tag):
+        for text, color in colored_segments(line):
+            dpg.add_text(text, color=color)
 
 def add_colored_text_segments(app, text, colors):
-    """Agrega segmentos de texto con colores apropiados"""
-    import re
+    """Agrega segmentos de texto con colores apropiados (claves de CODE_COLORS antiguas)"""
+    for segment, kind in line_segments(text):
+        dpg.add_text(segment, color=colors.get(LEGACY_COLOR_KEYS[kind], colors['default']))
+
+def select_field(app, field_name):
+    """
+    Selecciona un campo para edición (por nombre o por objeto BMSField).
+    Solo se actualizan el campo anterior y el nuevo: árbol, canvas y panel
+    de propiedades no dependen del número de campos del mapa.
+    """
+    if not app.current_map:
+        return
+    index, field = app.find_field(field_name)
+    if field is None:
+        return
+    previous = app.selected_field
     
-    # Buscar y colorear strings
-    parts = re.split(r"('[^']*')", text)
+    # Deseleccionar el campo anterior si existe
+    if previous is not None and previous is not field and previous.name in app.field_selectables:
+        dpg.set_value(app.field_selectables[previous.name], False)
     
-    for part in parts:
-        if not part:
-            continue
-        elif part.startswith("'") and part.endswith("'"):
-            # String
-            dpg.add_text(part, color=colors['string'])
-        elif any(keyword in part for keyword in ['DFHMSD', 'DFHMDI', 'DFHMDF', 'TYPE', 'MODE', 'LANG']):
-            # Contiene keywords
-            dpg.add_text(part, color=colors['keyword'])
-        else:
-            # Texto normal
-            dpg.add_text(part, color=colors['default'])
-
-def update_project_tree(app):
-    """Actualiza el árbol del proyecto"""
-    # Limpiar árbol existente
-    dpg.delete_item("project_tree", children_only=True)
-    # Limpiar referencias a selectables anteriores
-    app.field_selectables.clear()
+    # Seleccionar el nuevo campo
+    app.selected_field = field
+    app.selected_field_index = index
+    if field.name in app.field_selectables:
+        dpg.set_value(app.field_selectables[field.name], True)
     
-    if app.current_project:
-        with dpg.tree_node(label=f"📁 {app.current_project.name}", parent="project_tree", default_open=True):
-            with dpg.tree_node(label="📋 Mapas", default_open=True):
-                for bms_map in app.current_project.maps:
-                    with dpg.tree_node(label=f"📄 {bms_map.name}", leaf=True):
-                        for field in bms_map.fields:
-                            # Crear callback con captura correcta del nombre del campo
-                            def make_callback(field_name):
-                                return lambda sender, app_data: select_field(app, field_name) if app_data else None
-                            
-                            selectable_id = dpg.add_selectable(
-                                label=f"🔢 {field.name}",
-                                callback=make_callback(field.name),
-                                default_value=False
-                            )
-                            # Guardar referencia para poder deseleccionar después
-                            app.field_selectables[field.name] = selectable_id
-    else:
-        dpg.add_text("(Sin proyecto)", parent="project_tree")
-
-def select_field(app, field_name):
-    """Selecciona un campo para edición"""
-    if app.current_map:
-        field = app.current_map.get_field(field_name)
-        if field:
-            # Deseleccionar el campo anterior si existe
-            if app.selected_field and app.selected_field.name in app.field_selectables:
-                dpg.set_value(app.field_selectables[app.selected_field.name], False)
-            
-            # Seleccionar el nuevo campo
-            app.selected_field = field
-            if field_name in app.field_selectables:
-                dpg.set_value(app.field_selectables[field_name], True)
-            
-            # Encontrar el índice del campo para mantener compatibilidad
-            for i, f in enumerate(app.current_map.fields):
-                if f.name == field_name:
-                    app.selected_field_index = i
-                    break
-            
-            update_field_properties(app, field)
-            app.update_visual_editor()  # Actualizar editor visual
-            app.update_status(f"Campo seleccionado: {field_name}")
+    update_field_selection(app, previous, field)
+    update_field_properties(app, field)
+    app.update_status(f"Campo seleccionado: {field.name}")
 
 def update_map_properties(app):
     """Actualiza las propiedades del mapa en el panel"""
@@ -516,12 +387,23 @@ def update_map_properties(app):
             dpg.set_value("map_mode_combo", app.current_map.mode)
         if dpg.does_item_exist("map_lang_combo"):
             dpg.set_value("map_lang_combo", app.current_map.lang)
+        if dpg.does_item_exist("map_term_combo"):
+            dpg.set_value("map_term_combo", app.current_map.term)
+            
+        # Límites de posición según el tamaño del mapa (depende del terminal)
+        lines, cols = app.current_map.size
+        if dpg.does_item_exist("field_line_input"):
+            dpg.configure_item("field_line_input", max_value=lines)
+        if dpg.does_item_exist("field_column_input"):
+            dpg.configure_item("field_column_input", max_value=cols)
 
 def deselect_field(app):
     """Deselecciona el campo actual"""
+    previous = app.selected_field
     app.selected_field = None
     app.selected_field_index = -1
     app.is_dragging = False
+    update_field_selection(app, previous, None)
     
     # Verificar que el elemento existe antes de establecer el valor
     if dpg.does_item_exist("current_field_label"):
@@ -530,8 +412,9 @@ def deselect_field(app):
     # Resetear título de la sección
     dpg.set_item_label("field_section_header", "Campo Seleccionado: Ninguno")
     
-    # Deseleccionar todos los elementos en el explorador
-    for selectable_id in app.field_selectables.values():
+    # Deseleccionar el elemento del campo anterior en el explorador
+    if previous is not None and previous.name in app.field_selectables:
+        selectable_id = app.field_selectables[previous.name]
         if dpg.does_item_exist(selectable_id):
             dpg.set_value(selectable_id, False)
     
@@ -2,6 +2,10 @@
 
 import re
 from typing import Optional
+from bms.geometry import find_overlaps, spans_overlap
+from bms.index import ProjectIndex
+from bms.screen import ScreenBuffer
+from .generation import current_generated_code
 
 def is_valid_bms_content(app, content: str) -> bool:
     """Verifica si el contenido parece ser un mapa BMS válido"""
@@ -92,6 +96,10 @@ def sanitize_name_for_cobol(app, name: str) -> str:
 def get_bms_code_content(app):
     """Obtiene el contenido actual del código BMS desde el generador"""
     if app.current_map:
+        # Reutilizar el código de la vista si corresponde a la última edición
+        bms_code = current_generated_code(app)
+        if bms_code is not None:
+            return bms_code
         try:
             return app.bms_generator.generate_map_code(app.current_map)
         except Exception as e:
@@ -99,6 +107,104 @@ def get_bms_code_content(app):
     else:
         return "// No hay mapa seleccionado"
 
+def get_bms_save_content(app):
+    """
+    Obtiene el código BMS a guardar. Si el mapa actual proviene de un archivo
+    BMS cargado, se conservan comentarios y formato original y solo se
+    regeneran las sentencias modificadas.
+    """
+    source = get_source_document(app, app.current_map) if app.current_map else None
+    if source is not None:
+        try:
+            return source.render(app.bms_generator)
+        except Exception as e:
+            return f"Error al generar código BMS: {e}"
+    return get_bms_code_content(app)
+
+def get_source_document(app, bms_map):
+    """Documento fuente del mapa si se cargó desde un archivo BMS (si no, None)"""
+    document = app.source_documents.get(id(bms_map))
+    if document is not None and document.bms_map is bms_map:
+        return document
+    return None
+
+def register_source_document(app, document):
+    """
+    Asocia el documento fuente a su mapa. Se olvidan los documentos de mapas
+    que ya no están en el proyecto actual.
+    """
+    project_maps = {id(m) for m in app.current_project.maps} if app.current_project else set()
+    for key in [key for key in app.source_documents if key not in project_maps]:
+        del app.source_documents[key]
+    app.source_documents[id(document.bms_map)] = document
+
+def get_screen_buffer(app):
+    """
+    Retorna el buffer de ocupación del mapa actual. Se construye al cambiar
+    de mapa o de tamaño; en otro caso solo se actualizan los campos que
+    cambiaron desde la última consulta.
+    """
+    if not app.current_map:
+        return None
+    buffer = app.screen_buffer
+    if (buffer is None or app.screen_buffer_map is not app.current_map
+            or buffer.size != tuple(app.current_map.size)):
+        app.screen_buffer = ScreenBuffer.from_map(app.current_map)
+        app.screen_buffer_map = app.current_map
+    else:
+        buffer.sync(app.current_map.fields)
+    return app.screen_buffer
+
+def find_field(app, field):
+    """
+    Retorna (índice, campo) de un campo del mapa actual, dado por nombre o
+    como objeto; (-1, None) si no está. Usa un índice por nombre que se
+    comprueba en O(1) y solo se reconstruye cuando queda desactualizado.
+    """
+    bms_map = app.current_map
+    if bms_map is None or field is None:
+        return -1, None
+    fields = bms_map.fields
+    name = field if isinstance(field, str) else field.name
+    if app.field_lookup_map is bms_map:
+        entry = app.field_lookup.get(name)
+        if entry is not None:
+            index, candidate = entry
+            if index < len(fields) and fields[index] is candidate and candidate.name == name:
+                if isinstance(field, str) or candidate is field:
+                    return index, candidate
+
+    # Índice desactualizado (campo renombrado, añadido, movido o mapa nuevo)
+    app.field_lookup = {}
+    for index, candidate in enumerate(fields):
+        app.field_lookup.setdefault(candidate.name, (index, candidate))
+    app.field_lookup_map = bms_map
+    if isinstance(field, str):
+        return app.field_lookup.get(name, (-1, None))
+    for index, candidate in enumerate(fields):
+        if candidate is field:
+            return index, candidate
+    return -1, None
+
+def get_project_index(app):
+    """
+    Retorna el índice entre mapas del proyecto actual. Solo se construye o
+    actualiza al consultarlo (no en cada edición): se crea al cambiar de
+    proyecto; en otro caso se reindexan los mapas editados desde la última
+    consulta (ver mark_dirty), se indexan los añadidos y se retiran los
+    eliminados.
+    """
+    if app.project_index is None or app.project_index_project is not app.current_project:
+        app.project_index = ProjectIndex()
+        app.project_index_project = app.current_project
+    else:
+        for bms_map in app.project_index_stale.values():
+            if bms_map in app.project_index:
+                app.project_index.update_map(bms_map)
+    app.project_index_stale.clear()
+    app.project_index.sync(app.current_project)
+    return app.project_index
+
 def format_field_name(name: str) -> str:
     """Formatea un nombre de campo para BMS (máximo 8 caracteres, mayúsculas)"""
     formatted = name.upper().strip()
@@ -125,42 +231,24 @@ def calculate_field_end_position(line: int, column: int, length: int) -> tuple[i
         
     return end_line, end_column
 
-def detect_field_overlaps(fields, exclude_field=None) -> list:
-    """Detecta superposiciones entre campos"""
-    overlaps = []
-    
-    for i, field1 in enumerate(fields):
-        if field1 == exclude_field:
-            continue
-            
-        for j, field2 in enumerate(fields[i+1:], i+1):
-            if field2 == exclude_field:
-                continue
-                
-            # Verificar si los campos se superponen
-            if fields_overlap(field1, field2):
-                overlaps.append((field1, field2))
-                
-    return overlaps
+def detect_field_overlaps(fields, size, exclude_field=None) -> list:
+    """
+    Detecta superposiciones entre campos (incluyendo el byte de atributo).
+    Usa un barrido sobre desplazamientos del buffer en lugar de comparar
+    todos los pares. size es el tamaño del mapa (BMSMap.size): los
+    desplazamientos y la vuelta al principio del buffer dependen de él.
+    """
+    return find_overlaps(fields, tuple(size), exclude_field)
 
-def fields_overlap(field1, field2) -> bool:
-    """Verifica si dos campos se superponen"""
-    # Calcular posiciones finales
-    end1_line, end1_col = calculate_field_end_position(field1.line, field1.column, field1.length)
-    end2_line, end2_col = calculate_field_end_position(field2.line, field2.column, field2.length)
-    
-    # Si están en líneas diferentes sin solapamiento
-    if field1.line > end2_line or field2.line > end1_line:
-        return False
-    
-    # Si están en la misma línea, verificar columnas
-    if field1.line == field2.line:
-        return not (field1.column + field1.length <= field2.column or 
-                   field2.column + field2.length <= field1.column)
-    
-    # Caso complejo: campos que abarcan múltiples líneas
-    # Por simplicidad, considerar superposición si hay cualquier intersección
-    return True
+def fields_overlap(field1, field2, size) -> bool:
+    """Verifica si dos campos se superponen (incluyendo campos de varias líneas) en un mapa del tamaño dado"""
+    return spans_overlap(field1, field2, tuple(size))
+
+def current_map_overlaps(app, exclude_field=None) -> list:
+    """Superposiciones entre los campos del mapa actual, con su tamaño"""
+    if not app.current_map:
+        return []
+    return detect_field_overlaps(app.current_map.fields, app.current_map.size, exclude_field)
 
 def generate_unique_field_name(existing_fields, base_name="CAMPO") -> str:
     """Genera un nombre único para un campo"""
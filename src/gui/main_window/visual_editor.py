@@ -1,3 +1,669 @@
 # visual_editor.py: Lógica del editor visual y canvas para PyBMS
 
-# Aquí irán funciones como create_visual_editor, draw_screen_grid, draw_field_on_canvas, etc.
+import dearpygui.dearpygui as dpg
+from models import FieldType
+from bms.validation import ERROR, ValidationEngine
+from .workers import BackgroundWorker
+
+# ---- Capas del canvas ----
+#
+# El canvas "map_canvas" se organiza en capas persistentes (de abajo arriba):
+# cuadrícula (se dibuja una vez), campos (un nodo por campo), marcadores de
+# validación y selección. Una edición solo reconfigura los nodos afectados.
+#
+# El canvas es una ventana de tamaño fijo sobre la pantalla del mapa: la
+# geometría de las celdas sale de BMSMap.size y del zoom, y el desplazamiento
+# (pan) indica qué parte se ve. Solo se dibujan la cuadrícula y los campos
+# que caen dentro de la ventana visible.
+
+GRID_LAYER = "canvas_grid_layer"
+FIELDS_LAYER = "canvas_fields_layer"
+VALIDATION_LAYER = "validation_layer"
+SELECTION_LAYER = "canvas_selection_layer"
+CANVAS_LAYERS = (GRID_LAYER, FIELDS_LAYER, VALIDATION_LAYER, SELECTION_LAYER)
+
+GRID_COLOR = (100, 100, 100, 255)  # Gris claro
+
+# Geometría: con zoom 1 la pantalla completa cabe en el canvas y cada celda
+# es el doble de alta que de ancha (proporción de un carácter 3270)
+DEFAULT_SCREEN_SIZE = (24, 80)
+CELL_ASPECT = 2.0
+MIN_ZOOM = 0.5
+MAX_ZOOM = 8.0
+ZOOM_STEP = 1.25
+FIELD_TEXT_MIN_SIZE = 6
+
+# Relleno según el tipo de campo
+FIELD_COLORS = {
+    FieldType.INPUT: (0, 255, 0, 100),     # Verde claro
+    FieldType.OUTPUT: (0, 0, 255, 100),    # Azul claro
+    FieldType.LABEL: (255, 255, 0, 100),   # Amarillo claro
+}
+DEFAULT_FIELD_COLOR = (128, 128, 128, 100)  # Gris claro
+FIELD_BORDER_COLOR = (64, 64, 64, 255)      # Borde gris oscuro
+FIELD_TEXT_COLOR = (0, 0, 0, 255)
+
+SELECTED_FIELD_COLOR = (255, 255, 0, 200)   # Amarillo brillante para seleccionado
+SELECTION_BORDER_COLOR = (255, 165, 0, 255)  # Borde naranja
+SELECTION_THICKNESS = 3
+DRAG_CONFLICT_COLOR = (255, 60, 60, 200)     # Rojo: la posición arrastrada está ocupada
+
+
+class FieldNode:
+    """Elementos de dibujo de un campo en la capa de campos"""
+    __slots__ = ("field", "node", "fill", "border", "text", "state")
+
+    def __init__(self, field, node, fill, border, text, state):
+        self.field = field
+        self.node = node
+        self.fill = fill
+        self.border = border
+        self.text = text
+        self.state = state
+
+
+def create_canvas_layers(app) -> bool:
+    """Crea (si faltan) las capas del canvas en su orden de dibujo"""
+    if not dpg.does_item_exist("map_canvas"):
+        return False
+    if not dpg.does_item_exist(GRID_LAYER):
+        # Las capas se crean juntas para conservar el orden
+        for tag in CANVAS_LAYERS:
+            if dpg.does_item_exist(tag):
+                dpg.delete_item(tag)
+            dpg.add_draw_layer(parent="map_canvas", tag=tag)
+        app.field_nodes.clear()
+        app.field_nodes_map = None
+        app.canvas_grid_key = None
+        app.validation_marker_items.clear()
+        app.selection_item = None
+    return True
+
+
+def screen_size(app):
+    """(líneas, columnas) de la pantalla del mapa actual"""
+    if app.current_map and app.current_map.size:
+        rows, cols = app.current_map.size
+        return max(int(rows), 1), max(int(cols), 1)
+    return DEFAULT_SCREEN_SIZE
+
+
+def update_canvas_geometry(app):
+    """
+    Recalcula el tamaño de celda según la pantalla del mapa y el zoom, y
+    ajusta el desplazamiento a los límites. Al cambiar de mapa se vuelve a
+    la esquina superior izquierda.
+    """
+    if app.canvas_geometry_map is not app.current_map:
+        app.canvas_geometry_map = app.current_map
+        app.canvas_pan = (0.0, 0.0)
+    rows, cols = app.canvas_screen = screen_size(app)
+    fit = min(app.canvas_width / cols, app.canvas_height / (rows * CELL_ASPECT))
+    app.cell_width = fit * app.canvas_zoom
+    app.cell_height = fit * CELL_ASPECT * app.canvas_zoom
+    max_x = max(cols * app.cell_width - app.canvas_width, 0.0)
+    max_y = max(rows * app.cell_height - app.canvas_height, 0.0)
+    app.canvas_pan = (min(max(app.canvas_pan[0], 0.0), max_x), min(max(app.canvas_pan[1], 0.0), max_y))
+
+
+def canvas_geometry(app):
+    """Clave de la geometría actual: (ancho de celda, alto de celda, pan x, pan y)"""
+    return (app.cell_width, app.cell_height) + app.canvas_pan
+
+
+def visible_cells(app):
+    """Rango visible (primera línea, última línea, primera columna, última columna), base 1"""
+    rows, cols = app.canvas_screen
+    pan_x, pan_y = app.canvas_pan
+    first_col = int(pan_x // app.cell_width) + 1
+    first_line = int(pan_y // app.cell_height) + 1
+    last_col = min(int((pan_x + app.canvas_width) // app.cell_width) + 1, cols)
+    last_line = min(int((pan_y + app.canvas_height) // app.cell_height) + 1, rows)
+    return first_line, last_line, first_col, last_col
+
+
+def field_visible(app, field) -> bool:
+    """Indica si alguna celda del campo cae dentro de la ventana visible"""
+    first_line, last_line, first_col, last_col = app.canvas_visible
+    return (first_line <= field.line <= last_line
+            and field.column <= last_col and field.column + max(field.length, 1) - 1 >= first_col)
+
+
+def draw_screen_grid(app):
+    """Dibuja la parte visible de la cuadrícula (solo si cambió la geometría)"""
+    if not create_canvas_layers(app):
+        return
+    update_canvas_geometry(app)
+    rows, cols = app.canvas_screen
+    grid_key = (app.canvas_width, app.canvas_height, app.canvas_screen) + canvas_geometry(app)
+    if app.canvas_grid_key == grid_key:
+        return
+    dpg.delete_item(GRID_LAYER, children_only=True)
+    app.canvas_grid_key = grid_key
+    app.canvas_visible = visible_cells(app)
+    first_line, last_line, first_col, last_col = app.canvas_visible
+    pan_x, pan_y = app.canvas_pan
+    # Extremos del área de la pantalla dentro del canvas
+    top = max(-pan_y, 0)
+    bottom = min(rows * app.cell_height - pan_y, app.canvas_height)
+    left = max(-pan_x, 0)
+    right = min(cols * app.cell_width - pan_x, app.canvas_width)
+
+    # Líneas verticales (bordes de las columnas visibles)
+    for i in range(first_col - 1, last_col + 1):
+        x = i * app.cell_width - pan_x
+        dpg.draw_line(
+            (x, top), (x, bottom),
+            color=GRID_COLOR,
+            thickness=1 if i % 10 == 0 else 0.5,
+            parent=GRID_LAYER
+        )
+
+    # Líneas horizontales (bordes de las líneas visibles)
+    for i in range(first_line - 1, last_line + 1):
+        y = i * app.cell_height - pan_y
+        dpg.draw_line(
+            (left, y), (right, y),
+            color=GRID_COLOR,
+            thickness=1 if i % 5 == 0 else 0.5,
+            parent=GRID_LAYER
+        )
+
+
+def cell_origin(app, line, column):
+    """Esquina superior izquierda de una celda en coordenadas del canvas"""
+    return ((column - 1) * app.cell_width - app.canvas_pan[0],
+            (line - 1) * app.cell_height - app.canvas_pan[1])
+
+
+def _field_state(app, field):
+    """Propiedades que determinan el dibujo de un campo"""
+    return (field.line, field.column, field.length, field.field_type, field.name,
+            field is app.selected_field) + canvas_geometry(app)
+
+
+def _field_style(app, field, state):
+    """Geometría y relleno del campo: ((x1, y1), (x2, y2), color)"""
+    x, y = cell_origin(app, field.line, field.column)
+    pmax = (x + field.length * app.cell_width, y + app.cell_height)
+    if state[5]:
+        return (x, y), pmax, SELECTED_FIELD_COLOR
+    return (x, y), pmax, FIELD_COLORS.get(field.field_type, DEFAULT_FIELD_COLOR)
+
+
+def _text_size(app):
+    return max(app.cell_height / 2, FIELD_TEXT_MIN_SIZE)
+
+
+def draw_field_on_canvas(app, field):
+    """Crea o actualiza el nodo de dibujo de un campo (solo si cambió)"""
+    key = id(field)
+    entry = app.field_nodes.get(key)
+    state = _field_state(app, field)
+    if entry is not None and entry.field is field:
+        if entry.state == state:
+            return
+        pmin, pmax, color = _field_style(app, field, state)
+        if entry.state[:5] == state[:5] and entry.state[6:] == state[6:]:
+            # Solo cambió la selección: basta con el color de relleno
+            dpg.configure_item(entry.fill, color=color, fill=color)
+            entry.state = state
+            return
+        dpg.configure_item(entry.fill, pmin=pmin, pmax=pmax, color=color, fill=color)
+        dpg.configure_item(entry.border, pmin=pmin, pmax=pmax)
+        dpg.configure_item(entry.text, pos=(pmin[0] + 2, pmin[1] + 2), text=field.name, size=_text_size(app))
+        entry.state = state
+        return
+    if entry is not None:
+        dpg.delete_item(entry.node)
+
+    pmin, pmax, color = _field_style(app, field, state)
+    node = dpg.add_draw_node(parent=FIELDS_LAYER)
+    fill = dpg.draw_rectangle(pmin, pmax, color=color, fill=color, parent=node)
+    border = dpg.draw_rectangle(pmin, pmax, color=FIELD_BORDER_COLOR, thickness=1, parent=node)
+    text = dpg.draw_text((pmin[0] + 2, pmin[1] + 2), field.name, color=FIELD_TEXT_COLOR,
+                         size=_text_size(app), parent=node)
+    app.field_nodes[key] = FieldNode(field, node, fill, border, text, state)
+
+
+def remove_field_from_canvas(app, key):
+    entry = app.field_nodes.pop(key, None)
+    if entry is not None:
+        dpg.delete_item(entry.node)
+
+
+def update_selection_overlay(app):
+    """Sitúa el contorno de selección sobre el campo seleccionado"""
+    field = app.selected_field
+    if field is None or not app.current_map or id(field) not in app.field_nodes:
+        if app.selection_item is not None:
+            dpg.configure_item(app.selection_item, show=False)
+        return
+    pmin, pmax, _ = _field_style(app, field, app.field_nodes[id(field)].state)
+    if app.selection_item is None:
+        app.selection_item = dpg.draw_rectangle(
+            pmin, pmax, color=SELECTION_BORDER_COLOR, thickness=SELECTION_THICKNESS, parent=SELECTION_LAYER)
+    else:
+        dpg.configure_item(app.selection_item, pmin=pmin, pmax=pmax, show=True)
+
+
+def update_field_selection(app, previous, field):
+    """
+    Cambia el resaltado de selección reconfigurando solo los nodos del campo
+    anterior y del nuevo (sin recorrer los demás campos).
+    """
+    for changed in (previous, field):
+        if changed is not None:
+            entry = app.field_nodes.get(id(changed))
+            if entry is not None and entry.field is changed:
+                draw_field_on_canvas(app, changed)
+    update_selection_overlay(app)
+
+
+def sync_canvas(app) -> bool:
+    """
+    Sincroniza el canvas con el mapa actual y la ventana visible: crea los
+    nodos de los campos visibles nuevos, reconfigura los que cambiaron y
+    elimina los de campos borrados o fuera de la ventana.
+    """
+    if not create_canvas_layers(app):
+        return False
+    draw_screen_grid(app)
+
+    if app.field_nodes_map is not app.current_map:
+        dpg.delete_item(FIELDS_LAYER, children_only=True)
+        app.field_nodes.clear()
+        app.field_nodes_map = app.current_map
+
+    seen = set()
+    if app.current_map:
+        for field in app.current_map.fields:
+            if field_visible(app, field):
+                seen.add(id(field))
+                draw_field_on_canvas(app, field)
+    for key in [key for key in app.field_nodes if key not in seen]:
+        remove_field_from_canvas(app, key)
+
+    update_selection_overlay(app)
+    if app.validation_marker_items:
+        update_validation_markers(app, app.validation_markers)
+    # Buffer de celdas al día con lo dibujado: la detección de clics no lo recorre
+    app.get_screen_buffer()
+    app.hit_test_map = app.current_map
+    return True
+
+
+def update_visual_editor(app):
+    """Sincroniza el canvas con el mapa actual y revalida en segundo plano"""
+    if not sync_canvas(app):
+        return
+    # Los marcadores se actualizan al llegar el resultado de la validación
+    request_live_validation(app)
+
+
+def _update_zoom_label(app):
+    if dpg.does_item_exist("canvas_zoom_label"):
+        dpg.set_value("canvas_zoom_label", f"Zoom {app.canvas_zoom * 100:.0f}%")
+
+
+def set_canvas_zoom(app, zoom, anchor=None):
+    """
+    Cambia el zoom manteniendo fijo el punto `anchor` del canvas (por
+    defecto, el centro). Solo se redibuja la ventana visible.
+    """
+    zoom = min(max(zoom, MIN_ZOOM), MAX_ZOOM)
+    if zoom == app.canvas_zoom:
+        return
+    if anchor is None:
+        anchor = (app.canvas_width / 2, app.canvas_height / 2)
+    ratio = zoom / app.canvas_zoom
+    app.canvas_zoom = zoom
+    app.canvas_pan = ((app.canvas_pan[0] + anchor[0]) * ratio - anchor[0],
+                      (app.canvas_pan[1] + anchor[1]) * ratio - anchor[1])
+    _update_zoom_label(app)
+    sync_canvas(app)
+
+
+def pan_canvas(app, dx, dy):
+    """Desplaza la ventana visible dx, dy píxeles"""
+    app.canvas_pan = (app.canvas_pan[0] + dx, app.canvas_pan[1] + dy)
+    sync_canvas(app)
+
+
+def fit_canvas(app):
+    """Vuelve a mostrar la pantalla completa"""
+    app.canvas_zoom = 1.0
+    app.canvas_pan = (0.0, 0.0)
+    _update_zoom_label(app)
+    sync_canvas(app)
+
+
+# ---- Detección de clics ----
+
+def canvas_cell_at(app, pos):
+    """
+    (línea, columna) de la celda bajo una posición local del canvas (la de
+    dpg.get_drawing_mouse_pos); None fuera del canvas o de la pantalla.
+    """
+    x, y = pos
+    if not (0 <= x < app.canvas_width and 0 <= y < app.canvas_height):
+        return None
+    rows, cols = app.canvas_screen
+    column = int((x + app.canvas_pan[0]) // app.cell_width) + 1
+    line = int((y + app.canvas_pan[1]) // app.cell_height) + 1
+    if not (1 <= line <= rows and 1 <= column <= cols):
+        return None
+    return line, column
+
+
+def field_at_cell(app, line, column):
+    """
+    Campo cuyo rectángulo dibujado cubre la celda (O(1) mientras el canvas
+    está al día). El canvas dibuja `length` celdas desde la columna de POS,
+    que en el buffer son el atributo y los datos salvo el último byte.
+    """
+    if (app.hit_test_map is app.current_map and app.screen_buffer_map is app.current_map
+            and "canvas" not in app.dirty_views):
+        buffer = app.screen_buffer
+    else:
+        # Hay cambios sin dibujar: sincronizar el buffer antes de consultar
+        buffer = app.get_screen_buffer()
+    if buffer is None:
+        return None
+    for field in buffer.owners_at(line, column):
+        if field.line == line and field.column <= column < field.column + field.length:
+            return field
+    return None
+
+
+def canvas_hit_test(app, pos=None):
+    """
+    Celda y campo bajo el puntero: (línea, columna, campo o None), o None si
+    el puntero está fuera de la pantalla del mapa.
+    """
+    if not app.current_map:
+        return None
+    if pos is None:
+        pos = dpg.get_drawing_mouse_pos()
+    cell = canvas_cell_at(app, pos)
+    if cell is None:
+        return None
+    return cell + (field_at_cell(app, *cell),)
+
+
+# ---- Arrastre de campos ----
+#
+# Durante el arrastre el modelo no cambia: solo se reconfiguran el nodo del
+# campo arrastrado y el contorno de selección. La ocupación se consulta en
+# el buffer de celdas (solo las celdas del campo en la posición propuesta) y
+# el cambio se aplica al soltar el botón.
+
+def begin_field_drag(app, field, line, column):
+    """
+    Prepara el arrastre de un campo pulsado en la celda (línea, columna): la
+    última celda del campo lo redimensiona; el resto lo mueve.
+    """
+    app.drag_field = field
+    app.drag_mode = "resize" if field.length > 1 and column == field.column + field.length - 1 else "move"
+    app.drag_start_pos = (field.line, field.column, field.length)
+    app.drag_offset = (0, 0)
+    app.drag_preview = None
+    app.drag_buffer = app.get_screen_buffer()
+    app.is_dragging = False
+
+
+def _drag_target(app, dx, dy):
+    """
+    Posición (línea, columna, longitud) propuesta para un desplazamiento en
+    píxeles. Se limita a column + length <= columnas, la misma condición que
+    la regla FIELD_WIDTH (atributo en la columna y datos a continuación).
+    """
+    rows, cols = app.canvas_screen
+    line, column, length = app.drag_start_pos
+    delta_col = round(dx / app.cell_width)
+    if app.drag_mode == "resize":
+        return line, column, min(max(length + delta_col, 1), max(cols - column, 1))
+    line = min(max(line + round(dy / app.cell_height), 1), rows)
+    column = min(max(column + delta_col, 1), max(cols - length, 1))
+    return line, column, length
+
+
+def _drag_conflict(app, target) -> bool:
+    """Indica si la posición propuesta pisa otro campo (atributo y datos)"""
+    buffer = app.drag_buffer
+    if buffer is None:
+        return False
+    line, column, length = target
+    # Mismo extremo que _drag_target: atributo en column, datos hasta column + length
+    for cell in range(column, min(column + length, buffer.cols) + 1):
+        for owner in buffer.owners_at(line, cell):
+            if owner is not app.drag_field:
+                return True
+    return False
+
+
+def update_field_drag(app, dx, dy):
+    """
+    Vista previa del arrastre: dx, dy es el desplazamiento del ratón desde
+    que se pulsó. Con snap_to_grid el rectángulo salta de celda en celda; sin
+    él sigue al ratón y la celda se redondea al soltar.
+    """
+    field = app.drag_field
+    if field is None:
+        return
+    app.is_dragging = True
+    app.drag_offset = (dx, dy)
+    target = _drag_target(app, dx, dy)
+    snap = app.config.app_config.snap_to_grid
+    preview = (target, None if snap else (dx, dy)) + canvas_geometry(app)
+    if preview == app.drag_preview:
+        return
+    conflict = _drag_conflict(app, target)
+    app.drag_preview = preview
+    app.drag_conflict = conflict
+
+    entry = app.field_nodes.get(id(field))
+    if entry is None or entry.field is not field:
+        return
+    line, column, length = target
+    if snap:
+        x, y = cell_origin(app, line, column)
+        pmin, pmax = (x, y), (x + length * app.cell_width, y + app.cell_height)
+    else:
+        start_line, start_column, start_length = app.drag_start_pos
+        x, y = cell_origin(app, start_line, start_column)
+        if app.drag_mode == "resize":
+            pmin = (x, y)
+            pmax = (x + max(start_length * app.cell_width + dx, app.cell_width), y + app.cell_height)
+        else:
+            pmin = (x + dx, y + dy)
+            pmax = (pmin[0] + start_length * app.cell_width, pmin[1] + app.cell_height)
+    color = DRAG_CONFLICT_COLOR if conflict else SELECTED_FIELD_COLOR
+    dpg.configure_item(entry.fill, pmin=pmin, pmax=pmax, color=color, fill=color)
+    dpg.configure_item(entry.border, pmin=pmin, pmax=pmax)
+    dpg.configure_item(entry.text, pos=(pmin[0] + 2, pmin[1] + 2))
+    if app.selection_item is not None and app.selected_field is field:
+        dpg.configure_item(app.selection_item, pmin=pmin, pmax=pmax, show=True)
+    # El nodo ya no corresponde al modelo: la próxima sincronización lo reconfigura
+    entry.state = ()
+
+
+def end_field_drag(app):
+    """
+    Termina el arrastre. Retorna (campo, (línea, columna, longitud), ocupado)
+    si el campo se arrastró, o None si solo fue un clic.
+    """
+    field = app.drag_field
+    moved = app.is_dragging and field is not None
+    result = None
+    if moved:
+        target = _drag_target(app, *app.drag_offset)
+        result = (field, target, _drag_conflict(app, target))
+    app.drag_field = None
+    app.drag_preview = None
+    app.drag_buffer = None
+    app.is_dragging = False
+    return result
+
+
+def restore_field_drawing(app, field):
+    """Devuelve el nodo de un campo a su posición en el modelo (arrastre rechazado)"""
+    entry = app.field_nodes.get(id(field))
+    if entry is not None and entry.field is field:
+        draw_field_on_canvas(app, field)
+    update_selection_overlay(app)
+
+
+def init_canvas_state(app):
+    """Estado del canvas retenido (se llama desde BMSGeneratorApp.__init__)"""
+    app.field_nodes = {}          # id(campo) -> FieldNode
+    app.field_nodes_map = None    # Mapa dibujado en la capa de campos
+    app.canvas_grid_key = None    # Geometría con la que se dibujó la cuadrícula
+    app.selection_item = None     # Contorno de selección
+    app.canvas_zoom = 1.0         # 1 = pantalla completa dentro del canvas
+    app.canvas_pan = (0.0, 0.0)   # Desplazamiento de la ventana visible (píxeles)
+    app.canvas_screen = DEFAULT_SCREEN_SIZE
+    app.canvas_geometry_map = None  # Mapa para el que se calculó la geometría
+    app.canvas_visible = (1, DEFAULT_SCREEN_SIZE[0], 1, DEFAULT_SCREEN_SIZE[1])
+    app.canvas_pan_drag = None    # Arrastre acumulado con el botón central (None = sin arrastre)
+    app.hit_test_map = None       # Mapa con el que se sincronizó el buffer en el último dibujo
+    app.drag_field = None         # Campo pulsado para arrastrar (None = sin arrastre)
+    app.drag_mode = "move"        # "move" o "resize"
+    app.drag_preview = None       # Última vista previa dibujada
+    app.drag_conflict = False
+    app.drag_buffer = None        # Buffer de celdas consultado durante el arrastre
+
+
+# ---- Validación en vivo ----
+
+# Espera tras la última edición antes de validar (segundos)
+LIVE_VALIDATION_DELAY = 0.3
+
+# Color del contorno según la severidad más grave del campo
+MARKER_COLORS = {
+    "error": (220, 40, 40, 255),     # Rojo
+    "warning": (255, 150, 0, 255),   # Naranja
+}
+MARKER_THICKNESS = 2
+
+
+def compute_validation_markers(engine, snapshot, originals, owner):
+    """
+    Valida una instantánea del mapa y calcula un marcador por campo con
+    hallazgos (se ejecuta en el hilo de fondo). originals relaciona cada
+    copia con su campo y owner es el mapa original, dueño de la caché del
+    motor. Retorna (hallazgos, {id(campo): marcador}) referidos a los campos
+    originales; el marcador es (severidad, línea, columna, longitud).
+    """
+    findings = engine.validate(snapshot, owner=owner)
+    markers = {}
+    for finding in findings:
+        if not finding.subjects:
+            continue
+        # La geometría se toma de la copia: el campo original puede estar cambiando
+        for copy in finding.subjects:
+            key = id(originals.get(id(copy), copy))
+            previous = markers.get(key)
+            if previous is None or (previous[0] != ERROR and finding.severity == ERROR):
+                markers[key] = (finding.severity, copy.line, copy.column, copy.length)
+        finding.subjects = tuple(originals.get(id(copy), copy) for copy in finding.subjects)
+    return findings, markers
+
+
+def request_live_validation(app):
+    """Programa la validación del mapa actual en segundo plano (con debounce)"""
+    if app.validation_markers_map is not None and app.current_map is not app.validation_markers_map:
+        clear_validation_markers(app)
+    if not app.current_map:
+        app.live_validation_worker.cancel()
+        return
+    app.live_validation_generation += 1
+    snapshot, originals = app.map_snapshots.take(app.current_map)
+    app.live_validation_worker.submit(
+        (app.live_validation_generation, app.current_map),
+        compute_validation_markers, app.live_validation_engine, snapshot, originals, app.current_map
+    )
+
+
+def apply_live_validation(app):
+    """
+    Recoge los resultados del hilo de validación (llamado una vez por frame).
+    Se descartan los resultados de un mapa o una edición que ya no son los
+    actuales: la siguiente validación programada los reemplazará.
+    """
+    for result in app.live_validation_worker.poll():
+        generation, bms_map = result.tag
+        if generation != app.live_validation_generation or bms_map is not app.current_map:
+            continue  # Obsoleto: ni sus hallazgos ni sus errores se muestran
+        if result.error is not None:
+            app.update_status(f"Error en la validación en vivo: {result.error}")
+            continue
+        findings, markers = result.value
+        app.live_validation_findings = findings
+        app.validation_markers_map = bms_map
+        update_validation_markers(app, markers)
+
+
+def _marker_rectangle(app, marker):
+    """Rectángulo del marcador en coordenadas del canvas (recortado a la pantalla del mapa)"""
+    _, line, column, length = marker
+    rows, cols = app.canvas_screen
+    line = min(max(line, 1), rows)
+    column = min(max(column, 1), cols)
+    x1, y1 = cell_origin(app, line, column)
+    x2 = x1 + (min(column + max(length, 1), cols + 1) - column) * app.cell_width
+    return (x1, y1), (x2, y1 + app.cell_height)
+
+
+def _draw_marker(app, key, marker):
+    pmin, pmax = _marker_rectangle(app, marker)
+    app.validation_marker_items[key] = (marker, canvas_geometry(app), dpg.draw_rectangle(
+        pmin, pmax,
+        color=MARKER_COLORS.get(marker[0], MARKER_COLORS["error"]),
+        thickness=MARKER_THICKNESS,
+        parent=VALIDATION_LAYER
+    ))
+
+
+def update_validation_markers(app, markers):
+    """Aplica los marcadores nuevos redibujando solo los que cambiaron"""
+    app.validation_markers = markers
+    if not create_canvas_layers(app):
+        return
+    drawn = app.validation_marker_items
+    geometry = canvas_geometry(app)
+    for key in [key for key in drawn if key not in markers]:
+        dpg.delete_item(drawn.pop(key)[2])
+    for key, marker in markers.items():
+        current = drawn.get(key)
+        if current is not None:
+            if current[0] == marker:
+                if current[1] != geometry:
+                    # Zoom o desplazamiento: solo cambia la posición
+                    pmin, pmax = _marker_rectangle(app, marker)
+                    dpg.configure_item(current[2], pmin=pmin, pmax=pmax)
+                    drawn[key] = (marker, geometry, current[2])
+                continue
+            dpg.delete_item(current[2])
+        _draw_marker(app, key, marker)
+
+
+def clear_validation_markers(app):
+    app.validation_markers = {}
+    app.validation_markers_map = None
+    app.live_validation_findings = []
+    if dpg.does_item_exist(VALIDATION_LAYER):
+        dpg.delete_item(VALIDATION_LAYER, children_only=True)
+    app.validation_marker_items.clear()
+
+
+def create_live_validation(app):
+    """Estado de la validación en vivo (se llama desde BMSGeneratorApp.__init__)"""
+    # Motor propio: el del generador se usa desde el hilo de la interfaz
+    app.live_validation_engine = ValidationEngine()
+    app.live_validation_worker = BackgroundWorker("live-validation", LIVE_VALIDATION_DELAY)
+    app.live_validation_generation = 0
+    app.live_validation_findings = []
+    app.validation_markers = {}       # id(campo) -> (severidad, línea, columna, longitud)
+    app.validation_markers_map = None  # Mapa al que corresponden los marcadores
+    app.validation_marker_items = {}  # id(campo) -> (marcador, geometría, item del canvas)
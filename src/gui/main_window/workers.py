@@ -0,0 +1,127 @@
+# workers.py: Tareas en segundo plano para PyBMS
+
+import dataclasses
+import queue
+import threading
+import time
+from operator import attrgetter
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, Tuple
+
+from models import BMSField
+
+
+class WorkerResult(NamedTuple):
+    """Resultado de una tarea ejecutada en segundo plano"""
+    tag: Any                       # Identificador de la petición (p. ej. generación de edición)
+    value: Any = None
+    error: Optional[BaseException] = None
+
+
+class BackgroundWorker:
+    """
+    Ejecuta tareas en un hilo de fondo conservando solo la última petición.
+
+    submit() reemplaza la petición pendiente (las anteriores que no empezaron
+    se descartan) y la ejecución espera `delay` segundos sin nuevas peticiones
+    (debounce). Los resultados no tocan la GUI: se recogen con poll() desde el
+    hilo de la interfaz, una vez por frame.
+    """
+
+    def __init__(self, name: str, delay: float = 0.0):
+        self.name = name
+        self.delay = delay
+        self._condition = threading.Condition()
+        self._pending = None  # (tag, func, args)
+        self._due = 0.0
+        self._stopped = False
+        self._results: "queue.SimpleQueue[WorkerResult]" = queue.SimpleQueue()
+        self._thread: Optional[threading.Thread] = None
+
+    def submit(self, tag: Any, func: Callable, *args):
+        """Encola una tarea, reemplazando la pendiente"""
+        with self._condition:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+                self._thread.start()
+            self._pending = (tag, func, args)
+            self._due = time.monotonic() + self.delay
+            self._condition.notify()
+
+    def cancel(self):
+        """Descarta la petición pendiente (la que está en curso termina igualmente)"""
+        with self._condition:
+            self._pending = None
+
+    def poll(self) -> List[WorkerResult]:
+        """Resultados terminados desde la última consulta (no bloquea)"""
+        results = []
+        while True:
+            try:
+                results.append(self._results.get_nowait())
+            except queue.Empty:
+                return results
+
+    def shutdown(self):
+        with self._condition:
+            self._stopped = True
+            self._pending = None
+            self._condition.notify()
+
+    def _run(self):
+        while True:
+            with self._condition:
+                while not self._stopped:
+                    if self._pending is not None:
+                        remaining = self._due - time.monotonic()
+                        if remaining <= 0:
+                            break
+                        self._condition.wait(remaining)
+                    else:
+                        self._condition.wait()
+                if self._stopped:
+                    return
+                tag, func, args = self._pending
+                self._pending = None
+            try:
+                self._results.put(WorkerResult(tag, func(*args)))
+            except Exception as e:
+                self._results.put(WorkerResult(tag, error=e))
+
+
+class MapSnapshots:
+    """
+    Instantáneas de un mapa para los hilos de fondo.
+
+    Los callbacks de la interfaz modifican el mapa mientras un hilo genera o
+    valida, así que los hilos reciben una copia que nadie modifica. Las
+    copias de los campos sin cambios se reutilizan entre instantáneas (misma
+    identidad), de modo que las cachés por campo del motor de validación
+    siguen sirviendo; un campo modificado recibe una copia nueva.
+    """
+
+    def __init__(self):
+        self._copies: Dict[int, Tuple[Any, Any]] = {}  # id(campo) -> (campo, copia)
+
+    def take(self, bms_map):
+        """
+        Retorna (copia del mapa, {id(copia de campo): campo original}). Solo
+        se conservan las copias de los campos del último mapa tomado.
+        """
+        copies = {}
+        originals = {}
+        fields = []
+        for field in bms_map.fields:
+            entry = self._copies.get(id(field))
+            # La copia nunca se modifica: basta compararla con el campo
+            if entry is None or entry[0] is not field or _FIELD_GETTER(field) != _FIELD_GETTER(entry[1]):
+                entry = (field, dataclasses.replace(field, attributes=list(field.attributes)))
+            copies[id(field)] = entry
+            originals[id(entry[1])] = field
+            fields.append(entry[1])
+        self._copies = copies
+        snapshot = dataclasses.replace(bms_map, fields=fields, ctrl=list(bms_map.ctrl),
+                                       size=tuple(bms_map.size))
+        return snapshot, originals
+
+
+_FIELD_GETTER = attrgetter(*(f.name for f in dataclasses.fields(BMSField)))
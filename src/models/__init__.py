@@ -5,6 +5,15 @@ Modelos de datos para el BMS Generator
 from dataclasses import dataclass, field
 from typing import List, Optional, Dict, Any
 from enum import Enum
+import hashlib
+import json
+
+
+# CTRL por defecto cuando el mapa no define ninguno
+DEFAULT_CTRL = ["FREEKB", "FRSET"]
+
+# Orden canónico de las opciones de CTRL (las desconocidas van al final, ordenadas)
+CTRL_ORDER = ["PRINT", "L40", "L64", "L80", "HONEOM", "FREEKB", "ALARM", "FRSET"]
 
 
 class FieldType(Enum):
@@ -70,6 +79,32 @@ class BMSField:
         hilight_str = f",HILIGHT={self.hilight}" if self.hilight else ""
         
         return f"{self.name} DFHMDF POS=({self.line},{self.column}),LENGTH={self.length}{attr_str}{initial_str}{picture_str}{color_str}{hilight_str}"
+        
+    def canonical_attributes(self) -> List[FieldAttribute]:
+        """Atributos sin duplicados y en el orden de declaración de FieldAttribute"""
+        present = set(self.attributes)
+        return [attr for attr in FieldAttribute if attr in present]
+        
+    def _canonical_payload(self) -> Dict[str, Any]:
+        """
+        Contenido del campo normalizado para calcular huellas, con las mismas
+        reglas que la salida canónica del generador: los nombres automáticos
+        no se escriben, ATTRB vacío equivale a (ASKIP,NORM), PICIN toma
+        picture si falta y justify no forma parte de la sentencia.
+        """
+        from bms.names import is_auto_generated_name
+        attributes = [attr.value for attr in self.canonical_attributes()]
+        return {
+            "name": "" if is_auto_generated_name(self.name) else self.name,
+            "pos": [self.line, self.column],
+            "length": self.length,
+            "attributes": attributes or [FieldAttribute.ASKIP.value, FieldAttribute.NORM.value],
+            "initial": self.initial_value,
+            "picin": self.picin or self.picture,
+            "picout": self.picout,
+            "color": self.color.upper() if self.color else None,
+            "hilight": self.hilight.upper() if self.hilight else None,
+        }
 
 
 @dataclass  
@@ -105,6 +140,41 @@ class BMSMap:
                 return field
         return None
         
+    def canonical_ctrl(self) -> List[str]:
+        """Opciones CTRL normalizadas: mayúsculas, sin duplicados, orden fijo y valor por defecto explícito"""
+        options = {option.strip().upper() for option in self.ctrl if option.strip()}
+        if not options:
+            return list(DEFAULT_CTRL)
+        known = [option for option in CTRL_ORDER if option in options]
+        return known + sorted(options.difference(CTRL_ORDER))
+        
+    def fingerprint(self) -> str:
+        """
+        Huella SHA-256 estable del contenido del mapa.
+        
+        No depende del orden de los campos en la lista ni del orden de sus
+        atributos, de modo que dos pantallas idénticas producen la misma huella.
+        Solo incluye lo que escribe BMSGenerator(canonical=True): dos mapas
+        con la misma salida canónica tienen la misma huella.
+        """
+        payload = {
+            "name": self.name,
+            "mapset_name": self.mapset_name,
+            "size": list(self.size),
+            "title": self.title,
+            "mode": self.mode,
+            "lang": self.lang,
+            "term": self.term,
+            "ctrl": self.canonical_ctrl(),
+            "storage": self.storage,
+            "fields": [
+                f._canonical_payload()
+                for f in sorted(self.fields, key=lambda f: (f.line, f.column, f.name))
+            ],
+        }
+        data = json.dumps(payload, sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+        return hashlib.sha256(data.encode("utf-8")).hexdigest()
+        
     def to_bms_code(self) -> str:
         """Genera el código BMS completo para este mapa"""
         lines = []
@@ -48,6 +48,11 @@ class Config:
     def __init__(self, config_file: Optional[str] = None):
         self.config_file = config_file or self._get_default_config_file()
         self.config = configparser.ConfigParser()
+        # Las secciones de plantillas se leen sin interpolación y conservando
+        # mayúsculas: ConfigParser pasa las claves a minúsculas y {SITE} no
+        # encontraría la variable SITE
+        self.raw_config = configparser.ConfigParser(interpolation=None)
+        self.raw_config.optionxform = str
         self.app_config = AppConfig()
         
         # Cargar configuración
@@ -69,6 +74,7 @@ class Config:
         try:
             if os.path.exists(self.config_file):
                 self.config.read(self.config_file)
+                self.raw_config.read(self.config_file)
                 return True
             else:
                 return True
@@ -76,3 +82,35 @@ class Config:
         except Exception as e:
             print(f"Error cargando configuración: {e}")
             return False
+            
+    def get_templates(self) -> Dict[str, str]:
+        """
+        Obtiene las plantillas BMS del sitio desde la sección [templates].
+        
+        Los valores pueden ir entre comillas dobles para conservar espacios
+        iniciales, y '\\n' representa un salto de línea. Ejemplo:
+        
+            [templates]
+            comment_banner = "*  {site} - MAPA {map_name}\\n*"
+            mapset_footer = "         DFHMSD TYPE=FINAL\\n         END"
+        """
+        return self._read_raw_section("templates")
+        
+    def get_template_vars(self) -> Dict[str, str]:
+        """Obtiene las variables constantes de plantillas desde la sección [template_vars]"""
+        return self._read_raw_section("template_vars")
+        
+    def _read_raw_section(self, section: str) -> Dict[str, str]:
+        """
+        Lee una sección sin interpolación, quitando comillas y expandiendo '\\n'.
+        Los nombres de las claves conservan mayúsculas y minúsculas.
+        """
+        if not self.raw_config.has_section(section):
+            return {}
+            
+        values = {}
+        for key, value in self.raw_config.items(section):
+            if len(value) >= 2 and value.startswith('"') and value.endswith('"'):
+                value = value[1:-1]
+            values[key] = value.replace("\\n", "\n")
+        return values